@@ -0,0 +1,331 @@
+import os
+import json
+import time
+import threading
+from functools import lru_cache
+import pandas as pd
+import requests
+
+from utils import http_cache
+from utils.cache_dir import get_cache_dir
+
+"""
+Archivo local de los resúmenes semanales de dark pools (ATS) publicados por FINRA.
+
+Cada semana se guarda en disco en formato columnar (Parquet), un archivo por (tipo de
+resumen, tier, semana), junto a un índice JSON con las semanas ya archivadas. La
+sincronización es incremental por weekStartDate: solo se descargan las semanas publicadas
+que todavía no están en el archivo, y cada semana se pide completa paginando con
+offset/limit en lugar de quedarse con las primeras 'limit' filas.
+
+Las páginas leen del archivo, por lo que cambiar de semana o comparar varias no requiere
+nuevas peticiones a FINRA. Dentro de cada archivo las filas se ordenan por símbolo, para que
+las consultas de unos pocos símbolos lean solo los grupos de filas que los contienen.
+"""
+
+URL_SEMANAS = "https://api.finra.org/data/group/otcMarket/name/weeklyDownloadDetails"
+URL_RESUMEN = "https://api.finra.org/data/group/otcMarket/name/weeklySummary"
+
+HEADERS = {
+    "accept": "application/json",
+    "accept-language": "es-ES,es;q=0.9",
+    "content-type": "application/json",
+    "origin": "https://otctransparency.finra.org",
+    "referer": "https://otctransparency.finra.org/"
+}
+
+# Filas por petición (máximo que acepta la API de FINRA en consultas síncronas)
+FILAS_POR_PAGINA = 5000
+
+# Campos que se archivan para cada tipo de resumen
+CAMPOS = {
+    "ATS_W_SMBL": [
+        "productTypeCode", "issueSymbolIdentifier", "issueName",
+        "totalWeeklyShareQuantity", "totalWeeklyTradeCount", "lastUpdateDate",
+    ],
+    "ATS_W_SMBL_FIRM": [
+        "productTypeCode", "issueSymbolIdentifier", "issueName", "marketParticipantName",
+        "MPID", "totalWeeklyShareQuantity", "totalWeeklyTradeCount", "lastUpdateDate",
+    ],
+}
+
+# Columnas numéricas (el resto se guarda como texto)
+COLUMNAS_NUMERICAS = ["totalWeeklyShareQuantity", "totalWeeklyTradeCount"]
+
+# Las semanas recientes pueden corregirse después de publicadas: una semana archivada hace
+# menos de estos días, y cuyo inicio es de hace menos de DIAS_REVISION, se vuelve a pedir
+DIAS_REFRESCO = 1
+DIAS_REVISION = 35
+
+_lock = threading.Lock()
+_session = requests.Session()
+
+
+def _carpeta(tipo, tier):
+    return get_cache_dir("finra", f"{tipo}_{tier}")
+
+
+def _ruta_semana(tipo, tier, semana):
+    return os.path.join(_carpeta(tipo, tier), f"{semana}.parquet")
+
+
+def _ruta_indice(tipo, tier):
+    return os.path.join(_carpeta(tipo, tier), "indice.json")
+
+
+def indice(tipo="ATS_W_SMBL", tier="T1") -> dict:
+    """
+    Retorna el índice del archivo: semana -> {"filas": int, "descargada": timestamp}.
+    """
+    try:
+        with open(_ruta_indice(tipo, tier), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _guardar_indice(tipo, tier, datos):
+    ruta = _ruta_indice(tipo, tier)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(datos, file, indent=1, sort_keys=True)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def semanas_archivadas(tipo="ATS_W_SMBL", tier="T1") -> list:
+    """Semanas (weekStartDate, "YYYY-MM-DD") presentes en el archivo, de la más reciente a la más antigua."""
+    return sorted(indice(tipo, tier), reverse=True)
+
+
+def semanas_disponibles(tipo="ATS_W_SMBL", tier="T1", limite=104) -> list:
+    """
+    Consulta en FINRA las semanas publicadas (más reciente primero). La respuesta pasa por
+    http_cache, por lo que no se repite en cada interacción.
+
+    Raises:
+        requests.RequestException: Si FINRA no responde y no hay copia en caché.
+    """
+    payload = {
+        "quoteValues": False,
+        "delimiter": "|",
+        "limit": limite,
+        "fields": ["weekStartDate"],
+        "sortFields": ["-weekStartDate"],
+        "compareFilters": [
+            {"fieldName": "summaryTypeCode", "fieldValue": tipo, "compareType": "EQUAL"},
+            {"fieldName": "tierIdentifier", "fieldValue": tier, "compareType": "EQUAL"}
+        ]
+    }
+    data = http_cache.fetch("finra", URL_SEMANAS, method="POST", json_body=payload, headers=HEADERS)
+    semanas = {item["weekStartDate"] for item in data or [] if "weekStartDate" in item}
+    return sorted(semanas, reverse=True)
+
+
+def paginas(filtros, campos=None, filas_por_pagina=FILAS_POR_PAGINA, sort_fields=None, primera_pagina=None):
+    """
+    Recorre todas las filas de weeklySummary que cumplen los filtros, página por página.
+    Es un generador: cada página se entrega apenas llega, sin esperar al resto.
+
+    Args:
+        filtros (list[dict]): compareFilters de la API de FINRA.
+        campos (list[str], opcional): Campos a pedir (por defecto todos).
+        filas_por_pagina (int): Tamaño de cada página (limit).
+        sort_fields (list[str], opcional): Orden de las filas (por ejemplo ["-totalWeeklyShareQuantity"]).
+        primera_pagina (int, opcional): Tamaño de la primera página, más chica para mostrar
+            los primeros resultados cuanto antes.
+
+    Yields:
+        list[dict]: Las filas de cada página, hasta que FINRA devuelve una página incompleta.
+
+    Raises:
+        requests.RequestException: Si alguna petición falla.
+    """
+    offset = 0
+    limite = primera_pagina or filas_por_pagina
+    while True:
+        payload = {
+            "quoteValues": False,
+            "delimiter": "|",
+            "limit": limite,
+            "offset": offset,
+            "compareFilters": filtros,
+        }
+        if campos:
+            payload["fields"] = campos
+        if sort_fields:
+            payload["sortFields"] = sort_fields
+        response = _session.post(URL_RESUMEN, json=payload, headers=HEADERS, timeout=30)
+        response.raise_for_status()
+        # FINRA responde 204 sin cuerpo cuando el offset supera el total
+        filas = response.json() if response.content else []
+        if isinstance(filas, dict):
+            filas = filas.get("data", [])
+        if filas:
+            yield filas
+        if len(filas) < limite:
+            return
+        offset += limite
+        limite = filas_por_pagina
+
+
+def _tipar(df: pd.DataFrame, campos) -> pd.DataFrame:
+    """Asegura las columnas del tipo de resumen con tipos estables entre semanas."""
+    df = df.reindex(columns=campos)
+    for columna in campos:
+        if columna in COLUMNAS_NUMERICAS:
+            df[columna] = pd.to_numeric(df[columna], errors="coerce").fillna(0).astype("int64")
+        else:
+            df[columna] = df[columna].astype("string")
+    return df
+
+
+def _claves(tipo):
+    """Columnas que identifican una fila del resumen."""
+    return ["issueSymbolIdentifier"] + (["MPID"] if tipo == "ATS_W_SMBL_FIRM" else [])
+
+
+def descargar_semana_por_partes(semana, tipo="ATS_W_SMBL", tier="T1", primera_pagina=1000):
+    """
+    Descarga una semana completa entregando cada página ya tipada apenas llega, y la guarda
+    en el archivo al terminar. Las filas llegan de mayor a menor volumen, por lo que la
+    primera página (más chica) ya contiene los símbolos más operados.
+
+    Yields:
+        pd.DataFrame: Cada página con las columnas y tipos del archivo.
+
+    Raises:
+        requests.RequestException: Si alguna petición falla (la semana no se archiva a medias).
+    """
+    filtros = [
+        {"fieldName": "weekStartDate", "fieldValue": semana, "compareType": "EQUAL"},
+        {"fieldName": "tierIdentifier", "fieldValue": tier, "compareType": "EQUAL"},
+        {"fieldName": "summaryTypeCode", "fieldValue": tipo, "compareType": "EQUAL"},
+    ]
+    # Orden total (volumen y luego la clave) para que las páginas no se solapen
+    orden = ["-totalWeeklyShareQuantity"] + _claves(tipo)
+    partes = []
+    for filas in paginas(filtros, CAMPOS[tipo], sort_fields=orden, primera_pagina=primera_pagina):
+        parte = _tipar(pd.DataFrame(filas), CAMPOS[tipo])
+        partes.append(parte)
+        yield parte
+
+    df = pd.concat(partes, ignore_index=True) if partes else _tipar(pd.DataFrame(), CAMPOS[tipo])
+    df = df.drop_duplicates(_claves(tipo), keep="first")
+    df = df.sort_values(["issueSymbolIdentifier", "totalWeeklyShareQuantity"], ascending=[True, False], ignore_index=True)
+
+    with _lock:
+        ruta = _ruta_semana(tipo, tier, semana)
+        df.to_parquet(ruta + ".tmp", index=False, row_group_size=10000)
+        os.replace(ruta + ".tmp", ruta)
+        datos = indice(tipo, tier)
+        datos[semana] = {"filas": len(df), "descargada": time.time()}
+        _guardar_indice(tipo, tier, datos)
+
+
+def descargar_semana(semana, tipo="ATS_W_SMBL", tier="T1") -> int:
+    """
+    Descarga todas las filas de una semana (todas las páginas) y las guarda en el archivo.
+
+    Returns:
+        int: Filas descargadas.
+
+    Raises:
+        requests.RequestException: Si alguna petición falla (la semana no se archiva a medias).
+    """
+    return sum(len(parte) for parte in descargar_semana_por_partes(semana, tipo, tier, primera_pagina=None))
+
+
+def _necesita_descarga(semana, entrada, ahora):
+    """Una semana se descarga si no está archivada o si es reciente y su copia tiene más de DIAS_REFRESCO."""
+    if entrada is None:
+        return True
+    reciente = (pd.Timestamp(ahora, unit="s") - pd.Timestamp(semana)).days < DIAS_REVISION
+    return reciente and ahora - entrada["descargada"] > DIAS_REFRESCO * 86400
+
+
+def pendientes(semanas, tipo="ATS_W_SMBL", tier="T1") -> list:
+    """De las semanas indicadas, las que faltan en el archivo o deben refrescarse."""
+    datos = indice(tipo, tier)
+    ahora = time.time()
+    return [s for s in semanas if _necesita_descarga(s, datos.get(s), ahora)]
+
+
+def sincronizar(semanas=None, tipo="ATS_W_SMBL", tier="T1", on_progress=None) -> dict:
+    """
+    Descarga las semanas que faltan en el archivo (incremental por weekStartDate).
+
+    Args:
+        semanas (list[str], opcional): Semanas a asegurar; por defecto todas las disponibles.
+        tipo (str): Tipo de resumen ("ATS_W_SMBL" o "ATS_W_SMBL_FIRM").
+        tier (str): Tier de FINRA ("T1", "T2" u "OTCE").
+        on_progress (callable, opcional): Se llama con (hechas, total, semana) tras cada semana.
+
+    Returns:
+        dict: {"descargadas": [...], "errores": {semana: mensaje}}.
+    """
+    if semanas is None:
+        semanas = semanas_disponibles(tipo, tier)
+    faltantes = pendientes(semanas, tipo, tier)
+    resultado = {"descargadas": [], "errores": {}}
+    for hechas, semana in enumerate(faltantes, start=1):
+        try:
+            descargar_semana(semana, tipo, tier)
+            resultado["descargadas"].append(semana)
+        except requests.RequestException as e:
+            resultado["errores"][semana] = str(e)
+        if on_progress is not None:
+            on_progress(hechas, len(faltantes), semana)
+    return resultado
+
+
+@lru_cache(maxsize=128)
+def _leer_semana(ruta, modificado, simbolos):
+    """Lee un archivo semanal (memorizado por fecha de modificación), opcionalmente solo algunos símbolos."""
+    filtros = [("issueSymbolIdentifier", "in", list(simbolos))] if simbolos else None
+    return pd.read_parquet(ruta, filters=filtros)
+
+
+def cargar(semanas, tipo="ATS_W_SMBL", tier="T1", simbolos=None) -> pd.DataFrame:
+    """
+    Lee del archivo las semanas indicadas (las que no están archivadas se omiten).
+
+    Args:
+        semanas (str | list[str]): Semana o semanas (weekStartDate).
+        simbolos (list[str], opcional): Leer solo estos símbolos.
+
+    Returns:
+        pd.DataFrame: Las filas de todas las semanas, con la columna "weekStartDate".
+    """
+    if isinstance(semanas, str):
+        semanas = [semanas]
+    simbolos = tuple(sorted(simbolos)) if simbolos else None
+    partes = []
+    for semana in semanas:
+        ruta = _ruta_semana(tipo, tier, semana)
+        if not os.path.exists(ruta):
+            continue
+        df = _leer_semana(ruta, os.path.getmtime(ruta), simbolos).copy()
+        df.insert(0, "weekStartDate", semana)
+        partes.append(df)
+    if not partes:
+        return pd.DataFrame(columns=["weekStartDate"] + CAMPOS[tipo])
+    return pd.concat(partes, ignore_index=True)
+
+
+def comparar_semanas(semana, semana_base, tipo="ATS_W_SMBL", tier="T1") -> pd.DataFrame:
+    """
+    Compara el volumen de cada símbolo entre dos semanas archivadas.
+
+    Returns:
+        pd.DataFrame: Las filas de 'semana' con el volumen de 'semana_base' y la variación
+        (absoluta y %) de acciones negociadas.
+    """
+    actual = cargar(semana, tipo, tier).drop(columns="weekStartDate")
+    base = cargar(semana_base, tipo, tier)
+    claves = _claves(tipo)
+    base = base[claves + ["totalWeeklyShareQuantity"]].rename(
+        columns={"totalWeeklyShareQuantity": "sharesSemanaBase"}
+    )
+    df = actual.merge(base, on=claves, how="left")
+    df["sharesVariacion"] = df["totalWeeklyShareQuantity"] - df["sharesSemanaBase"].fillna(0)
+    df["sharesVariacionPct"] = 100 * (df["totalWeeklyShareQuantity"] / df["sharesSemanaBase"] - 1)
+    return df
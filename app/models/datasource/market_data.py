@@ -0,0 +1,499 @@
+import os
+import json
+import threading
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+from utils.cache_dir import get_cache_dir
+from utils.flatten_columns import flatten_columns
+
+"""
+Capa de datos de mercado (OHLCV) compartida por todos los plugins.
+
+Las velas se guardan en disco en formato columnar (Parquet), un archivo por (ticker, intervalo),
+junto a un pequeño JSON con el rango ya cubierto. Cuando un plugin pide un rango, solo se
+descargan de Yahoo los tramos que faltan (cabeza y/o cola) y el resto se sirve desde disco.
+La cola se vuelve a pedir solapando al menos una vela completa ya guardada: si Yahoo la
+devuelve con otro cierre (precios ajustados tras un split o dividendo) la historia guardada
+quedó en otra base y se descarta y vuelve a descargar entera.
+
+Los intervalos que se pueden derivar de otro más fino (15m desde 5m, 1h desde 1m, 1wk/1mo/3mo
+desde 1d...) se calculan localmente con models.datasource.resampling cuando el intervalo fino
+ya cubre el rango pedido, por lo que cambiar de intervalo no requiere una descarga nueva.
+"""
+
+INTRADAY_INTERVALS = ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"]
+
+# Días hacia atrás que Yahoo permite consultar para cada intervalo intradía
+MAX_DIAS_INTERVALO = {
+    "1m": 29, "2m": 59, "5m": 59, "15m": 59, "30m": 59, "90m": 59,
+    "60m": 729, "1h": 729,
+}
+
+# Tickers máximos por petición en las descargas agrupadas
+TICKERS_POR_PETICION = 100
+
+# Días máximos por petición (Yahoo rechaza rangos mayores para 1m)
+MAX_DIAS_POR_PETICION = {"1m": 7}
+
+# Tolerancia relativa al comparar el cierre de las velas solapadas (detección de reajustes)
+TOLERANCIA_AJUSTE = 1e-4
+
+# Segundos durante los cuales el final del rango se considera fresco y no se vuelve a pedir
+SEGUNDOS_FRESCURA_INTRADAY = 60
+SEGUNDOS_FRESCURA_DIARIO = 900
+
+# Equivalencia aproximada en días de los 'period' de yfinance
+PERIODOS_DIAS = {
+    "1d": 1, "5d": 5, "1mo": 31, "3mo": 92, "6mo": 183,
+    "1y": 366, "2y": 731, "5y": 1827, "10y": 3653,
+}
+
+_TZ_LOCAL = dt.datetime.now().astimezone().tzinfo
+
+# yf.download usa estado global (shared._DFS), por lo que las descargas se serializan
+_YF_LOCK = threading.Lock()
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_para(ticker, interval):
+    """Retorna el lock asociado a un (ticker, intervalo), creándolo si no existe."""
+    with _locks_guard:
+        return _locks.setdefault((ticker.upper(), interval), threading.Lock())
+
+
+def _rutas(ticker, interval):
+    """Retorna las rutas (parquet, json de cobertura) para un (ticker, intervalo)."""
+    nombre = "".join(c if c.isalnum() or c in "-." else "_" for c in ticker.upper())
+    carpeta = get_cache_dir("ohlcv", interval)
+    return os.path.join(carpeta, f"{nombre}.parquet"), os.path.join(carpeta, f"{nombre}.json")
+
+
+def _a_utc(valor):
+    """Convierte una fecha/datetime/str a Timestamp en UTC. Los valores sin zona se asumen locales."""
+    ts = pd.Timestamp(valor)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize(_TZ_LOCAL)
+    return ts.tz_convert("UTC")
+
+
+def _leer(ticker, interval):
+    """Lee las velas y la cobertura guardadas. Retorna (DataFrame o None, dict de cobertura)."""
+    ruta_datos, ruta_meta = _rutas(ticker, interval)
+    if not (os.path.exists(ruta_datos) and os.path.exists(ruta_meta)):
+        return None, {}
+    try:
+        data = pd.read_parquet(ruta_datos)
+        with open(ruta_meta, "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        return data, meta
+    except Exception as e:
+        print(f"No se pudo leer la caché OHLCV de {ticker} ({interval}): {e}")
+        return None, {}
+
+
+def _cobertura(ticker, interval):
+    """Retorna el inicio de la cobertura guardada de un (ticker, intervalo), o None si no hay."""
+    _, ruta_meta = _rutas(ticker, interval)
+    try:
+        with open(ruta_meta, "r", encoding="utf-8") as file:
+            return pd.Timestamp(json.load(file)["inicio"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _limite(interval, ahora):
+    """Fecha más antigua que Yahoo sirve para un intervalo intradía (None si no tiene tope)."""
+    dias = MAX_DIAS_INTERVALO.get(interval)
+    return ahora - pd.Timedelta(days=dias) if dias else None
+
+
+def _fuente_derivable(ticker, interval, inicio, ahora):
+    """
+    Retorna el intervalo desde el que conviene derivar 'interval' para un rango que empieza en
+    'inicio', o None si hay que usar el propio intervalo. Las velas semanales, mensuales y
+    trimestrales se derivan siempre de las diarias (una sola descarga sirve para todas); las
+    intradía solo si un intervalo más fino ya cubre el inicio y el propio intervalo no.
+    Un intervalo fino cuyo tope de días en Yahoo es menor que el rango pedido no sirve como
+    fuente (1m solo llega a 29 días, y derivar 1h de él recortaría el rango).
+    """
+    from models.datasource.resampling import FUENTES, REGLAS_CALENDARIO
+
+    if interval in REGLAS_CALENDARIO:
+        return FUENTES[interval][0]
+    if interval not in FUENTES:
+        return None
+    # Inicio alcanzable con el propio intervalo (el resto del rango Yahoo no lo sirve)
+    limite = _limite(interval, ahora)
+    desde = max(inicio, limite) if limite is not None else inicio
+    propia = _cobertura(ticker, interval)
+    if propia is not None and propia <= desde:
+        return None
+    for fuente in FUENTES[interval]:
+        limite_fuente = _limite(fuente, ahora)
+        if limite_fuente is not None and limite_fuente > desde:
+            continue
+        cobertura = _cobertura(ticker, fuente)
+        if cobertura is not None and cobertura <= desde:
+            return fuente
+    return None
+
+
+def _derivar(ticker, inicio, fin, interval, fuente):
+    """Obtiene las velas de 'fuente' (caché + tramos faltantes) y las agrupa en 'interval'."""
+    from models.datasource.resampling import resample_ohlcv, inicio_periodo, REGLAS_CALENDARIO
+
+    if interval in REGLAS_CALENDARIO:
+        # Pedir desde el inicio del periodo para que la primera vela quede completa
+        desde = _a_utc(inicio_periodo(inicio.tz_convert(_TZ_LOCAL).tz_localize(None), interval))
+        velas = resample_ohlcv(get_ohlcv(ticker, start=desde, end=fin, interval=fuente), interval)
+        if velas.empty:
+            return velas
+        return _recortar(velas, desde, fin)
+    velas = resample_ohlcv(get_ohlcv(ticker, start=inicio, end=fin, interval=fuente), interval)
+    return _recortar(velas, inicio, fin) if not velas.empty else velas
+
+
+def _guardar(ticker, interval, data, meta):
+    """Guarda las velas y la cobertura de forma atómica (archivo temporal + reemplazo)."""
+    ruta_datos, ruta_meta = _rutas(ticker, interval)
+    try:
+        data.to_parquet(ruta_datos + ".tmp")
+        os.replace(ruta_datos + ".tmp", ruta_datos)
+        with open(ruta_meta + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(ruta_meta + ".tmp", ruta_meta)
+    except Exception as e:
+        print(f"No se pudo guardar la caché OHLCV de {ticker} ({interval}): {e}")
+
+
+def _descargar(ticker, inicio, fin, interval):
+    """
+    Descarga de Yahoo las velas del rango [inicio, fin), partiendo la petición
+    si el intervalo tiene un máximo de días por consulta.
+    """
+    import yfinance as yf
+
+    dias = MAX_DIAS_POR_PETICION.get(interval)
+    partes = []
+    desde = inicio
+    while desde < fin:
+        hasta = min(fin, desde + pd.Timedelta(days=dias)) if dias else fin
+        with _YF_LOCK:
+            df = yf.download(
+                ticker,
+                start=desde.to_pydatetime(),
+                end=hasta.to_pydatetime(),
+                interval=interval,
+                progress=False,
+            )
+        if df is not None and not df.empty:
+            partes.append(flatten_columns(df))
+        desde = hasta
+    return partes
+
+
+def _tramos_faltantes(data, meta, inicio, fin, ahora, interval):
+    """
+    Calcula los tramos [desde, hasta) que hay que descargar para cubrir [inicio, fin),
+    considerando la cobertura guardada y la frescura del final del rango.
+    """
+    limite = _limite(interval, ahora)
+
+    def acotar(desde, hasta):
+        if limite is not None:
+            desde = max(desde, limite)
+        return [(desde, hasta)] if desde < hasta else []
+
+    if data is None or data.empty or not meta:
+        return acotar(inicio, fin)
+
+    cob_inicio = pd.Timestamp(meta["inicio"])
+    cob_fin = pd.Timestamp(meta["fin"])
+    tramos = []
+
+    # Cabeza: el rango pedido empieza antes de lo que tenemos
+    if inicio < cob_inicio:
+        tramos += acotar(inicio, cob_inicio)
+
+    # Cola: el rango pedido termina después de lo que tenemos y lo guardado ya no es fresco
+    frescura = SEGUNDOS_FRESCURA_INTRADAY if interval in INTRADAY_INTERVALS else SEGUNDOS_FRESCURA_DIARIO
+    if fin > cob_fin and (ahora - cob_fin).total_seconds() > frescura:
+        # Se vuelve a pedir desde la penúltima vela guardada: la última pudo quedar incompleta
+        # y la penúltima, ya cerrada, sirve para detectar si Yahoo reajustó la historia
+        ultima = _a_utc(data.index[-2] if len(data) > 1 else data.index[-1])
+        desde = max(min(ultima, cob_fin), cob_fin - pd.Timedelta(days=7))
+        tramos += acotar(desde, fin)
+
+    return tramos
+
+
+def _ajuste_cambiado(data, nuevos) -> bool:
+    """
+    True si alguna vela ya guardada y cerrada (todas menos la última) volvió de Yahoo con otro
+    cierre: los precios ajustados cambiaron (split o dividendo) y lo guardado quedó en otra base.
+    """
+    if data is None or data.empty or not nuevos or "Close" not in data.columns:
+        return False
+    cerradas = data["Close"].iloc[:-1]
+    for df in nuevos:
+        if "Close" not in df.columns:
+            continue
+        comunes = cerradas.index.intersection(df.index)
+        if len(comunes) and not np.allclose(
+            cerradas.loc[comunes].to_numpy(dtype="float64"),
+            df.loc[comunes, "Close"].to_numpy(dtype="float64"),
+            rtol=TOLERANCIA_AJUSTE, equal_nan=True,
+        ):
+            return True
+    return False
+
+
+def _descargar_completo(ticker, meta, inicio, fin, ahora, interval):
+    """
+    Descarta lo guardado de un (ticker, intervalo) y descarga de nuevo todo su rango
+    (el cubierto más el pedido). Retorna (velas, cobertura).
+    """
+    desde = min([inicio] + ([pd.Timestamp(meta["inicio"])] if meta else []))
+    print(f"Precios ajustados de {ticker} ({interval}) cambiaron: se vuelve a descargar la historia.")
+    nuevos = []
+    for tramo_desde, tramo_hasta in _tramos_faltantes(None, {}, desde, fin, ahora, interval):
+        nuevos += _descargar(ticker, tramo_desde, tramo_hasta, interval)
+    return _combinar(None, nuevos), _cobertura_nueva({}, desde, fin, ahora, interval)
+
+
+def _combinar(data, nuevos):
+    """Une las velas guardadas con las descargadas, priorizando las más recientes."""
+    frames = [data] if data is not None and not data.empty else []
+    frames += nuevos
+    if not frames:
+        return data
+    combinado = pd.concat(frames)
+    combinado = combinado[~combinado.index.duplicated(keep="last")]
+    return combinado.sort_index()
+
+
+def _recortar(data, inicio, fin):
+    """Filtra las velas del rango [inicio, fin) respetando la zona horaria del índice."""
+    if data.index.tz is None:
+        inicio = inicio.tz_convert(_TZ_LOCAL).tz_localize(None)
+        fin = fin.tz_convert(_TZ_LOCAL).tz_localize(None)
+    else:
+        inicio = inicio.tz_convert(data.index.tz)
+        fin = fin.tz_convert(data.index.tz)
+    return data[(data.index >= inicio) & (data.index < fin)]
+
+
+def _rango_periodo(period, ahora):
+    """Traduce un 'period' de yfinance (1d, 5d, 1mo, ytd, max...) a un rango [inicio, fin)."""
+    if period == "max":
+        return pd.Timestamp("1950-01-01", tz="UTC"), ahora
+    if period == "ytd":
+        return pd.Timestamp(year=ahora.year, month=1, day=1, tz="UTC"), ahora
+    dias = PERIODOS_DIAS.get(period, 365)
+    if period.endswith("d"):
+        # Margen para fines de semana y feriados; luego se recorta por sesiones
+        dias += 5
+    return ahora - pd.Timedelta(days=dias), ahora
+
+
+def _recortar_sesiones(data, period):
+    """Para periodos en días ('1d', '5d') conserva solo las últimas N sesiones, como hace Yahoo."""
+    if not period.endswith("d") or data.empty:
+        return data
+    sesiones = PERIODOS_DIAS.get(period, 1)
+    fechas = data.index.normalize()
+    ultimas = fechas.unique()[-sesiones:]
+    return data[fechas.isin(ultimas)]
+
+
+def _rango(start, end, period, ahora):
+    """Traduce los parámetros de get_ohlcv a un rango [inicio, fin) en UTC."""
+    if period:
+        return _rango_periodo(period, ahora)
+    inicio = _a_utc(start) if start is not None else ahora - pd.Timedelta(days=365)
+    fin = _a_utc(end) if end is not None else ahora
+    return inicio, fin
+
+
+def _cobertura_nueva(meta, inicio, fin, ahora, interval):
+    """
+    Cobertura guardada tras descargar lo que faltaba de [inicio, fin). El inicio se acota al
+    tope de días del intervalo, que es lo que realmente se descargó.
+    """
+    limite = _limite(interval, ahora)
+    if limite is not None:
+        inicio = max(inicio, limite)
+    cob_inicio = min([inicio] + ([pd.Timestamp(meta["inicio"])] if meta else []))
+    cob_fin = max([min(fin, ahora)] + ([pd.Timestamp(meta["fin"])] if meta else []))
+    return {"inicio": cob_inicio.isoformat(), "fin": cob_fin.isoformat()}
+
+
+def get_ohlcv(ticker, start=None, end=None, interval="1d", period=None):
+    """
+    Obtiene velas OHLCV de un ticker sirviéndolas desde la caché local y descargando
+    de Yahoo únicamente los tramos que falten. Si el intervalo se puede derivar de uno
+    más fino ya guardado (o de las velas diarias), se calcula localmente.
+
+    Args:
+        ticker (str): Símbolo a consultar (ejemplo: "AAPL").
+        start (date | datetime | str, opcional): Inicio del rango (inclusive).
+        end (date | datetime | str, opcional): Fin del rango (exclusivo, igual que yf.download).
+        interval (str): Intervalo de las velas ("1m", "1h", "1d", ...).
+        period (str, opcional): Periodo de yfinance ("1d", "5d", "1y", "ytd", "max").
+            Si se indica, tiene prioridad sobre start/end.
+
+    Returns:
+        pd.DataFrame: Mismo formato que flatten_columns(yf.download(...)): índice "Date"
+        o "Datetime" y columnas Open, High, Low, Close, Volume. Vacío si no hay datos.
+    """
+    ahora = pd.Timestamp.now(tz="UTC")
+    inicio, fin = _rango(start, end, period, ahora)
+    if inicio >= fin:
+        return pd.DataFrame()
+
+    fuente = _fuente_derivable(ticker, interval, inicio, ahora)
+    if fuente is not None:
+        resultado = _derivar(ticker, inicio, fin, interval, fuente)
+        if period and not resultado.empty:
+            resultado = _recortar_sesiones(resultado, period)
+        return resultado.copy()
+
+    with _lock_para(ticker, interval):
+        data, meta = _leer(ticker, interval)
+        tramos = _tramos_faltantes(data, meta, inicio, fin, ahora, interval)
+        if tramos:
+            nuevos = []
+            for desde, hasta in tramos:
+                nuevos += _descargar(ticker, desde, hasta, interval)
+            if _ajuste_cambiado(data, nuevos):
+                data, cobertura = _descargar_completo(ticker, meta, inicio, fin, ahora, interval)
+            else:
+                data, cobertura = _combinar(data, nuevos), _cobertura_nueva(meta, inicio, fin, ahora, interval)
+            if data is not None and not data.empty:
+                _guardar(ticker, interval, data, cobertura)
+
+    if data is None or data.empty:
+        return pd.DataFrame()
+
+    resultado = _recortar(data, inicio, fin)
+    if period:
+        resultado = _recortar_sesiones(resultado, period)
+    return resultado.copy()
+
+
+def _descargar_lote(tickers, inicio, fin, interval):
+    """
+    Descarga de Yahoo las velas de varios tickers con una sola petición por tramo
+    (yf.download con group_by="ticker") y separa el MultiIndex de columnas en un
+    DataFrame por ticker.
+
+    Returns:
+        dict: ticker -> lista de DataFrames descargados (mismo formato que _descargar).
+    """
+    import yfinance as yf
+
+    dias = MAX_DIAS_POR_PETICION.get(interval)
+    partes = {ticker: [] for ticker in tickers}
+    desde = inicio
+    while desde < fin:
+        hasta = min(fin, desde + pd.Timedelta(days=dias)) if dias else fin
+        with _YF_LOCK:
+            df = yf.download(
+                tickers,
+                start=desde.to_pydatetime(),
+                end=hasta.to_pydatetime(),
+                interval=interval,
+                group_by="ticker",
+                progress=False,
+                threads=True,
+            )
+        if df is not None and not df.empty:
+            for ticker in tickers:
+                if isinstance(df.columns, pd.MultiIndex):
+                    if ticker not in df.columns.get_level_values(0):
+                        continue
+                    velas = df[ticker]
+                else:
+                    velas = df
+                velas = velas.dropna(how="all")
+                if not velas.empty:
+                    velas.columns.name = None
+                    partes[ticker].append(velas)
+        desde = hasta
+    return partes
+
+
+def _precargar_lote(tickers, inicio, fin, ahora, interval):
+    """
+    Completa la caché de varios tickers agrupando sus tramos faltantes: los tickers cuyo
+    tramo empieza el mismo día comparten una única descarga (en bloques de TICKERS_POR_PETICION).
+    """
+    grupos = {}
+    for ticker in tickers:
+        data, meta = _leer(ticker, interval)
+        for desde, hasta in _tramos_faltantes(data, meta, inicio, fin, ahora, interval):
+            grupos.setdefault((desde.floor("D"), hasta), []).append(ticker)
+
+    for (desde, hasta), grupo in grupos.items():
+        for i in range(0, len(grupo), TICKERS_POR_PETICION):
+            bloque = grupo[i:i + TICKERS_POR_PETICION]
+            try:
+                descargados = _descargar_lote(bloque, desde, hasta, interval)
+            except Exception as e:
+                print(f"No se pudo descargar el lote de {len(bloque)} tickers ({interval}): {e}")
+                continue
+            for ticker, nuevos in descargados.items():
+                if not nuevos:
+                    continue
+                with _lock_para(ticker, interval):
+                    data, meta = _leer(ticker, interval)
+                    if _ajuste_cambiado(data, nuevos):
+                        data, cobertura = _descargar_completo(ticker, meta, inicio, fin, ahora, interval)
+                    else:
+                        data = _combinar(data, nuevos)
+                        # Solo se agrega a la cobertura el tramo de este grupo: si otro tramo del
+                        # mismo ticker (por ejemplo la cabeza) falló, sigue pendiente
+                        cobertura = _cobertura_nueva(meta, desde, hasta, ahora, interval)
+                    if data is not None and not data.empty:
+                        _guardar(ticker, interval, data, cobertura)
+
+
+def get_ohlcv_lote(tickers, start=None, end=None, interval="1d", period=None, max_workers=8) -> dict:
+    """
+    Obtiene las velas de varios tickers (mismos parámetros que get_ohlcv). Lo que falta en
+    la caché se descarga con peticiones agrupadas de yf.download en lugar de una por ticker,
+    y luego cada ticker se sirve desde la caché como en get_ohlcv.
+    Los tickers que fallan o no tienen datos se omiten del resultado.
+
+    Returns:
+        dict: ticker -> pd.DataFrame con el formato de get_ohlcv.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from models.datasource.resampling import REGLAS_CALENDARIO, inicio_periodo
+
+    tickers = list(dict.fromkeys(tickers))
+    ahora = pd.Timestamp.now(tz="UTC")
+    inicio, fin = _rango(start, end, period, ahora)
+    if inicio < fin and tickers:
+        if interval in REGLAS_CALENDARIO:
+            # Semanas, meses y trimestres se derivan de las velas diarias (ver get_ohlcv)
+            desde = _a_utc(inicio_periodo(inicio.tz_convert(_TZ_LOCAL).tz_localize(None), interval))
+            _precargar_lote(tickers, desde, fin, ahora, "1d")
+        else:
+            # Los que se pueden derivar de un intervalo más fino ya guardado no se descargan
+            pendientes = [t for t in tickers if _fuente_derivable(t, interval, inicio, ahora) is None]
+            _precargar_lote(pendientes, inicio, fin, ahora, interval)
+
+    def obtener(ticker):
+        try:
+            return get_ohlcv(ticker, start=start, end=end, interval=interval, period=period)
+        except Exception as e:
+            print(f"No se pudieron obtener las velas de {ticker}: {e}")
+            return pd.DataFrame()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ohlcv-lote") as executor:
+        velas = dict(zip(tickers, executor.map(obtener, tickers)))
+    return {ticker: data for ticker, data in velas.items() if not data.empty}
@@ -0,0 +1,256 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import pandas as pd
+import requests
+
+from utils.cache_dir import get_cache_dir
+
+"""
+Snapshots locales del universo completo de acciones del screener de NASDAQ.
+
+Cada descarga de api/screener/stocks se parsea una sola vez (precios "$1.23", variaciones
+"-0.5%", market cap, año de IPO...) a un DataFrame tipado que se guarda en Parquet con la
+fecha de la descarga. Las consultas se hacen sobre el último snapshot en disco/memoria con
+máscaras vectorizadas, por lo que filtrar no depende de una petición en vivo. Cuando el
+último snapshot vence se sirve igual y se descarga uno nuevo en segundo plano; las
+diferencias entre dos snapshots se calculan fila a fila por símbolo.
+"""
+
+URL = "https://api.nasdaq.com/api/screener/stocks?tableonly=false&limit=25000&download=true"
+
+HEADERS = {
+    'accept': 'application/json, text/plain, */*',
+    'accept-language': 'es-ES,es;q=0.9',
+    'origin': 'https://www.nasdaq.com',
+    'priority': 'u=1, i',
+    'referer': 'https://www.nasdaq.com/',
+    'sec-ch-ua': '"Not A(Brand";v="8", "Chromium";v="132", "Google Chrome";v="132"',
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"Windows"',
+    'sec-fetch-dest': 'empty',
+    'sec-fetch-mode': 'cors',
+    'sec-fetch-site': 'same-site',
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36'
+}
+
+# Segundos de vida de un snapshot antes de pedir uno nuevo
+SEGUNDOS_REFRESCO = 15 * 60
+
+# Snapshots que se conservan en disco
+MAX_SNAPSHOTS = 60
+
+# Columnas del screener y su tipo una vez parseadas
+COLUMNAS_TEXTO = ["symbol", "name", "country", "sector", "industry"]
+COLUMNAS_PRECIO = ["lastsale", "netchange"]
+COLUMNAS_PORCENTAJE = ["pctchange"]
+COLUMNAS_ENTERAS = ["marketCap", "volume", "ipoyear"]
+
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nasdaq-universe")
+_refresco_en_curso = threading.Event()
+
+
+def _carpeta():
+    return get_cache_dir("nasdaq", "snapshots")
+
+
+def snapshots() -> list:
+    """Rutas de los snapshots guardados, del más antiguo al más reciente."""
+    carpeta = _carpeta()
+    return sorted(os.path.join(carpeta, f) for f in os.listdir(carpeta) if f.endswith(".parquet"))
+
+
+def fecha_snapshot(ruta) -> pd.Timestamp:
+    """Fecha de descarga de un snapshot (codificada en el nombre del archivo)."""
+    return pd.Timestamp.fromtimestamp(int(os.path.basename(ruta).split(".")[0]))
+
+
+def _numero(serie: pd.Series) -> pd.Series:
+    """Convierte textos como "$1,234.50", "-0.53%", "NA" o "" a float (NaN si no es un número)."""
+    limpio = serie.astype("string").str.replace(r"[$,%\s]", "", regex=True)
+    return pd.to_numeric(limpio, errors="coerce")
+
+
+def parsear(rows) -> pd.DataFrame:
+    """
+    Convierte las filas de la API de NASDAQ en un DataFrame tipado (una sola vez por snapshot).
+
+    Returns:
+        pd.DataFrame: Texto como string, sector/industria/país como category, precios y
+        variaciones como float y market cap, volumen y año de IPO como enteros (con nulos).
+    """
+    df = pd.DataFrame(rows)
+    df = df.reindex(columns=COLUMNAS_TEXTO + COLUMNAS_PRECIO + COLUMNAS_PORCENTAJE + COLUMNAS_ENTERAS)
+    for columna in COLUMNAS_TEXTO:
+        df[columna] = df[columna].astype("string").str.strip().replace("", pd.NA)
+    for columna in COLUMNAS_PRECIO + COLUMNAS_PORCENTAJE:
+        df[columna] = _numero(df[columna]).astype("float64")
+    for columna in COLUMNAS_ENTERAS:
+        df[columna] = _numero(df[columna]).round().astype("Int64")
+    for columna in ["country", "sector", "industry"]:
+        df[columna] = df[columna].astype("category")
+    df = df.dropna(subset=["symbol"]).drop_duplicates("symbol")
+    return df[["symbol", "name", "lastsale", "netchange", "pctchange", "marketCap",
+               "country", "ipoyear", "volume", "sector", "industry"]].reset_index(drop=True)
+
+
+def descargar() -> pd.DataFrame:
+    """
+    Descarga el universo completo, lo guarda como snapshot y elimina los más antiguos.
+
+    Raises:
+        requests.RequestException: Si la petición falla.
+    """
+    response = requests.get(URL, headers=HEADERS, timeout=30)
+    response.raise_for_status()
+    rows = ((response.json() or {}).get("data") or {}).get("rows") or []
+    if not rows:
+        raise requests.RequestException("La API de NASDAQ no devolvió filas.")
+    df = parsear(rows)
+
+    with _lock:
+        ruta = os.path.join(_carpeta(), f"{int(time.time())}.parquet")
+        df.to_parquet(ruta + ".tmp", index=False)
+        os.replace(ruta + ".tmp", ruta)
+        for vieja in snapshots()[:-MAX_SNAPSHOTS]:
+            os.remove(vieja)
+    return df
+
+
+@lru_cache(maxsize=4)
+def _leer_snapshot(ruta) -> pd.DataFrame:
+    """Lee un snapshot (memorizado: los snapshots no cambian una vez escritos). No modificar el resultado."""
+    return pd.read_parquet(ruta)
+
+
+def leer_snapshot(ruta) -> pd.DataFrame:
+    """
+    Retorna una copia del snapshot memorizado: se lee desde varios hilos (servicio de
+    screeners, dashboard, páginas) y un cambio en el lugar no debe alterar la copia en caché.
+    """
+    return _leer_snapshot(ruta).copy()
+
+
+def _refrescar_en_segundo_plano():
+    """Descarga un snapshot nuevo en el pool, sin duplicar un refresco en curso."""
+    if _refresco_en_curso.is_set():
+        return
+    _refresco_en_curso.set()
+
+    def tarea():
+        try:
+            descargar()
+        except Exception as e:
+            print(f"No se pudo refrescar el universo de NASDAQ: {e}")
+        finally:
+            _refresco_en_curso.clear()
+
+    _executor.submit(tarea)
+
+
+def universo(max_edad=SEGUNDOS_REFRESCO) -> pd.DataFrame:
+    """
+    Retorna el último snapshot del universo. Si está vencido se sirve igual y se refresca en
+    segundo plano; solo si no hay ninguno se descarga en el momento.
+
+    Raises:
+        requests.RequestException: Si no hay snapshots y la descarga falla.
+    """
+    guardados = snapshots()
+    if not guardados:
+        return descargar()
+    ultimo = guardados[-1]
+    if time.time() - fecha_snapshot(ultimo).timestamp() > max_edad:
+        _refrescar_en_segundo_plano()
+    return leer_snapshot(ultimo)
+
+
+def consultar(df: pd.DataFrame = None, sectores=None, market_cap_min=None, market_cap_max=None,
+              pct_min=None, pct_max=None, texto=None, orden="marketCap", ascendente=False, limite=None) -> pd.DataFrame:
+    """
+    Filtra el universo con máscaras vectorizadas.
+
+    Args:
+        df (pd.DataFrame, opcional): Universo a filtrar (por defecto el último snapshot).
+        sectores (list[str], opcional): Sectores a incluir.
+        market_cap_min, market_cap_max (float, opcional): Rango de market cap (USD).
+        pct_min, pct_max (float, opcional): Rango de variación diaria (%).
+        texto (str, opcional): Texto a buscar en el símbolo o el nombre.
+        orden (str): Columna por la que ordenar.
+        ascendente (bool): Sentido del orden.
+        limite (int, opcional): Máximo de filas a retornar.
+
+    Returns:
+        pd.DataFrame: Las filas que cumplen todos los filtros.
+    """
+    if df is None:
+        df = universo()
+    mascara = pd.Series(True, index=df.index)
+    if sectores:
+        mascara &= df["sector"].isin(sectores)
+    if market_cap_min is not None:
+        mascara &= df["marketCap"].ge(market_cap_min).fillna(False)
+    if market_cap_max is not None:
+        mascara &= df["marketCap"].le(market_cap_max).fillna(False)
+    if pct_min is not None:
+        mascara &= df["pctchange"].ge(pct_min).fillna(False)
+    if pct_max is not None:
+        mascara &= df["pctchange"].le(pct_max).fillna(False)
+    if texto:
+        texto = texto.lower()
+        mascara &= (df["symbol"].str.lower().str.contains(texto, regex=False).fillna(False)
+                    | df["name"].str.lower().str.contains(texto, regex=False).fillna(False))
+    resultado = df[mascara.to_numpy(dtype=bool)]
+    if orden in resultado.columns:
+        resultado = resultado.sort_values(orden, ascending=ascendente, na_position="last")
+    return resultado.head(limite) if limite else resultado
+
+
+def diferencias(anterior: pd.DataFrame, actual: pd.DataFrame, columnas=None) -> dict:
+    """
+    Diferencias fila a fila (por símbolo) entre dos snapshots.
+
+    Args:
+        columnas (list[str], opcional): Columnas a comparar (por defecto todas las comunes).
+
+    Returns:
+        dict: {"altas": DataFrame de símbolos nuevos, "bajas": DataFrame de símbolos que ya no
+        están, "cambios": DataFrame largo con symbol, columna, antes y después}.
+    """
+    previo = anterior.set_index("symbol")
+    nuevo = actual.set_index("symbol")
+    comunes = nuevo.index.intersection(previo.index)
+    columnas = [c for c in (columnas or nuevo.columns) if c in previo.columns]
+
+    cambios = []
+    for columna in columnas:
+        antes = previo.loc[comunes, columna].astype("object")
+        despues = nuevo.loc[comunes, columna].astype("object")
+        distinto = ~((antes == despues).fillna(False) | (antes.isna() & despues.isna()))
+        if distinto.any():
+            cambios.append(pd.DataFrame({
+                "symbol": comunes[distinto.to_numpy()],
+                "columna": columna,
+                "antes": antes[distinto].to_numpy(),
+                "despues": despues[distinto].to_numpy(),
+            }))
+    return {
+        "altas": actual[~actual["symbol"].isin(previo.index)].reset_index(drop=True),
+        "bajas": anterior[~anterior["symbol"].isin(nuevo.index)].reset_index(drop=True),
+        "cambios": pd.concat(cambios, ignore_index=True) if cambios else pd.DataFrame(columns=["symbol", "columna", "antes", "despues"]),
+    }
+
+
+def ultimas_diferencias(columnas=None):
+    """Diferencias entre los dos snapshots más recientes (None si hay menos de dos)."""
+    guardados = snapshots()
+    if len(guardados) < 2:
+        return None
+    # diferencias no modifica sus argumentos, así que se usan los snapshots memorizados sin copiar
+    resultado = diferencias(_leer_snapshot(guardados[-2]), _leer_snapshot(guardados[-1]), columnas)
+    resultado["desde"] = fecha_snapshot(guardados[-2])
+    resultado["hasta"] = fecha_snapshot(guardados[-1])
+    return resultado
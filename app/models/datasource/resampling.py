@@ -0,0 +1,107 @@
+import pandas as pd
+
+"""
+Remuestreo local de velas OHLCV.
+
+Permite derivar un intervalo a partir de otro más fino que ya está en la caché local
+(por ejemplo 15m desde 5m, 1h desde 1m o 1wk/1mo desde 1d), con las mismas reglas que
+usa Yahoo: las velas intradía se agrupan desde la apertura de cada sesión (9:30, 10:30...
+en el mercado de EE.UU.) sin cruzar de un día a otro, las semanas empiezan el lunes, los
+meses y trimestres el día 1, y el volumen se suma.
+"""
+
+# Duración de las velas intradía que se pueden derivar
+DURACION_INTRADAY = {
+    "1m": pd.Timedelta(minutes=1),
+    "2m": pd.Timedelta(minutes=2),
+    "5m": pd.Timedelta(minutes=5),
+    "15m": pd.Timedelta(minutes=15),
+    "30m": pd.Timedelta(minutes=30),
+    "60m": pd.Timedelta(minutes=60),
+    "1h": pd.Timedelta(minutes=60),
+    "90m": pd.Timedelta(minutes=90),
+}
+
+# Reglas de calendario (pandas) para los intervalos que se derivan de las velas diarias
+REGLAS_CALENDARIO = {
+    "1wk": "W-MON",
+    "1mo": "MS",
+    "3mo": "QS-JAN",
+}
+
+# Intervalos desde los que se puede derivar cada intervalo, del más grueso al más fino
+# (cuanto más grueso, menos velas hay que agrupar)
+FUENTES = {
+    "2m": ["1m"],
+    "5m": ["1m"],
+    "15m": ["5m", "1m"],
+    "30m": ["15m", "5m", "1m"],
+    "60m": ["1h", "30m", "15m", "5m", "2m", "1m"],
+    "1h": ["60m", "30m", "15m", "5m", "2m", "1m"],
+    "90m": ["30m", "15m", "5m", "1m"],
+    "1wk": ["1d"],
+    "1mo": ["1d"],
+    "3mo": ["1d"],
+}
+
+
+def _agregaciones(columnas) -> dict:
+    """Cómo se agrupa cada columna: OHLC según su significado, volumen sumado y el resto el último valor."""
+    reglas = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+    return {col: reglas.get(col, "last") for col in columnas}
+
+
+def _apertura_sesion(indice) -> pd.Timedelta:
+    """
+    Hora de apertura de las sesiones: la hora de la primera vela más frecuente entre los días,
+    para que una sesión con la primera vela faltante no desplace los buckets.
+    """
+    desde_medianoche = indice - indice.normalize()
+    primeras = pd.Series(desde_medianoche, index=indice).groupby(indice.normalize()).min()
+    return primeras.mode().iloc[0]
+
+
+def inicio_periodo(fecha, interval):
+    """Retorna el inicio del periodo (semana, mes o trimestre) que contiene a 'fecha'."""
+    fecha = pd.Timestamp(fecha)
+    if interval == "1wk":
+        return (fecha - pd.Timedelta(days=fecha.weekday())).normalize()
+    if interval == "1mo":
+        return fecha.normalize().replace(day=1)
+    if interval == "3mo":
+        return fecha.normalize().replace(day=1, month=3 * ((fecha.month - 1) // 3) + 1)
+    return fecha
+
+
+def resample_ohlcv(data: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    Agrupa velas más finas en velas del intervalo indicado.
+
+    Args:
+        data (pd.DataFrame): Velas con el formato de get_ohlcv (índice de fechas ordenado).
+        interval (str): Intervalo destino (clave de DURACION_INTRADAY o REGLAS_CALENDARIO).
+
+    Returns:
+        pd.DataFrame: Velas del intervalo destino, etiquetadas por su inicio, con el mismo
+        nombre de índice y las mismas columnas.
+    """
+    if data.empty:
+        return data
+    agregaciones = _agregaciones(data.columns)
+
+    if interval in REGLAS_CALENDARIO:
+        velas = data.resample(REGLAS_CALENDARIO[interval], label="left", closed="left").agg(agregaciones)
+        velas = velas.dropna(subset=["Open"]) if "Open" in velas.columns else velas.dropna(how="all")
+        velas.index.name = data.index.name
+        return velas
+
+    duracion = DURACION_INTRADAY[interval]
+    indice = data.index
+    dias = indice.normalize()
+    apertura = _apertura_sesion(indice)
+    # Bucket de cada vela dentro de su sesión, contado desde la apertura
+    bucket = (indice - dias - apertura) // duracion
+    etiquetas = dias + apertura + bucket * duracion
+    velas = data.groupby(etiquetas).agg(agregaciones)
+    velas.index.name = data.index.name
+    return velas
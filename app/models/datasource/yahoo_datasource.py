@@ -1,5 +1,6 @@
 import requests
 import streamlit as st
+from utils import http_cache
 
 # 1️⃣  Separamos la configuración común para poder re-usarla en varios calls si lo necesitas.
 SESSION = requests.Session()
@@ -51,9 +52,8 @@ def search_service(searchterm: str) -> list[tuple[str, str]]:
     }
 
     try:
-        resp = SESSION.get(url, params=params, timeout=15)
-        resp.raise_for_status()                 # 3️⃣  Errores HTTP
-        data = resp.json()                      # 4️⃣  Errores de parseo → except JSONDecodeError
+        # 3️⃣  Errores HTTP y 4️⃣  de parseo → except; los resultados se cachean por término
+        data = http_cache.fetch("yahoo_search", url, params=params, session=SESSION)
 
         return [
             (f"{item['longname']} ({item['symbol']})", item["symbol"])
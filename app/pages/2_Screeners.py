@@ -1,11 +1,16 @@
+import time
 import streamlit as st
 from utils.config_manager import ConfigManager
 from utils.plugins import obtener_plugins
 from pages.screeners.screeners_config import render_screeners_config
 from pages.screeners.dialog_config import render_dialog
 from pages.screeners.dialog_agregar_screener import render_dialog_agregar_screener
+from utils import screener_service
 import utils.set_logo as set_logo
 
+# Segundos que el botón "Actualizar" espera el refresco antes de volver a mostrar la página
+SEGUNDOS_ACTUALIZAR = 30
+
 
 set_logo.set_logo()
 # Cargar configuración
@@ -20,6 +25,11 @@ if st.sidebar.button("Agregar nuevo Screener", key="btn_agregar_screener"):
     render_dialog_agregar_screener(config)
 
 
+# Mantener todos los screeners actualizados en segundo plano; la página lee de memoria.
+# Los plugins se resuelven aquí (no en los hilos del servicio) y se pasan sus prefetch
+plugins = obtener_plugins("screeners")
+screener_service.registrar(screeners, {p["tipo"]: getattr(p["module"], "prefetch", None) for p in plugins})
+
 screener_names = [screener.get("nombre", "Desconocido") for screener in screeners]
 selected_screener = st.sidebar.selectbox("Seleccione un Screener", screener_names)
 
@@ -28,7 +38,6 @@ screener_config = next((s for s in screeners if s.get("nombre") == selected_scre
 
 if screener_config:
     screener_type = screener_config.get("tipo", "")
-    plugins = obtener_plugins("screeners")
     # Buscar el plugin correspondiente al screener seleccionado
     plugin = next((p for p in plugins if p["tipo"] == screener_type), None)
 
@@ -39,8 +48,38 @@ if screener_config:
         st.button("Config", key="update_screener", icon=":material/settings:", on_click=render_dialog, args=(plugin,screener_config,config,))
 
     if plugin:
-        # Ejecutar la función render del plugin
-        plugin["render"](screener_config)
+        # Último resultado del servicio de refresco (solo se espera la primera vez)
+        with st.spinner("Cargando screener..."):
+            resultado = screener_service.obtener(screener_config, esperar=60)
+        if resultado is None:
+            # El plugin no define 'prefetch': se renderiza consultando las fuentes
+            plugin["render"](screener_config)
+        elif resultado["data"] is None:
+            st.error(f"No se pudo cargar el screener: {resultado['error'] or 'sin datos todavía'}")
+            if st.button("Reintentar", key="screener_reintentar"):
+                screener_service.solicitar(screener_config, forzar=True)
+                st.rerun()
+        else:
+            col_estado, col_refrescar = st.columns([4, 1])
+            edad = time.time() - resultado["actualizado"]
+            texto = f"Actualizado hace {edad / 60:.0f} min" if edad >= 60 else f"Actualizado hace {edad:.0f} s"
+            if resultado["en_curso"]:
+                texto += " (actualizando...)"
+            elif resultado["error"]:
+                texto += f" (último intento fallido: {resultado['error']})"
+            col_estado.caption(texto)
+            if col_refrescar.button("Actualizar", key="screener_actualizar", icon=":material/refresh:"):
+                refresco = screener_service.solicitar(screener_config, forzar=True)
+                if refresco is not None:
+                    with st.spinner("Actualizando screener..."):
+                        try:
+                            refresco.result(timeout=SEGUNDOS_ACTUALIZAR)
+                        except Exception:
+                            # Si tarda más, sigue en segundo plano y la página lo muestra "actualizando..."
+                            pass
+                st.rerun()
+            # Ejecutar la función render del plugin con los datos en memoria
+            plugin["render"](screener_config, resultado["data"])
     else:
         st.error(f"No se encontró un plugin válido para el screener de tipo: {screener_type}.")
 else:
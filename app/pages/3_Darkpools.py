@@ -3,7 +3,10 @@ import requests
 import pandas as pd
 import altair as alt
 from pages.darkpools.dialog_issue_info import render_issue_info
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, DataReturnMode
+from models.datasource import finra_archive
+from utils import darkpool_analytics
+from utils.paged_grid import render_grid
+from st_aggrid import GridUpdateMode, DataReturnMode
 
 
 st.title("Resumen de Dark Pools - FINRA")
@@ -14,40 +17,80 @@ div[data-testid="stModal"] div[role="dialog"] {
 }
 </style>''', unsafe_allow_html=True)
 
-# Definir headers comunes para las peticiones
-headers = {
-    "accept": "application/json",
-    "accept-language": "es-ES,es;q=0.9",
-    "content-type": "application/json",
-    "origin": "https://otctransparency.finra.org",
-    "referer": "https://otctransparency.finra.org/"
-}
-
 # --- Obtener fechas disponibles desde weeklyDownloadDetails ---
 with st.spinner("Obteniendo fechas disponibles..."):
-    dates_url = "https://api.finra.org/data/group/otcMarket/name/weeklyDownloadDetails"
-    dates_payload = {
-        "quoteValues": False,
-        "delimiter": "|",
-        "limit": 27,
-        "fields": ["weekStartDate"],
-        "sortFields": ["-weekStartDate"],
-        "compareFilters": [
-            {"fieldName": "summaryTypeCode", "fieldValue": "ATS_W_SMBL", "compareType": "EQUAL"},
-            {"fieldName": "tierIdentifier", "fieldValue": "T1", "compareType": "EQUAL"}
-        ]
-    }
-    
-    dates_response = requests.post(dates_url, headers=headers, json=dates_payload)
-    if dates_response.status_code == 200:
-        dates_data = dates_response.json()
-        # Extraer las fechas disponibles
-        available_dates = [item["weekStartDate"] for item in dates_data if "weekStartDate" in item]
-        # Ordenar de forma descendente (la fecha más reciente primero)
-        available_dates = sorted(available_dates, reverse=True)
+    try:
+        available_dates = finra_archive.semanas_disponibles()
+    except requests.RequestException:
+        # Sin conexión con FINRA se puede seguir consultando lo que ya está archivado
+        available_dates = finra_archive.semanas_archivadas()
+        if available_dates:
+            st.warning("No se pudo consultar FINRA; se muestran las semanas del archivo local.")
+        else:
+            st.error("Error al obtener las fechas disponibles.")
+
+
+def asegurar_semanas(semanas):
+    """Descarga al archivo las semanas que falten (todas sus páginas) y muestra los errores."""
+    faltantes = finra_archive.pendientes(semanas)
+    if not faltantes:
+        return
+    barra = st.progress(0.0, text="Sincronizando archivo de FINRA...")
+    resultado = finra_archive.sincronizar(
+        faltantes,
+        on_progress=lambda hechas, total, semana: barra.progress(hechas / total, text=f"Semana {semana} ({hechas}/{total})"),
+    )
+    barra.empty()
+    for semana, error in resultado["errores"].items():
+        st.error(f"Error al cargar la semana {semana}: {error}")
+
+
+def render_resumen(top, total_shares, total_trades, registros, total_base=None, compare_date=None, cargando=False):
+    """Métricas resumidas y gráfico de los 10 símbolos más operados."""
+    if cargando:
+        st.info(f"Cargando datos... {registros:,} registros recibidos")
+    else:
+        st.success(f"Datos cargados exitosamente: {registros} registros")
+
+    # --- Mostrar métricas resumidas ---
+    col1, col2 = st.columns(2)
+    if total_base:
+        col1.metric("Total Acciones Negociadas", f"{total_shares:,}",
+                    delta=f"{100 * (total_shares / total_base - 1):.1f}% vs {compare_date}")
     else:
-        st.error("Error al obtener las fechas disponibles.")
-        available_dates = []
+        col1.metric("Total Acciones Negociadas", f"{total_shares:,}")
+    col2.metric("Total Operaciones", f"{total_trades:,}")
+
+    # --- Gráfico: Top 10 Acciones Más Operadas ---
+    st.subheader("Top 10 Acciones Más Operadas")
+    chart_shares = alt.Chart(top).mark_bar().encode(
+        x=alt.X('issueSymbolIdentifier:N', sort='-y', title="Símbolo del Issue"),
+        y=alt.Y('totalWeeklyShareQuantity:Q', title="Total Acciones Negociadas"),
+        tooltip=["issueName", "totalWeeklyShareQuantity"]
+    ).properties(width=700, height=400)
+    st.altair_chart(chart_shares, use_container_width=True)
+
+
+def cargar_semana_en_vivo(semana, destino):
+    """
+    Descarga la semana página por página y actualiza las métricas y el top 10 con cada página,
+    manteniendo solo totales acumulados y el top 10 parcial (no se rearma la tabla completa).
+    Al terminar, la semana queda en el archivo.
+    """
+    total_shares = total_trades = registros = 0
+    top = None
+    try:
+        for parte in finra_archive.descargar_semana_por_partes(semana):
+            total_shares += int(parte["totalWeeklyShareQuantity"].sum())
+            total_trades += int(parte["totalWeeklyTradeCount"].sum())
+            registros += len(parte)
+            candidatos = parte.nlargest(10, "totalWeeklyShareQuantity")
+            top = candidatos if top is None else pd.concat([top, candidatos]).nlargest(10, "totalWeeklyShareQuantity")
+            with destino.container():
+                render_resumen(top, total_shares, total_trades, registros, cargando=True)
+    except requests.RequestException as e:
+        st.error(f"Error al cargar datos: {e}")
+
 
 if available_dates:
     # --- Filtros en la barra lateral ---
@@ -57,87 +100,94 @@ if available_dates:
         options=available_dates,
         index=0  # Por defecto, la fecha más reciente (última fecha)
     )
-    limit = st.sidebar.number_input("Límite de registros", value=5000, min_value=1)
-    
-    # --- Consultar datos desde weeklySummary usando la fecha seleccionada ---
-    with st.spinner("Cargando datos..."):
-        summary_url = "https://api.finra.org/data/group/otcMarket/name/weeklySummary"
-        summary_payload = {
-            "quoteValues": False,
-            "delimiter": "|",
-            "limit": limit,
-            "fields": [
-                "productTypeCode",
-                "issueSymbolIdentifier",
-                "issueName",
-                "totalWeeklyShareQuantity",
-                "totalWeeklyTradeCount",
-                "lastUpdateDate"
-            ],
-            "compareFilters": [
-                {
-                    "fieldName": "weekStartDate",
-                    "fieldValue": selected_date,
-                    "compareType": "EQUAL"
-                },
-                {
-                    "fieldName": "tierIdentifier",
-                    "fieldValue": "T1",
-                    "compareType": "EQUAL"
-                },
-                {
-                    "fieldName": "summaryTypeCode",
-                    "fieldValue": "ATS_W_SMBL",
-                    "compareType": "EQUAL"
-                }
-            ]
-        }
-        
-        summary_response = requests.post(summary_url, headers=headers, json=summary_payload)
-    
-    if summary_response.status_code == 200:
-        summary_data = summary_response.json()
-        if isinstance(summary_data, list) and len(summary_data) > 0:
-            df = pd.DataFrame(summary_data)
-            st.success(f"Datos cargados exitosamente: {len(df)} registros")
-            
-            # --- Mostrar métricas resumidas ---
-            total_shares = df["totalWeeklyShareQuantity"].sum()
-            total_trades = df["totalWeeklyTradeCount"].sum()
-            col1, col2 = st.columns(2)
-            col1.metric("Total Acciones Negociadas", f"{total_shares:,}")
-            col2.metric("Total Operaciones", f"{total_trades:,}")
-            
-            # --- Gráfico: Top 10 Acciones Más Operadas ---
-            st.subheader("Top 10 Acciones Más Operadas")
-            df_shares = df.sort_values("totalWeeklyShareQuantity", ascending=False).head(10)
-            chart_shares = alt.Chart(df_shares).mark_bar().encode(
-                x=alt.X('issueSymbolIdentifier:N', sort='-y', title="Símbolo del Issue"),
-                y=alt.Y('totalWeeklyShareQuantity:Q', title="Total Acciones Negociadas"),
-                tooltip=["issueName", "totalWeeklyShareQuantity"]
-            ).properties(width=700, height=400)
-            st.altair_chart(chart_shares, use_container_width=True)
-            
-            # --- Tabla interactiva usando st_aggrid ---
-            st.subheader("Datos Detallados")
-            gb = GridOptionsBuilder.from_dataframe(df)
+    compare_date = st.sidebar.selectbox(
+        "Comparar con la semana",
+        options=[None] + [d for d in available_dates if d != selected_date],
+        format_func=lambda d: "Sin comparar" if d is None else d,
+        help="Agrega la variación de acciones negociadas de cada símbolo respecto a esa semana."
+    )
+
+    archivadas = finra_archive.semanas_archivadas()
+    st.sidebar.caption(f"Archivo local: {len(archivadas)} de {len(available_dates)} semanas.")
+    sincronizar_todo = st.sidebar.button("Sincronizar todas las semanas")
+
+    # --- Consultar datos desde el archivo (solo se descargan las semanas que faltan) ---
+    resumen = st.empty()
+    if finra_archive.pendientes([selected_date]):
+        # La semana elegida se muestra a medida que llegan sus páginas
+        cargar_semana_en_vivo(selected_date, resumen)
+    if sincronizar_todo:
+        asegurar_semanas(available_dates)
+    elif compare_date:
+        asegurar_semanas([compare_date])
+    if compare_date:
+        df = finra_archive.comparar_semanas(selected_date, compare_date)
+    else:
+        df = finra_archive.cargar(selected_date).drop(columns="weekStartDate")
+
+    if not df.empty:
+        total_base = int(df["sharesSemanaBase"].sum()) if compare_date else None
+        with resumen.container():
+            render_resumen(
+                df.nlargest(10, "totalWeeklyShareQuantity"),
+                int(df["totalWeeklyShareQuantity"].sum()),
+                int(df["totalWeeklyTradeCount"].sum()),
+                len(df),
+                total_base=total_base,
+                compare_date=compare_date,
+            )
+
+        # --- Tabla interactiva usando st_aggrid ---
+        st.subheader("Datos Detallados")
+        # Grilla paginada en el servidor: al navegador solo se envía la página visible
+        def configurar(gb):
             gb.configure_selection(selection_mode="single")
-            gb.configure_pagination(paginationAutoPageSize=True)
-            gb.configure_side_bar()
-            gb.configure_default_column(groupable=True, value=True, enableRowGroup=True, editable=False)
+            gb.configure_default_column(groupable=True, value=True, enableRowGroup=True, editable=False, filter=False, sortable=False)
             gb.configure_grid_options()
-            gridOptions = gb.build()
-            grid_response = AgGrid(df, gridOptions=gridOptions, enable_enterprise_modules=False, theme="streamlit",data_return_mode=DataReturnMode.AS_INPUT,update_mode=GridUpdateMode.SELECTION_CHANGED)
-            selected_rows = grid_response["selected_rows"]
-
-            if selected_rows is not None and not selected_rows.empty:
-                primer_fila = selected_rows.iloc[0]
-                st.write("Fila(s) seleccionada(s):", primer_fila['issueSymbolIdentifier'])
-                render_issue_info(primer_fila['issueSymbolIdentifier'], selected_date)
-            
+        grid_response = render_grid(df, key="darkpools_grid", configurar=configurar, enable_enterprise_modules=False, theme="streamlit",data_return_mode=DataReturnMode.AS_INPUT,update_mode=GridUpdateMode.SELECTION_CHANGED)
+        selected_rows = grid_response["selected_rows"]
+
+        if selected_rows is not None and not selected_rows.empty:
+            primer_fila = selected_rows.iloc[0]
+            st.write("Fila(s) seleccionada(s):", primer_fila['issueSymbolIdentifier'])
+            render_issue_info(primer_fila['issueSymbolIdentifier'], selected_date)
+
+        # --- Ranking de acumulación inusual sobre todas las semanas archivadas ---
+        st.subheader("Acumulación Inusual")
+        col1, col2 = st.columns(2)
+        semanas_referencia = col1.number_input("Semanas de referencia", value=darkpool_analytics.SEMANAS_TENDENCIA, min_value=2, max_value=104)
+        min_acciones = col2.number_input("Acciones mínimas en la semana", value=100_000, min_value=0, step=50_000)
+        ranking = darkpool_analytics.ranking_variacion(selected_date, int(semanas_referencia), min_acciones=min_acciones)
+        faltantes = ranking.attrs.get("faltantes", [])
+        if ranking.empty:
+            if faltantes:
+                st.info(
+                    f"Faltan en el archivo local semanas necesarias para el ranking ({', '.join(faltantes)}). "
+                    "Usa 'Sincronizar todas las semanas'."
+                )
+            else:
+                st.info("Se necesitan al menos dos semanas en el archivo local. Usa 'Sincronizar todas las semanas'.")
         else:
-            st.warning("No se encontraron datos para la fecha seleccionada.")
+            st.caption(
+                "Acciones negociadas en dark pools en la semana frente a la semana anterior y a la media de las "
+                "semanas de referencia archivadas. Ordenado por z-score."
+            )
+            if faltantes:
+                st.warning(
+                    f"La referencia excluye {len(faltantes)} semanas que no están en el archivo local: "
+                    f"{', '.join(faltantes)}. Usa 'Sincronizar todas las semanas' para completarla."
+                )
+            st.dataframe(
+                ranking.head(200),
+                hide_index=True,
+                column_config={
+                    "Variación %": st.column_config.NumberColumn(format="%.1f%%"),
+                    "Veces la media": st.column_config.NumberColumn(format="%.2f"),
+                    "Z-score": st.column_config.NumberColumn(format="%.2f"),
+                },
+            )
+
     else:
-        st.error(f"Error al cargar datos. Código de estado: {summary_response.status_code}")
+        st.warning("No se encontraron datos para la fecha seleccionada.")
 else:
     st.error("No hay fechas disponibles para seleccionar.")
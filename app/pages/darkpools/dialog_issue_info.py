@@ -1,51 +1,76 @@
 import streamlit as st
-import requests
-import pandas as pd
+import altair as alt
+from models.datasource import finra_archive
+from utils import darkpool_analytics
 
 @st.dialog("Info")
 def render_issue_info(issueSymbolIdentifier, date):
     st.write(f"Info de {issueSymbolIdentifier} en semana {date}")
 
-    url = "https://api.finra.org/data/group/otcMarket/name/weeklySummary"
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json"
-    }
-    payload = {
-        "quoteValues": False,
-        "delimiter": "|",
-        "limit": 5000,
-        "sortFields": ["-totalWeeklyShareQuantity"],
-        "compareFilters": [
-            {"fieldName": "summaryTypeCode", "fieldValue": "ATS_W_SMBL_FIRM", "compareType": "EQUAL"},
-            {"fieldName": "issueSymbolIdentifier", "fieldValue": issueSymbolIdentifier, "compareType": "EQUAL"},
-            {"fieldName": "weekStartDate", "fieldValue": date, "compareType": "EQUAL"},
-            {"fieldName": "tierIdentifier", "fieldValue": "T1", "compareType": "EQUAL"}
-        ]
-    }
-
-    response = requests.post(url, headers=headers, json=payload)
-
-    if response.status_code == 200:
-        data = response.json()
-        if isinstance(data, dict) and "data" in data:
-            data = data["data"]
-
-        if data:
-            df = pd.DataFrame(data)
-            columnas_relevantes = ["marketParticipantName", "totalWeeklyShareQuantity", "totalWeeklyTradeCount"]
-            columnas_a_mostrar = [col for col in columnas_relevantes if col in df.columns]
-            df = df[columnas_a_mostrar]
-            
-            # Renombramos las columnas por algo más descriptivo
-            df = df.rename(columns={
-                "marketParticipantName": "ATS",
-                "totalWeeklyShareQuantity": "Week Shares",
-                "totalWeeklyTradeCount": "Trades"
-            })
-            
-            st.table(df)
-        else:
-            st.write("No se encontraron datos para los parámetros indicados.")
+    # El detalle por ATS se lee del archivo; la semana se descarga completa (todos los
+    # símbolos) solo la primera vez, y sirve para cualquier otro símbolo de esa semana
+    if finra_archive.pendientes([date], tipo="ATS_W_SMBL_FIRM"):
+        with st.spinner("Descargando el detalle por ATS de la semana..."):
+            resultado = finra_archive.sincronizar([date], tipo="ATS_W_SMBL_FIRM")
+        if resultado["errores"]:
+            st.error(f"Error en la consulta: {resultado['errores'][date]}")
+            return
+
+    df = finra_archive.cargar(date, tipo="ATS_W_SMBL_FIRM", simbolos=[issueSymbolIdentifier])
+
+    if not df.empty:
+        columnas_relevantes = ["marketParticipantName", "totalWeeklyShareQuantity", "totalWeeklyTradeCount"]
+        columnas_a_mostrar = [col for col in columnas_relevantes if col in df.columns]
+        df = df.sort_values("totalWeeklyShareQuantity", ascending=False)[columnas_a_mostrar]
+        
+        # Renombramos las columnas por algo más descriptivo
+        df = df.rename(columns={
+            "marketParticipantName": "ATS",
+            "totalWeeklyShareQuantity": "Week Shares",
+            "totalWeeklyTradeCount": "Trades"
+        })
+        
+        st.table(df)
     else:
-        st.error(f"Error en la consulta: {response.status_code}")
+        st.write("No se encontraron datos para los parámetros indicados.")
+
+    render_tendencia(issueSymbolIdentifier, date)
+
+
+def render_tendencia(issueSymbolIdentifier, date):
+    """Acciones negociadas por ATS en las últimas semanas archivadas hasta 'date'."""
+    semanas = st.slider("Semanas", min_value=4, max_value=52, value=darkpool_analytics.SEMANAS_TENDENCIA, step=1)
+    tabla = darkpool_analytics.volumen_por_ats(issueSymbolIdentifier, semanas=semanas, hasta=date)
+
+    archivadas = [s for s in finra_archive.semanas_archivadas(tipo="ATS_W_SMBL_FIRM") if s <= date]
+    if len(archivadas) < semanas:
+        try:
+            faltantes = [s for s in finra_archive.semanas_disponibles(tipo="ATS_W_SMBL_FIRM") if s <= date][:semanas]
+        except Exception:
+            faltantes = []
+        faltantes = finra_archive.pendientes(faltantes, tipo="ATS_W_SMBL_FIRM")
+        if faltantes:
+            st.caption(f"El archivo por ATS tiene {len(archivadas)} de las {semanas} semanas pedidas.")
+            if st.button(f"Descargar {len(faltantes)} semanas faltantes"):
+                barra = st.progress(0.0)
+                finra_archive.sincronizar(
+                    faltantes, tipo="ATS_W_SMBL_FIRM",
+                    on_progress=lambda hechas, total, semana: barra.progress(hechas / total, text=f"Semana {semana}"),
+                )
+                tabla = darkpool_analytics.volumen_por_ats(issueSymbolIdentifier, semanas=semanas, hasta=date)
+
+    if tabla.empty or len(tabla) < 2:
+        return
+    st.subheader(f"Acciones por ATS ({len(tabla)} semanas)")
+    # Las ATS más pequeñas se agrupan para que el gráfico siga siendo legible
+    principales = tabla.columns[:8]
+    if len(tabla.columns) > len(principales):
+        tabla = tabla[principales].assign(Otros=tabla.drop(columns=principales).sum(axis=1))
+    largo = tabla.reset_index().melt(id_vars="weekStartDate", var_name="ATS", value_name="Acciones")
+    chart = alt.Chart(largo).mark_bar().encode(
+        x=alt.X("weekStartDate:T", title="Semana"),
+        y=alt.Y("Acciones:Q", title="Acciones negociadas"),
+        color=alt.Color("ATS:N", sort=list(tabla.columns)),
+        tooltip=["weekStartDate", "ATS", "Acciones"]
+    ).properties(height=350)
+    st.altair_chart(chart, use_container_width=True)
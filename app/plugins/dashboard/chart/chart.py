@@ -1,7 +1,6 @@
 import datetime as dt
 import streamlit as st
-import yfinance as yf
-from utils.flatten_columns import flatten_columns
+from models.datasource.market_data import get_ohlcv
 
 nombre = "Charts"
 descripcion = "Plugin con panel de velas arriba y volumen abajo (opcional) sin solaparse."
@@ -14,7 +13,8 @@ default_config = {
     "end_date": dt.date.today().isoformat(),
     "interval": "1d",
     "show_volume": True,
-    "height": 400  # Altura por defecto del gráfico de velas
+    "height": 400,  # Altura por defecto del gráfico de velas
+    "max_points": 1000  # Puntos máximos por serie (aprox. el ancho del widget en px)
 }
 
 def config(current_config: dict) -> dict:
@@ -30,6 +30,7 @@ def config(current_config: dict) -> dict:
     interval_value = current_config.get("interval", default_config["interval"])
     show_volume_value = current_config.get("show_volume", default_config["show_volume"])
     height_value = current_config.get("height", default_config["height"])
+    max_points_value = current_config.get("max_points", default_config["max_points"])
 
     st.write("### Configuración Principal")
     ticker = st.text_input("Ticker", value=ticker_value)
@@ -84,12 +85,22 @@ def config(current_config: dict) -> dict:
         help="Controla la altura en píxeles del panel de velas."
     )
 
+    max_points = st.number_input(
+        "Resolución máxima (puntos)",
+        min_value=200,
+        max_value=10000,
+        value=int(max_points_value),
+        step=100,
+        help="Ancho aproximado del widget en píxeles; con más velas que esto se agrupan para dibujarlas."
+    )
+
     # Construir el diccionario final
     new_config = {
         "ticker": ticker,
         "interval": interval,
         "show_volume": show_volume,
-        "height": height
+        "height": height,
+        "max_points": max_points
     }
 
     if period:
@@ -100,12 +111,46 @@ def config(current_config: dict) -> dict:
 
     return new_config
 
-def render(config: dict):
+def _rango(config: dict):
+    """Retorna (start_date, end_date) de la configuración, con los valores por defecto si no son válidos."""
+    try:
+        start_date = dt.datetime.strptime(config.get("start_date", default_config["start_date"]), "%Y-%m-%d").date()
+    except Exception:
+        start_date = dt.date.today() - dt.timedelta(days=730)
+    try:
+        end_date = dt.datetime.strptime(config.get("end_date", default_config["end_date"]), "%Y-%m-%d").date()
+    except Exception:
+        end_date = dt.date.today()
+    return start_date, end_date
+
+def ohlcv_request(config: dict) -> dict:
+    """
+    Parámetros de get_ohlcv del widget. El dashboard los usa para pedir las velas de todos
+    los widgets con el mismo rango e intervalo en una sola descarga agrupada (get_ohlcv_lote).
+    """
+    ticker = config.get("ticker", default_config["ticker"])
+    interval = config.get("interval", default_config["interval"])
+    period_config = config.get("period", None)
+    if period_config:
+        return {"ticker": ticker, "period": period_config, "interval": interval}
+    start_date, end_date = _rango(config)
+    end_datetime = dt.datetime.combine(end_date, dt.time(23, 59))
+    return {"ticker": ticker, "start": start_date, "end": end_datetime, "interval": interval}
+
+def prefetch(config: dict):
+    """
+    Obtiene las velas del widget desde la caché OHLCV local (models.datasource.market_data).
+    No usa Streamlit, por lo que el dashboard puede ejecutarla en un hilo aparte.
+    """
+    return get_ohlcv(**ohlcv_request(config))
+
+def render(config: dict, data=None):
     """
     Renderiza el gráfico de velas y, opcionalmente, el volumen, usando lightweight-charts.
-    Lee la configuración y descarga datos con yfinance.
+    Si el dashboard ya obtuvo los datos (prefetch) se reciben en 'data'; si no, se obtienen aquí.
     """
     from streamlit_lightweight_charts import renderLightweightCharts
+    from utils.lightweight_series import candle_data, line_data, to_epoch, compactar_charts
 
     # Extraer parámetros
     ticker = config.get("ticker", default_config["ticker"])
@@ -115,15 +160,7 @@ def render(config: dict):
 
     period_config = config.get("period", None)
     if not period_config:
-        try:
-            start_date = dt.datetime.strptime(config.get("start_date", default_config["start_date"]), "%Y-%m-%d").date()
-        except Exception:
-            start_date = dt.date.today() - dt.timedelta(days=730)
-        try:
-            end_date = dt.datetime.strptime(config.get("end_date", default_config["end_date"]), "%Y-%m-%d").date()
-        except Exception:
-            end_date = dt.date.today()
-        end_datetime = dt.datetime.combine(end_date, dt.time(23, 59))
+        start_date, end_date = _rango(config)
     
     # Se asume que hay una prop "is_dark" para ajuste de colores (si no existe, se usa False)
     is_dark = config.get("is_dark", False)
@@ -135,12 +172,9 @@ def render(config: dict):
         "horzLines": {"color": '#444'},
     } if is_dark else {}
 
-    with st.spinner("Cargando datos históricos..."):
-        if period_config:
-            data = yf.download(ticker, period=period_config, interval=interval)
-        else:
-            data = yf.download(ticker, start=start_date, end=end_datetime, interval=interval)
-        data = flatten_columns(data)
+    if data is None:
+        with st.spinner("Cargando datos históricos..."):
+            data = prefetch(config)
 
     if data.empty:
         st.warning(f"No se encontraron datos para el ticker {ticker} en el rango seleccionado.")
@@ -151,26 +185,9 @@ def render(config: dict):
     time_column = "Datetime" if interval in ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"] else "Date"
     data.rename(columns={time_column: "Fecha"}, inplace=True)
 
-    # Velas
-    candles = []
-    for _, row in data.iterrows():
-        time_val = int(row["Fecha"].timestamp())
-        candles.append({
-            "time": time_val,
-            "open": float(row["Open"]),
-            "high": float(row["High"]),
-            "low": float(row["Low"]),
-            "close": float(row["Close"])
-        })
-
-    # Volumen
-    volumes = []
-    for _, row in data.iterrows():
-        time_val = int(row["Fecha"].timestamp())
-        volumes.append({
-            "time": time_val,
-            "value": int(row["Volume"])
-        })
+    # Velas y volumen (serialización vectorizada)
+    candles = candle_data(data)
+    volumes = line_data(to_epoch(data["Fecha"]), data["Volume"], decimals=0)
 
     # Panel superior: gráfico de velas
     chart_candles = {
@@ -234,5 +251,6 @@ def render(config: dict):
         }
         charts_config.append(chart_volume)
 
-    from streamlit_lightweight_charts import renderLightweightCharts
+    # Reducir los payloads al ancho del widget antes de enviarlos al navegador
+    compactar_charts(charts_config, max_points=int(config.get("max_points", default_config["max_points"])))
     renderLightweightCharts(charts_config)
@@ -1,7 +1,6 @@
 import datetime as dt
 import streamlit as st
-import requests
-import plotly.graph_objects as go
+from utils import http_cache
 
 nombre = "CNN Fear & Greed"
 descripcion = "Plugin que muestra el Fear Score y el Rating como un indicador tipo gauge, adaptado al modo oscuro según configuración."
@@ -52,15 +51,36 @@ def config(current_config: dict) -> dict:
         "text_color": text_color
     }
 
-def render(config: dict):
+def prefetch(config: dict) -> dict:
     """
-    Descarga los datos del índice CNN Fear & Greed y muestra un indicador tipo gauge
-    con Plotly. Los colores se ajustan según config["is_dark"] (pasado desde dashboard_render)
-    y el alto es configurable.
+    Descarga el JSON del índice CNN Fear & Greed (con la caché HTTP compartida). No usa
+    Streamlit, por lo que el dashboard puede ejecutarla en un hilo aparte. Lanza una
+    excepción si la petición falla y no hay copia en caché.
     """
+    url = config.get("url", default_config["url"])
+
+    # Imitar a un navegador configurando headers
+    headers = {
+        "Accept": "*/*",
+        "Accept-Language": "es-ES,es;q=0.9",
+        "Origin": "https://edition.cnn.com",
+        "Referer": "https://edition.cnn.com/",
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36"
+    }
+
+    return http_cache.fetch("cnn", url, headers=headers)
+
+def render(config: dict, data=None):
+    """
+    Muestra el índice CNN Fear & Greed como un indicador tipo gauge con Plotly.
+    Los colores se ajustan según config["is_dark"] (pasado desde dashboard_render)
+    y el alto es configurable. Si el dashboard ya descargó los datos (prefetch) se
+    reciben en 'data'; si no, se descargan aquí.
+    """
+    import plotly.graph_objects as go
+
     st.write("Fear & Greed")
 
-    url = config.get("url", default_config["url"])
     height = int(config.get("height", default_config["height"]))-74  # Ajustar altura para evitar scroll
     # Colores personalizados o por defecto
     line_color = config.get("line_color", default_config["line_color"])
@@ -75,22 +95,13 @@ def render(config: dict):
         if text_color == default_config["text_color"]:
             text_color = "#ffffff"
 
-    # Imitar a un navegador configurando headers
-    headers = {
-        "Accept": "*/*",
-        "Accept-Language": "es-ES,es;q=0.9",
-        "Origin": "https://edition.cnn.com",
-        "Referer": "https://edition.cnn.com/",
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36"
-    }
-
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        data_json = response.json()
-    except Exception as e:
-        st.error(f"Error al obtener los datos: {e}")
-        return
+    data_json = data
+    if data_json is None:
+        try:
+            data_json = prefetch(config)
+        except Exception as e:
+            st.error(f"Error al obtener los datos: {e}")
+            return
 
     # Extraer los datos actuales
     fear_greed = data_json.get("fear_and_greed", {})
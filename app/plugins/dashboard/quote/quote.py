@@ -1,5 +1,4 @@
 import streamlit as st
-import wikiquote
 import html
 
 nombre = "Frase del Día"
@@ -31,18 +30,29 @@ def config(current_config: dict) -> dict:
     )
     return {"lang": lang, "height": height}
 
-def render(config: dict):
+def prefetch(config: dict) -> tuple:
+    """
+    Obtiene la frase del día (quote, author). No usa Streamlit, por lo que el dashboard
+    puede ejecutarla en un hilo aparte.
+    """
+    import wikiquote
+
     lang = config.get("lang", default_config["lang"])
+    return wikiquote.quote_of_the_day(lang=lang)
+
+def render(config: dict, data=None):
     height = int(config.get("height", default_config["height"]))-70  # Restar 30px para el margen superior e inferior
     # Se espera que config["is_dark"] venga desde el dashboard (por defecto, False)
     is_dark = config.get("is_dark", False)
     
-    try:
-        # Obtiene la frase del día (retorna (quote, author))
-        quote, author = wikiquote.quote_of_the_day(lang=lang)
-    except Exception as e:
-        st.error(f"Error al obtener la frase del día: {e}")
-        return
+    if data is None:
+        try:
+            # Obtiene la frase del día (retorna (quote, author))
+            data = prefetch(config)
+        except Exception as e:
+            st.error(f"Error al obtener la frase del día: {e}")
+            return
+    quote, author = data
 
     # Remover espacios y comillas extrañas al inicio y final
     quote = quote.strip('«»"').strip()
@@ -1,8 +1,86 @@
+import time
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from utils.config_manager import ConfigManager
 from utils.plugins import obtener_plugins
 from streamlit_theme import st_theme
 
+# Segundos que se espera por los datos de cada widget (configurable por widget con "timeout")
+PREFETCH_TIMEOUT = 20
+
+# Pool compartido entre reruns: si un widget supera su tiempo de espera, su descarga
+# sigue en segundo plano sin bloquear el render (y deja la caché caliente para el próximo).
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="dashboard-prefetch")
+
+def _agrupar_ohlcv(widgets: list) -> dict:
+    """
+    Agrupa los widgets cuyo plugin define 'ohlcv_request(config)' por parámetros de get_ohlcv
+    (rango, periodo e intervalo), para pedir las velas de cada grupo en una sola descarga.
+
+    Returns:
+        dict: (parámetros sin ticker) -> [(widget_name, ticker), ...]
+    """
+    grupos = {}
+    for widget_name, widget_conf, plugin in widgets:
+        ohlcv_request = getattr(plugin["module"], "ohlcv_request", None)
+        if ohlcv_request is None:
+            continue
+        peticion = dict(ohlcv_request(dict(widget_conf)))
+        ticker = peticion.pop("ticker")
+        grupos.setdefault(tuple(sorted(peticion.items())), []).append((widget_name, ticker))
+    return grupos
+
+def prefetch_widgets(widgets: list) -> dict:
+    """
+    Descarga en paralelo los datos de todos los widgets cuyo plugin define 'prefetch(config)'.
+    Las velas de los widgets que definen 'ohlcv_request(config)' se piden agrupadas: una
+    llamada a get_ohlcv_lote por combinación de rango e intervalo, en lugar de una por widget.
+
+    Args:
+        widgets (list): Tuplas (widget_name, widget_conf, plugin).
+
+    Returns:
+        dict: widget_name -> (datos, error). 'error' es None si la descarga terminó bien,
+        o un mensaje si falló o superó su tiempo de espera. Los widgets sin 'prefetch' no aparecen.
+    """
+    import pandas as pd
+    from models.datasource.market_data import get_ohlcv_lote
+
+    futures = {}
+    agrupados = {}
+    for parametros, miembros in _agrupar_ohlcv(widgets).items():
+        lote = _executor.submit(get_ohlcv_lote, [ticker for _, ticker in miembros], **dict(parametros))
+        for widget_name, ticker in miembros:
+            agrupados[widget_name] = (lote, ticker)
+
+    for widget_name, widget_conf, plugin in widgets:
+        timeout = widget_conf.get("timeout", PREFETCH_TIMEOUT)
+        if widget_name in agrupados:
+            # Se espera directamente el lote del grupo (sin ocupar un hilo del pool por widget)
+            lote, ticker = agrupados[widget_name]
+            futures[widget_name] = (lote, ticker, timeout)
+            continue
+        prefetch = getattr(plugin["module"], "prefetch", None)
+        if prefetch is not None:
+            futures[widget_name] = (_executor.submit(prefetch, dict(widget_conf)), None, timeout)
+
+    # Cada widget tiene su propio plazo contado desde el inicio, así la espera total es la del más lento
+    inicio = time.monotonic()
+    resultados = {}
+    for widget_name, (future, ticker, timeout) in futures.items():
+        restante = max(0.0, inicio + timeout - time.monotonic())
+        try:
+            datos = future.result(timeout=restante)
+            if ticker is not None:
+                # Resultado de get_ohlcv_lote: se extraen las velas del ticker del widget
+                datos = datos.get(ticker, pd.DataFrame())
+            resultados[widget_name] = (datos, None)
+        except TimeoutError:
+            resultados[widget_name] = (None, f"Tiempo de espera agotado ({timeout}s).")
+        except Exception as e:
+            resultados[widget_name] = (None, str(e))
+    return resultados
+
 def render():
     st.subheader("Dashboard")
     
@@ -33,8 +111,9 @@ def render():
     theme = st_theme()
     is_dark = (theme.get("base") == "dark") if theme is not None else True
 
-    # Iterar por cada widget ordenado
-    for i, (widget_name, widget_conf) in enumerate(widget_items):
+    # Resolver el plugin de cada widget
+    widgets = []
+    for widget_name, widget_conf in widget_items:
         widget_type = widget_conf.get("type")
         if not widget_type:
             st.error(f"El widget '{widget_name}' no tiene la propiedad 'type'.")
@@ -45,15 +124,27 @@ def render():
         if plugin is None:
             st.error(f"No se encontró un plugin para '{widget_name}' con tipo '{widget_type}'.")
             continue
-        
+        widgets.append((widget_name, widget_conf, plugin))
+
+    # Descargar los datos de todos los widgets a la vez y luego renderizar con los resultados
+    with st.spinner("Cargando datos del dashboard..."):
+        datos = prefetch_widgets(widgets)
+
+    # Iterar por cada widget ordenado
+    for i, (widget_name, widget_conf, plugin) in enumerate(widgets):
         with columnas[i % num_columnas]:
             # Si se definió "height" en la configuración, se pasa al contenedor
             if "height" in widget_conf:
-                height_val = widget_conf["height"]
-                with st.container(height=height_val):
-                    widget_conf["is_dark"] = is_dark
-                    plugin["render"](widget_conf)
+                contenedor = st.container(height=widget_conf["height"])
             else:
-                with st.container(border=True):
-                    widget_conf["is_dark"] = is_dark
+                contenedor = st.container(border=True)
+            with contenedor:
+                widget_conf["is_dark"] = is_dark
+                if widget_name not in datos:
                     plugin["render"](widget_conf)
+                    continue
+                data, error = datos[widget_name]
+                if error:
+                    st.error(f"Error al obtener los datos de '{widget_name}': {error}")
+                else:
+                    plugin["render"](widget_conf, data)
@@ -1,10 +1,9 @@
 import json
 import pandas as pd
 import streamlit as st
-import yfinance as yf
 
 nombre = "Stock Screener"
-descripcion = "Plugin que ejecuta un screening usando yfinance.screen y muestra solo Symbol y regularMarketChangePercent formateado."
+descripcion = "Plugin que ejecuta un screening usando yfinance.screen (o el motor local sobre el universo en caché) y muestra Symbol y regularMarketChangePercent formateado."
 tipo = "screen"
 
 default_config = {
@@ -18,6 +17,8 @@ default_config = {
 }
 
 def config(current_config: dict) -> dict:
+    import yfinance as yf
+
     st.write("### Configuración del Stock Screener")
     query_mode_default = current_config.get("query_mode", default_config["query_mode"])
     custom_query_default = current_config.get("custom_query", default_config["custom_query"])
@@ -32,7 +33,7 @@ def config(current_config: dict) -> dict:
     except Exception:
         predefined_queries = ["most_actives", "day_gainers", "day_losers"]
 
-    query_options = predefined_queries + ["custom"]
+    query_options = predefined_queries + ["custom", "local"]
     if query_mode_default not in query_options:
         query_mode_default = query_options[0]
     
@@ -40,12 +41,16 @@ def config(current_config: dict) -> dict:
         "Consulta predefinida",
         options=query_options,
         index=query_options.index(query_mode_default),
-        help="Selecciona una consulta predefinida o 'custom' para ingresar una consulta manual."
+        help="Selecciona una consulta predefinida, 'custom' para ingresar una consulta manual o 'local' "
+             "para ejecutarla con el motor local sobre el universo en caché (sin consultar a Yahoo)."
     )
     
-    if selected_mode == "custom":
+    if selected_mode in ("custom", "local"):
         st.write("#### Consulta Personalizada")
         st.caption("Ejemplo: and(region=us, intradaymarketcap>2000000000)")
+        if selected_mode == "local":
+            st.caption("En modo local también se pueden usar las columnas del universo de NASDAQ y campos "
+                       "calculados desde las velas, por ejemplo: and(sector=Technology, intradaymarketcap>1e10, rsi<30)")
         custom_query_val = st.text_area("Ingresa la consulta (cadena)", value=custom_query_default)
     else:
         custom_query_val = ""
@@ -66,31 +71,50 @@ def config(current_config: dict) -> dict:
         "height": height_val
     }
 
-def render(config: dict):
+def prefetch(config: dict):
+    """
+    Ejecuta la consulta de yfinance.screen configurada en el widget. No usa Streamlit,
+    por lo que el dashboard puede ejecutarla en un hilo aparte.
+    """
+    query_mode = config.get("query_mode", default_config["query_mode"])
+    if query_mode == "local":
+        from utils.screener_engine import screen
+
+        return screen(
+            config.get("custom_query", default_config["custom_query"]),
+            sort_field=config.get("sortField", default_config["sortField"]) or None,
+            sort_asc=config.get("sortAsc", default_config["sortAsc"]),
+            offset=config.get("offset", default_config["offset"]),
+            size=config.get("size", default_config["size"]),
+        )
+
+    # yfinance se importa recién aquí: el modo local no lo necesita
+    import yfinance as yf
+
+    if query_mode == "custom":
+        sortField_val = config.get("sortField", default_config["sortField"])
+        return yf.screen(
+            query=config.get("custom_query", default_config["custom_query"]),
+            offset=config.get("offset", default_config["offset"]),
+            size=config.get("size", default_config["size"]),
+            sortField=sortField_val if sortField_val else None,
+            sortAsc=config.get("sortAsc", default_config["sortAsc"])
+        )
+    return yf.screen(query_mode)
+
+def render(config: dict, data=None):
     st.write(f"Screener: {config.get('query_mode', 'most_actives')}")
     
-    query_mode = config.get("query_mode", default_config["query_mode"])
-    custom_query = config.get("custom_query", default_config["custom_query"])
-    offset_val = config.get("offset", default_config["offset"])
-    size_val = config.get("size", default_config["size"])
-    sortField_val = config.get("sortField", default_config["sortField"])
-    sortAsc_val = config.get("sortAsc", default_config["sortAsc"])
     height_val = int(config.get("height", default_config["height"]))-81  # Ajustar altura para evitar scroll
 
-    try:
-        if query_mode == "custom":
-            response = yf.screen(
-                query=custom_query,
-                offset=offset_val,
-                size=size_val,
-                sortField=sortField_val if sortField_val else None,
-                sortAsc=sortAsc_val
-            )
-        else:
-            response = yf.screen(query_mode)
-    except Exception as e:
-        st.error(f"Error al ejecutar la consulta: {e}")
-        return
+    # Usar la respuesta obtenida por el dashboard (prefetch) o ejecutar la consulta aquí
+    response = data
+    if response is None:
+        try:
+            response = prefetch(config)
+        except Exception as e:
+            st.error(f"Error al ejecutar la consulta: {e}")
+            return
 
     # Convertir la respuesta a DataFrame
     if isinstance(response, pd.DataFrame):
@@ -107,8 +131,15 @@ def render(config: dict):
         st.write(response)
         return
 
-    # Filtrar solo las columnas mínimas importantes
+    # Filtrar solo las columnas mínimas importantes (en modo local, también los campos de la consulta)
     columns_to_show = ["symbol", "regularMarketChangePercent"]
+    if config.get("query_mode") == "local":
+        from utils.screener_engine import COLUMNAS_RESULTADO
+
+        columns_to_show += [col for col in df.columns if col not in COLUMNAS_RESULTADO.values()]
+        total = df.attrs.get("total", len(df))
+        offset = int(config.get("offset", default_config["offset"]))
+        st.caption(f"{total:,} coincidencias (mostrando {offset + 1 if len(df) else 0}–{offset + len(df)})")
     missing_cols = [col for col in columns_to_show if col not in df.columns]
     if missing_cols:
         st.error(f"Las siguientes columnas no están presentes en los resultados: {missing_cols}")
@@ -1,9 +1,10 @@
 import requests
 import pandas as pd
 import streamlit as st
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
+from st_aggrid import GridUpdateMode
 from st_aggrid.shared import JsCode
 from io import BytesIO
+from utils.paged_grid import render_grid
 
 # Información básica del plugin
 nombre = "NASDAQ Stocks Plugin"
@@ -16,8 +17,8 @@ def get_parametros_config():
     """
     return {
         "limit": {
-            "label": "Número de acciones a obtener",
-            "default": 25,
+            "label": "Número de acciones a obtener (las de mayor market cap; vacío para todas)",
+            "default": None,
         },
         "columns": {
             "label": "Columnas para mostrar (lista)",
@@ -37,40 +38,33 @@ def get_parametros_config():
         },
     }
 
-def obtener_datos_nasdaq(limit):
+def prefetch(config):
     """
-    Obtiene datos de la API de NASDAQ.
+    Obtiene el universo de acciones de NASDAQ desde el último snapshot local (ya tipado), sin
+    usar Streamlit. Si la configuración tiene 'limit', retorna solo las de mayor market cap.
+
+    Raises:
+        requests.RequestException: Si no hay snapshots y la descarga falla.
     """
-    url = f"https://api.nasdaq.com/api/screener/stocks?tableonly=false&limit={limit}&download=true"
-    headers = {
-        'accept': 'application/json, text/plain, */*',
-        'accept-language': 'es-ES,es;q=0.9',
-        'origin': 'https://www.nasdaq.com',
-        'priority': 'u=1, i',
-        'referer': 'https://www.nasdaq.com/',
-        'sec-ch-ua': '"Not A(Brand";v="8", "Chromium";v="132", "Google Chrome";v="132"',
-        'sec-ch-ua-mobile': '?0',
-        'sec-ch-ua-platform': '"Windows"',
-        'sec-fetch-dest': 'empty',
-        'sec-fetch-mode': 'cors',
-        'sec-fetch-site': 'same-site',
-        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36'
-    }
+    from models.datasource import nasdaq_universe
 
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        st.error(f"No se pudo obtener la información de NASDAQ. Código de estado: {response.status_code}")
-        return pd.DataFrame()
+    df = nasdaq_universe.universo()
+    limit = config.get("limit")
+    if limit:
+        df = df.nlargest(int(limit), "marketCap")
+    return df
 
-    data = response.json().get("data", {})
-    rows = data.get("rows", [])
-    if not rows:
-        st.warning("No se encontraron datos en la API de NASDAQ.")
+def obtener_datos_nasdaq(limit=None):
+    """
+    Obtiene el universo de acciones de NASDAQ desde el último snapshot local (ya tipado).
+    Si se indica 'limit', retorna solo las 'limit' de mayor market cap.
+    """
+    try:
+        return prefetch({"limit": limit})
+    except requests.RequestException as e:
+        st.error(f"No se pudo obtener la información de NASDAQ: {e}")
         return pd.DataFrame()
 
-    df = pd.DataFrame(rows)
-    return df
-
 def to_excel(df):
     """
     Convierte un DataFrame de pandas a un archivo Excel en memoria.
@@ -81,16 +75,59 @@ def to_excel(df):
     processed_data = output.getvalue()
     return processed_data
 
-def render(config):
+def render_filtros(df):
+    """Filtros del universo (sector, market cap y variación diaria), resueltos sobre el snapshot local."""
+    from models.datasource import nasdaq_universe
+
+    col1, col2, col3 = st.columns(3)
+    sectores = col1.multiselect("Sector", options=sorted(df["sector"].dropna().unique()), key="nasdaq_sectores")
+    market_cap_min = col2.number_input("Market cap mínimo (miles de millones USD)", min_value=0.0, value=0.0, step=1.0, key="nasdaq_mcap")
+    pct_min, pct_max = col3.slider("Variación diaria %", min_value=-50.0, max_value=50.0, value=(-50.0, 50.0), step=0.5, key="nasdaq_pct")
+    return nasdaq_universe.consultar(
+        df,
+        sectores=sectores,
+        market_cap_min=market_cap_min * 1e9 if market_cap_min else None,
+        pct_min=pct_min if pct_min > -50 else None,
+        pct_max=pct_max if pct_max < 50 else None,
+    )
+
+def render_diferencias():
+    """Altas, bajas y cambios de sector/industria entre los dos últimos snapshots."""
+    from models.datasource import nasdaq_universe
+
+    cambios = nasdaq_universe.ultimas_diferencias(columnas=["name", "sector", "industry", "country"])
+    if cambios is None:
+        return
+    resumen = f"{len(cambios['altas'])} altas, {len(cambios['bajas'])} bajas, {len(cambios['cambios'])} cambios"
+    with st.expander(f"Cambios del universo desde {cambios['desde']:%d/%m %H:%M} ({resumen})"):
+        if not cambios["altas"].empty:
+            st.write("**Altas**")
+            st.dataframe(cambios["altas"][["symbol", "name", "sector", "marketCap"]], hide_index=True)
+        if not cambios["bajas"].empty:
+            st.write("**Bajas**")
+            st.dataframe(cambios["bajas"][["symbol", "name", "sector", "marketCap"]], hide_index=True)
+        if not cambios["cambios"].empty:
+            st.write("**Cambios**")
+            st.dataframe(cambios["cambios"].astype("string"), hide_index=True)
+
+def render(config, data=None):
     """
-    Renderiza el plugin en Streamlit.
+    Renderiza el plugin en Streamlit. Si se recibe 'data' (resultado de prefetch, por ejemplo
+    desde el servicio de screeners) se usa directamente.
     """
-    limit = config.get("limit", 25)
+    from models.datasource import nasdaq_universe
+
+    limit = config.get("limit")
 
     st.subheader("NASDAQ Stocks")
-    df = obtener_datos_nasdaq(limit)
+    df = obtener_datos_nasdaq(limit) if data is None else data
 
     if not df.empty:
+        guardados = nasdaq_universe.snapshots()
+        if guardados:
+            st.caption(f"Snapshot local del {nasdaq_universe.fecha_snapshot(guardados[-1]):%d/%m/%Y %H:%M} ({len(df):,} acciones).")
+        render_diferencias()
+        df = render_filtros(df)
 
         # Definir código JS para estilizar celdas
         cell_style_jscode = JsCode("""
@@ -106,28 +143,16 @@ def render(config):
             }
         """)
 
-        # Configurar AgGrid sin filtros en la barra lateral
-        gb = GridOptionsBuilder.from_dataframe(df)
-        gb.configure_pagination(enabled=True, paginationAutoPageSize=True)  # Paginación con 100 filas por página
-        gb.configure_side_bar()  # Barra lateral para filtros adicionales de AgGrid
-        gb.configure_default_column(filter=True, sortable=True, resizable=True)  # Columnas filtrables, ordenables y resizables
-
-        # Aplicar estilos condicionales a columnas numéricas
-        numeric_columns = df.select_dtypes(include=['float', 'int']).columns.tolist()
-        for col in numeric_columns:
-            gb.configure_column(col, cellStyle=cell_style_jscode)
-
-        gridOptions = gb.build()
-
-        # Establecer una altura fija con scroll vertical
-        grid_height = 750  # Puedes ajustar este valor según tus necesidades
+        # Grilla paginada en el servidor: al navegador solo se envía la página visible
+        def configurar(gb):
+            # Aplicar estilos condicionales a columnas numéricas
+            for col in ["netchange", "pctchange"]:
+                gb.configure_column(col, cellStyle=cell_style_jscode)
 
-        # Renderizar AgGrid
-        grid_response = AgGrid(
+        render_grid(
             df,
-            gridOptions=gridOptions,
-            height=grid_height,  # Altura fija para manejar scroll
-            width='100%',
+            key="nasdaq_grid",
+            configurar=configurar,
             update_mode=GridUpdateMode.NO_UPDATE,  # Ajusta según necesites
             allow_unsafe_jscode=True,  # Permitir código JS personalizado si es necesario
         )
@@ -3,9 +3,11 @@ import json
 import pandas as pd
 import streamlit as st
 from bs4 import BeautifulSoup
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
+from st_aggrid import GridUpdateMode
 from st_aggrid.shared import JsCode
 from io import BytesIO
+from utils import http_cache
+from utils.paged_grid import render_grid
 
 # Información básica del plugin
 nombre = "TradingView Watchlist Plugin"
@@ -36,7 +38,9 @@ def render_config(screener_config):
         "Perf.Y", "Perf.5Y", "Perf.All", "Recommend.All", "beta_1_year",
         "beta_3_year", "beta_5_year", "Volatility.D",
         "Volatility.W", "Volatility.M", "Recommend.MA",
-        "Recommend.Other", "RSI", "Mom", "AO", "CCI20"
+        "Recommend.Other", "RSI", "Mom", "AO", "CCI20",
+        # Columnas propias (se calculan localmente, ver utils.watchlist_analytics)
+        "Perf.6M", "Dist.SMA50", "Dist.SMA200", "Dist.52W.High"
     ]
     # Obtener el valor actual; si no existe, usar una lista por defecto
     default_columns = ["close","Perf.W", "Perf.1M", "Perf.3M", "Perf.YTD", "Perf.Y", "Perf.5Y", "Recommend.All"]
@@ -53,30 +57,95 @@ def render_config(screener_config):
     )
     screener_config["columns"] = selected_columns
 
+    # Calcular las columnas desde las velas en caché (el scanner queda como respaldo)
+    screener_config["calculo_local"] = st.checkbox(
+        "Calcular localmente desde las velas en caché",
+        value=screener_config.get("calculo_local", True),
+        key="calculo_local_config",
+        help="Las columnas que no se pueden calcular localmente (Recommend.*) y los símbolos sin velas se piden al scanner de TradingView."
+    )
 
-def obtener_watchlist_symbols(url):
-    """
-    Extrae los símbolos de una watchlist pública de TradingView desde la URL proporcionada.
+
+SCANNER_URL = "https://scanner.tradingview.com/global/scan?label-product=popup-watchlists"
+
+SCANNER_HEADERS = {
+    "Content-Type": "text/plain;charset=UTF-8",
+    "Origin": "https://www.tradingview.com",
+    "Referer": "https://www.tradingview.com/",
+    "User-Agent": "Mozilla/5.0",
+}
+
+def parsear_watchlist(html):
     """
-    response = requests.get(url)
-    if response.status_code != 200:
-        st.error(f"No se pudo obtener la watchlist. Código de estado: {response.status_code}")
-        return []
+    Extrae los símbolos del HTML de una watchlist pública de TradingView (sin usar Streamlit).
 
+    Raises:
+        ValueError: Si no se encuentra el bloque JSON o no se puede procesar.
+    """
     # Parsear el contenido HTML con Beautiful Soup
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = BeautifulSoup(html, 'html.parser')
 
     # Buscar el bloque JSON dentro del <script>
     script_tag = soup.find('script', {'type': 'application/prs.init-data+json'})
     if not script_tag:
-        st.error("No se encontró el bloque JSON en la página proporcionada. Verifica si la estructura de la página cambió.")
+        raise ValueError("No se encontró el bloque JSON en la página proporcionada. Verifica si la estructura de la página cambió.")
+
+    # Extraer el contenido del <script> y cargar el JSON (JSONDecodeError es un ValueError)
+    json_data = json.loads(script_tag.string)
+    return json_data.get("sharedWatchlist", {}).get("list", {}).get("symbols", [])
+
+def consultar_scanner(symbols, columns):
+    """
+    Consulta el scanner de TradingView con los símbolos indicados (sin usar Streamlit).
+
+    Returns:
+        pd.DataFrame: Columna "Símbolo" más las columnas pedidas; vacío si no hay datos.
+
+    Raises:
+        requests.RequestException: Si la petición falla.
+    """
+    payload = {
+        "columns": columns,
+        "symbols": {"tickers": symbols},
+    }
+    respuesta = http_cache.fetch("tradingview", SCANNER_URL, method="POST", json_body=payload, headers=SCANNER_HEADERS)
+    data = (respuesta or {}).get("data", []) or []
+    return pd.DataFrame([{"Símbolo": entry["s"], **dict(zip(columns, entry["d"]))} for entry in data])
+
+def prefetch(config):
+    """
+    Obtiene los datos de la watchlist sin usar Streamlit (se ejecuta en los hilos del servicio
+    de screeners): símbolos de la watchlist y columnas calculadas localmente o con el scanner.
+
+    Raises:
+        ValueError: Si no hay URL o la página de la watchlist no tiene el formato esperado.
+        requests.RequestException: Si falla la descarga de la watchlist o del scanner.
+    """
+    url = config.get("url", "")
+    columns = [col.strip() for col in config.get("columns", [])]
+    if not url:
+        raise ValueError("No se proporcionó una URL válida.")
+
+    symbols = parsear_watchlist(http_cache.fetch("tradingview_watchlist", url, parse="text"))
+    if not symbols:
+        return pd.DataFrame()
+    if config.get("calculo_local", True):
+        from utils.watchlist_analytics import analizar_watchlist
+        return analizar_watchlist(symbols, columns, respaldo=consultar_scanner)
+    return consultar_scanner(symbols, columns)
+
+def obtener_watchlist_symbols(url):
+    """
+    Extrae los símbolos de una watchlist pública de TradingView desde la URL proporcionada.
+    """
+    try:
+        html = http_cache.fetch("tradingview_watchlist", url, parse="text")
+    except requests.RequestException as e:
+        st.error(f"No se pudo obtener la watchlist: {e}")
         return []
 
     try:
-        # Extraer el contenido del <script> y cargar el JSON
-        raw_json = script_tag.string
-        json_data = json.loads(raw_json)
-        symbols = json_data.get("sharedWatchlist", {}).get("list", {}).get("symbols", [])
+        symbols = parsear_watchlist(html)
         if symbols:
             st.success(f"Se encontraron {len(symbols)} símbolos.")
         else:
@@ -85,6 +154,9 @@ def obtener_watchlist_symbols(url):
     except json.JSONDecodeError as e:
         st.error(f"Error al procesar el JSON de la watchlist: {e}")
         return []
+    except ValueError as e:
+        st.error(str(e))
+        return []
     except Exception as e:
         st.error(f"Error inesperado al procesar la watchlist: {e}")
         return []
@@ -93,31 +165,15 @@ def obtener_datos_tradingview(symbols, columns):
     """
     Consulta la API de TradingView con los símbolos obtenidos.
     """
-    url = "https://scanner.tradingview.com/global/scan?label-product=popup-watchlists"
-    payload = {
-        "columns": columns,
-        "symbols": {"tickers": symbols},
-    }
-
-    headers = {
-        "Content-Type": "text/plain;charset=UTF-8",
-        "Origin": "https://www.tradingview.com",
-        "Referer": "https://www.tradingview.com/",
-        "User-Agent": "Mozilla/5.0",
-    }
-    response = requests.post(url, json=payload, headers=headers)
-
-    if response.status_code != 200:
+    try:
+        df = consultar_scanner(symbols, columns)
+    except requests.RequestException as e:
         st.error("No se pudo obtener la información de TradingView.")
-        st.error(f"Código de estado: {response.text}")
+        st.error(f"Detalle: {e}")
         return pd.DataFrame()
 
-    data = response.json().get("data", [])
-    if not data:
+    if df.empty:
         st.warning("No se encontraron datos para los símbolos proporcionados.")
-        return pd.DataFrame()
-
-    df = pd.DataFrame([{"Símbolo": entry["s"], **dict(zip(payload["columns"], entry["d"]))} for entry in data])
     return df
 
 def to_excel(df):
@@ -130,74 +186,107 @@ def to_excel(df):
     processed_data = output.getvalue()
     return processed_data
 
-def render(config):
+def render_heatmap(df):
+    """
+    Mapa de calor de los rendimientos (columnas Perf.*) de la watchlist, un símbolo por fila.
+    """
+    import plotly.express as px
+
+    columnas_perf = [col for col in df.columns if col.startswith("Perf.")]
+    if not columnas_perf:
+        return
+    with st.expander("Mapa de calor de rendimientos", expanded=True):
+        matriz = df.set_index("Símbolo")[columnas_perf].apply(pd.to_numeric, errors="coerce")
+        orden = st.selectbox("Ordenar por", options=columnas_perf, key="heatmap_orden")
+        matriz = matriz.sort_values(orden, ascending=False)
+        # Escala simétrica alrededor de 0 para que verde y rojo sean comparables
+        limite = matriz.abs().quantile(0.95).max()
+        limite = float(limite) if pd.notna(limite) and limite > 0 else 1.0
+        fig = px.imshow(
+            matriz,
+            color_continuous_scale="RdYlGn",
+            zmin=-limite,
+            zmax=limite,
+            aspect="auto",
+            text_auto=".1f",
+        )
+        fig.update_layout(height=max(300, 22 * len(matriz)), coloraxis_colorbar_title="%")
+        st.plotly_chart(fig, use_container_width=True)
+
+def obtener_datos(config):
     """
-    Renderiza el plugin en Streamlit.
+    Obtiene los datos de la watchlist mostrando el progreso y los errores en Streamlit.
+    Retorna None si no se pudieron obtener los símbolos.
     """
     url = config.get("url", "")
     columns = [col.strip() for col in config.get("columns", [])]  # Maneja 'columns' como lista
 
     if not url:
         st.error("No se proporcionó una URL válida.")
-        return
+        return None
 
     symbols = obtener_watchlist_symbols(url)
+    if not symbols:
+        st.warning("No se encontraron símbolos en la watchlist proporcionada.")
+        return None
+
+    st.write(f"Se encontraron {len(symbols)} símbolos en la watchlist.")
+    if config.get("calculo_local", True):
+        from utils.watchlist_analytics import analizar_watchlist
+        return analizar_watchlist(symbols, columns, respaldo=obtener_datos_tradingview)
+    return obtener_datos_tradingview(symbols, columns)
 
-    if symbols:
-        st.write(f"Se encontraron {len(symbols)} símbolos en la watchlist.")
-        df = obtener_datos_tradingview(symbols, columns)
-
-        if not df.empty:
-            # Definir código JS para estilizar celdas
-            cell_style_jscode = JsCode("""
-                function(params) {
-                    if (typeof params.value === 'number') {
-                        if (params.value > 0) {
-                            return { 'color': 'green' };
-                        } else if (params.value < 0) {
-                            return { 'color': 'red' };
-                        }
+def render(config, data=None):
+    """
+    Renderiza el plugin en Streamlit. Si se recibe 'data' (resultado de prefetch, por ejemplo
+    desde el servicio de screeners) se usa directamente.
+    """
+    df = obtener_datos(config) if data is None else data
+    if df is None:
+        return
+
+    if not df.empty:
+        if data is not None:
+            st.write(f"{len(df)} símbolos en la watchlist.")
+        render_heatmap(df)
+
+        # Definir código JS para estilizar celdas
+        cell_style_jscode = JsCode("""
+            function(params) {
+                if (typeof params.value === 'number') {
+                    if (params.value > 0) {
+                        return { 'color': 'green' };
+                    } else if (params.value < 0) {
+                        return { 'color': 'red' };
                     }
-                    return null;
                 }
-            """)
-
-            # Configurar AgGrid sin filtros en la barra lateral
-            gb = GridOptionsBuilder.from_dataframe(df)
-            gb.configure_pagination(enabled=True, paginationAutoPageSize=True)  # Paginación con 100 filas por página
-            gb.configure_side_bar()  # Barra lateral para filtros adicionales de AgGrid
-            gb.configure_default_column(filter=True, sortable=True, resizable=True)  # Columnas filtrables, ordenables y resizables
+                return null;
+            }
+        """)
 
+        # Grilla paginada en el servidor: al navegador solo se envía la página visible
+        def configurar(gb):
             # Aplicar estilos condicionales a columnas numéricas
             numeric_columns = df.select_dtypes(include=['float', 'int']).columns.tolist()
             for col in numeric_columns:
                 gb.configure_column(col, cellStyle=cell_style_jscode)
 
-            gridOptions = gb.build()
-
-            # Establecer una altura fija con scroll vertical
-            grid_height = 750  # Puedes ajustar este valor según tus necesidades
-
-            # Renderizar AgGrid
-            grid_response = AgGrid(
-                df,
-                gridOptions=gridOptions,
-                height=grid_height,  # Altura fija para manejar scroll
-                width='100%',
-                update_mode=GridUpdateMode.NO_UPDATE,  # Ajusta según necesites
-                allow_unsafe_jscode=True,  # Permitir código JS personalizado si es necesario
-            )
-
-            # Agregar un botón de descarga para exportar a Excel
-            st.markdown("### Exportar Datos")
-            excel_data = to_excel(df)
-            st.download_button(
-                label="Descargar como Excel",
-                data=excel_data,
-                file_name='watchlist.xlsx',
-                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-        else:
-            st.warning("El DataFrame está vacío.")
+        render_grid(
+            df,
+            key="tv_watchlist_grid",
+            configurar=configurar,
+            update_mode=GridUpdateMode.NO_UPDATE,  # Ajusta según necesites
+            allow_unsafe_jscode=True,  # Permitir código JS personalizado si es necesario
+        )
+
+        # Agregar un botón de descarga para exportar a Excel
+        st.markdown("### Exportar Datos")
+        excel_data = to_excel(df)
+        st.download_button(
+            label="Descargar como Excel",
+            data=excel_data,
+            file_name='watchlist.xlsx',
+            mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
     else:
-        st.warning("No se encontraron símbolos en la watchlist proporcionada.")
+        st.warning("El DataFrame está vacío.")
@@ -4,12 +4,12 @@ tipo = "stock"
 
 def render(ticker):
     import streamlit as st
-    import yfinance as yf
     import pandas as pd
     import datetime as dt
     from streamlit_lightweight_charts import renderLightweightCharts
     from streamlit_theme import st_theme
-    from utils.flatten_columns import flatten_columns
+    from models.datasource.market_data import get_ohlcv
+    from utils.lightweight_series import candle_data, compactar_charts, PUNTOS_MAXIMOS
     from plugins.stocks.alwcharts.indicators.load_indicators import load_indicators
 
     theme = st_theme()
@@ -44,10 +44,15 @@ def render(ticker):
         index=8,
         help="Selecciona el intervalo de tiempo para los datos históricos."
     )
+    max_points = st.sidebar.number_input(
+        "Resolución máxima (puntos por serie)",
+        min_value=200, max_value=20000, value=PUNTOS_MAXIMOS, step=100,
+        help="Ancho aproximado del gráfico en píxeles. Con más velas que esto, se agrupan para "
+             "dibujarlas (los indicadores se calculan siempre con todas las velas)."
+    )
 
     with st.spinner("Cargando datos históricos..."):
-        data = yf.download(ticker, start=start_date, end=end_datetime, interval=interval)
-        data = flatten_columns(data)
+        data = get_ohlcv(ticker, start=start_date, end=end_datetime, interval=interval)
 
     if data.empty:
         st.warning(f"No se encontraron datos para el ticker {ticker} en el rango de fechas seleccionado.")
@@ -57,16 +62,7 @@ def render(ticker):
     time_column = "Datetime" if interval in ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"] else "Date"
     data.rename(columns={time_column: "Fecha"}, inplace=True)
 
-    candles = []
-    for _, row in data.iterrows():
-        time_val = int(row["Fecha"].timestamp())
-        candles.append({
-            "time": time_val,
-            "open": float(row["Open"]),
-            "high": float(row["High"]),
-            "low": float(row["Low"]),
-            "close": float(row["Close"])
-        })
+    candles = candle_data(data)
 
     charts_config = [
         {
@@ -114,5 +110,8 @@ def render(ticker):
                 user_params["ticker"] = ticker
             plug.apply(charts_config, data, user_params)
 
+    # Reducir los payloads al ancho visible antes de enviarlos al navegador
+    compactar_charts(charts_config, max_points=int(max_points))
+
     st.subheader("Gráfico Candlestick")
     renderLightweightCharts(charts_config, key="myCandlestickChart")
@@ -1,5 +1,7 @@
 import streamlit as st
 import pandas as pd
+from utils.lightweight_series import to_epoch, line_data, constant_data
+from utils import indicator_engine
 
 """
 Plugin que agrega el DeMarker (Tom Demark) al gráfico.
@@ -45,6 +47,18 @@ def get_user_params(data: pd.DataFrame) -> dict:
         "opacity": opacity
     }
 
+def calcular_demarker(data: pd.DataFrame, period: int) -> pd.Series:
+    """
+    Cálculo puro del DeMarker (sin parámetros de estilo, para poder memoizarlo).
+    """
+    dem_up = data["High"].diff().clip(lower=0)
+    dem_down = -data["Low"].diff().clip(upper=0)
+
+    dem_up_sum = dem_up.rolling(window=period, min_periods=1).sum()
+    dem_down_sum = dem_down.rolling(window=period, min_periods=1).sum()
+
+    return dem_up_sum / (dem_up_sum + dem_down_sum)
+
 def apply(charts_config: list, data, user_params: dict):
     """
     Calcula el indicador DeMarker y lo añade como una serie de tipo 'Baseline' en charts_config.
@@ -92,28 +106,17 @@ def apply(charts_config: list, data, user_params: dict):
 
     period = user_params["period"]
 
-    # --- Cálculo del DeMarker ---
-    dem_up = data["High"].diff().clip(lower=0)
-    dem_down = -data["Low"].diff().clip(upper=0)
-
-    dem_up_sum = dem_up.rolling(window=period, min_periods=1).sum()
-    dem_down_sum = dem_down.rolling(window=period, min_periods=1).sum()
-
-    data["DeMarker"] = dem_up_sum / (dem_up_sum + dem_down_sum)
+    # --- Cálculo del DeMarker (memoizado por datos y periodo) ---
+    data["DeMarker"] = indicator_engine.compute("demarker", data, calcular_demarker, period=period)
 
     # --- Datos para el gráfico principal (Baseline) ---
-    demarker_data = []
-    for _, row in data.iterrows():
-        if pd.notna(row["DeMarker"]):
-            time_val = int(row["Fecha"].timestamp())
-            demarker_data.append({"time": time_val, "value": float(row["DeMarker"])})
+    times = to_epoch(data["Fecha"])
+    demarker_data = line_data(times, data["DeMarker"])
 
     # --- Líneas horizontales en 0.3 y 0.7 ---
-    horizontal_line_03_data = []
-    horizontal_line_07_data = []
-    for point in demarker_data:
-        horizontal_line_03_data.append({"time": point["time"], "value": 0.3})
-        horizontal_line_07_data.append({"time": point["time"], "value": 0.7})
+    demarker_times = times[data["DeMarker"].notna().to_numpy()]
+    horizontal_line_03_data = constant_data(demarker_times, 0.3)
+    horizontal_line_07_data = constant_data(demarker_times, 0.7)
 
     # --- Configuración del gráfico ---
     demarker_chart = {
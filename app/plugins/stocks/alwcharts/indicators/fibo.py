@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from utils.lightweight_series import to_epoch, constant_data
 
 """
 Plugin que calcula y dibuja niveles de retrocesos de Fibonacci sobre el gráfico de velas.
@@ -116,16 +117,10 @@ def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
     rgba_color = f"rgba({r}, {g}, {b}, {opacity})"
 
     # Para cada nivel de Fibonacci se calcula el precio correspondiente y se traza una línea horizontal
+    times = to_epoch(data["Fecha"])
     for lvl in levels:
         price = high - diff * lvl
-        fib_data = []
-        for _, row in data.iterrows():
-            if pd.notna(row["Fecha"]):
-                time_val = int(row["Fecha"].timestamp())
-                fib_data.append({
-                    "time": time_val,
-                    "value": price
-                })
+        fib_data = constant_data(times, price)
         charts_config[0]["series"].append({
             "type": "Line",
             "data": fib_data,
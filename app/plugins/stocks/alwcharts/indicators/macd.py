@@ -2,6 +2,8 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+from utils.lightweight_series import to_epoch, line_data, histogram_data
+from utils import indicator_engine
 
 name = "MACD"
 description = "Muestra el MACD, su señal y su histograma en un panel separado debajo del gráfico principal."
@@ -48,6 +50,20 @@ def get_user_params(data: pd.DataFrame) -> dict:
         "color_hist_down": color_hist_down,
     }
 
+def calcular_macd(data: pd.DataFrame, fast_period: int, slow_period: int, signal_period: int) -> pd.DataFrame:
+    """
+    Cálculo puro del MACD (sin parámetros de estilo, para poder memoizarlo).
+    Retorna un DataFrame con EMA_fast, EMA_slow, MACD, MACD_signal y MACD_hist.
+    """
+    result = pd.DataFrame(index=data.index)
+    result["EMA_fast"] = data["Close"].ewm(span=fast_period, adjust=False).mean()
+    result["EMA_slow"] = data["Close"].ewm(span=slow_period, adjust=False).mean()
+
+    result["MACD"] = result["EMA_fast"] - result["EMA_slow"]
+    result["MACD_signal"] = result["MACD"].ewm(span=signal_period, adjust=False).mean()
+    result["MACD_hist"] = result["MACD"] - result["MACD_signal"]
+    return result
+
 def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
     """
     Calcula y dibuja MACD, línea de señal e histograma en un panel separado (similar a Volumen).
@@ -72,44 +88,21 @@ def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
         st.warning("El periodo rápido debería ser menor al periodo lento para un MACD típico.")
         return
 
-    # Cálculo del MACD
-    data["EMA_fast"] = data["Close"].ewm(span=fast_period, adjust=False).mean()
-    data["EMA_slow"] = data["Close"].ewm(span=slow_period, adjust=False).mean()
-
-    data["MACD"] = data["EMA_fast"] - data["EMA_slow"]
-    data["MACD_signal"] = data["MACD"].ewm(span=signal_period, adjust=False).mean()
-    data["MACD_hist"] = data["MACD"] - data["MACD_signal"]
-
-    macd_line = []
-    signal_line = []
-    histogram_bars = []
-
-    for _, row in data.iterrows():
-        time_val = int(row["Fecha"].timestamp())
-
-        # MACD
-        if pd.notna(row["MACD"]):
-            macd_line.append({
-                "time": time_val,
-                "value": float(row["MACD"])
-            })
-
-        # Señal
-        if pd.notna(row["MACD_signal"]):
-            signal_line.append({
-                "time": time_val,
-                "value": float(row["MACD_signal"])
-            })
-
-        # Histograma
-        if pd.notna(row["MACD_hist"]):
-            hist_value = float(row["MACD_hist"])
-            color = color_hist_up if hist_value >= 0 else color_hist_down
-            histogram_bars.append({
-                "time": time_val,
-                "value": hist_value,
-                "color": color
-            })
+    # Cálculo del MACD (memoizado por datos y periodos)
+    macd = indicator_engine.compute(
+        "macd", data, calcular_macd,
+        fast_period=fast_period, slow_period=slow_period, signal_period=signal_period
+    )
+    for col in macd.columns:
+        data[col] = macd[col]
+
+    times = to_epoch(data["Fecha"])
+    macd_line = line_data(times, data["MACD"])
+    signal_line = line_data(times, data["MACD_signal"])
+
+    # Histograma: color según el signo de cada barra
+    hist_colors = np.where(data["MACD_hist"].to_numpy() >= 0, color_hist_up, color_hist_down)
+    histogram_bars = histogram_data(times, data["MACD_hist"], hist_colors)
 
     # Crear un nuevo panel, similar al plugin de Volumen
     macd_chart = {
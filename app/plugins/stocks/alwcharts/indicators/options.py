@@ -2,6 +2,8 @@ import streamlit as st
 import requests
 import datetime
 import pandas as pd
+from utils.lightweight_series import to_epoch, constant_data
+from utils import options_analytics
 
 @st.cache_data(ttl=600)
 def fetch_options_data(ticker="NVDA", fromdate="all", todate="undefined"):
@@ -56,19 +58,9 @@ def calculate_max_pain(strikes, call_oi, put_oi):
     Se considera para cada strike candidato X:
         pérdida_call = sum( max(0, X - strike_i) * call_oi_i )
         pérdida_put  = sum( max(0, strike_i - X) * put_oi_i )
-    El strike con la suma mínima es el max pain.
+    El strike con la suma mínima es el max pain (ver utils.options_analytics).
     """
-    pain_dict = {}
-    for x in strikes:
-        total_pain = 0
-        for strike, c, p in zip(strikes, call_oi, put_oi):
-            call_loss = max(0, x - strike) * c
-            put_loss = max(0, strike - x) * p
-            total_pain += call_loss + put_loss
-        pain_dict[x] = total_pain
-    # Retornamos el strike con menor dolor
-    max_pain_strike = min(pain_dict, key=pain_dict.get)
-    return max_pain_strike
+    return options_analytics.max_pain(strikes, call_oi, put_oi)
 
 def get_user_params(data: pd.DataFrame) -> dict:
     with st.sidebar.expander("Parámetros - Key Option Levels", expanded=False):
@@ -134,72 +126,45 @@ def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
     if not options_json:
         return
 
-    rows = options_json.get("data", {}).get("table", {}).get("rows", [])
-    option_rows = [r for r in rows if r.get("strike")]
-
-    strike_list = []
-    call_oi_list = []
-    put_oi_list = []
-
-    for row in option_rows:
-        strike_str = row.get("strike", "").replace("--", "0")
-        try:
-            strike_val = float(strike_str)
-        except:
-            continue
-        c_oi_str = row.get("c_Openinterest", "0").replace("--", "0")
-        p_oi_str = row.get("p_Openinterest", "0").replace("--", "0")
-        try:
-            c_oi = float(c_oi_str)
-        except:
-            c_oi = 0.0
-        try:
-            p_oi = float(p_oi_str)
-        except:
-            p_oi = 0.0
-        strike_list.append(strike_val)
-        call_oi_list.append(c_oi)
-        put_oi_list.append(p_oi)
-
-    if not strike_list:
+    rows = options_json.get("data", {}).get("table", {}).get("rows", []) or []
+    chain = options_analytics.parse_option_chain(rows)
+
+    if chain.empty:
         st.warning("No se encontraron datos de opciones para el ticker seleccionado.")
         return
 
+    strikes = chain["strike"].to_numpy()
+    call_oi = chain["call_oi"].to_numpy()
+    put_oi = chain["put_oi"].to_numpy()
+
     # Calcular niveles de Open Interest
     max_call_oi_strike = None
     second_call_oi_strike = None
-    if user_params["show_call_oi"] and any(call_oi_list):
-        sorted_call_indices = sorted(range(len(call_oi_list)), key=lambda i: call_oi_list[i], reverse=True)
-        max_call_oi_strike = strike_list[sorted_call_indices[0]]
-        if len(sorted_call_indices) > 1:
-            second_call_oi_strike = strike_list[sorted_call_indices[1]]
+    if user_params["show_call_oi"]:
+        top_call = options_analytics.top_strikes(strikes, call_oi, k=2)
+        max_call_oi_strike, second_call_oi_strike = (top_call + [None, None])[:2]
 
     max_put_oi_strike = None
     second_put_oi_strike = None
-    if user_params["show_put_oi"] and any(put_oi_list):
-        sorted_put_indices = sorted(range(len(put_oi_list)), key=lambda i: put_oi_list[i], reverse=True)
-        max_put_oi_strike = strike_list[sorted_put_indices[0]]
-        if len(sorted_put_indices) > 1:
-            second_put_oi_strike = strike_list[sorted_put_indices[1]]
+    if user_params["show_put_oi"]:
+        top_put = options_analytics.top_strikes(strikes, put_oi, k=2)
+        max_put_oi_strike, second_put_oi_strike = (top_put + [None, None])[:2]
 
     max_total_oi_strike = None
     if user_params["show_total_oi"]:
-        total_oi_list = [c + p for c, p in zip(call_oi_list, put_oi_list)]
-        if any(total_oi_list):
-            idx_total = max(range(len(total_oi_list)), key=lambda i: total_oi_list[i])
-            max_total_oi_strike = strike_list[idx_total]
+        top_total = options_analytics.top_strikes(strikes, call_oi + put_oi, k=1)
+        if top_total:
+            max_total_oi_strike = top_total[0]
 
     # Calcular el max pain si se desea
     max_pain_strike = None
     if user_params.get("show_max_pain"):
-        max_pain_strike = calculate_max_pain(strike_list, call_oi_list, put_oi_list)
+        max_pain_strike = calculate_max_pain(strikes, call_oi, put_oi)
 
     # Extraer los timestamps de los datos para generar las líneas horizontales
-    timestamps = []
-    for _, row in data.iterrows():
-        if pd.notna(row["Fecha"]):
-            timestamps.append(int(row["Fecha"].timestamp()))
-    if not timestamps:
+    timestamps = to_epoch(data["Fecha"])
+    timestamps = timestamps[~pd.isna(timestamps)]
+    if len(timestamps) == 0:
         st.warning("No se pudieron extraer timestamps de los datos.")
         return
 
@@ -210,10 +175,9 @@ def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
         if y_value is None:
             return
         rgba_color = hex_to_rgba(color, base_opacity)
-        line_data = [{"time": ts, "value": y_value} for ts in timestamps]
         charts_config[0]["series"].append({
             "type": "Line",
-            "data": line_data,
+            "data": constant_data(timestamps, y_value),
             "options": {
                 "lineWidth": line_width,
                 "color": rgba_color,
@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+from utils.lightweight_series import to_epoch, line_data
+from utils import indicator_engine
 
 """
 Plugin que calcula una regresión lineal a partir de una fecha de inicio 
@@ -111,35 +113,45 @@ def get_user_params(data: pd.DataFrame) -> dict:
         "lower_name": lower_name
     }
 
-def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
-    if "Close" not in data.columns or "Fecha" not in data.columns:
-        st.warning("No se encontró la columna 'Close' o 'Fecha' en los datos. No se calculará la regresión.")
-        return
-
-    # Asegurarse de que la columna 'Fecha' esté en formato datetime
-    data["Fecha"] = pd.to_datetime(data["Fecha"])
-    
+def calcular_regresion(data: pd.DataFrame, start_date) -> tuple:
+    """
+    Cálculo puro de la regresión lineal desde start_date (sin parámetros de estilo).
+    Retorna (times, y_reg, std_residual) o None si no hay datos desde esa fecha.
+    """
     # Filtrar datos a partir de la fecha de inicio proporcionada
-    start_date = pd.to_datetime(user_params.get("start_date"))
-    filtered_data = data[data["Fecha"] >= start_date]
-    
+    filtered_data = data[pd.to_datetime(data["Fecha"]) >= pd.to_datetime(start_date)]
     if filtered_data.empty:
-        st.warning("No hay datos a partir de la fecha de inicio seleccionada.")
-        return
-    
+        return None
+
     # Convertir las fechas a valores numéricos (timestamp) para la regresión
-    x = filtered_data["Fecha"].apply(lambda dt: dt.timestamp()).values
+    times = to_epoch(filtered_data["Fecha"])
+    x = times.astype("float64")
     y = filtered_data["Close"].values
-    
+
     # Calcular la regresión lineal (pendiente y ordenada al origen)
     slope, intercept = np.polyfit(x, y, 1)
-    
+
     # Calcular los valores de la línea de regresión
     y_reg = slope * x + intercept
-    
+
     # Calcular la desviación estándar de los residuos
     residuals = y - y_reg
     std_residual = np.std(residuals)
+    return times, y_reg, std_residual
+
+def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
+    if "Close" not in data.columns or "Fecha" not in data.columns:
+        st.warning("No se encontró la columna 'Close' o 'Fecha' en los datos. No se calculará la regresión.")
+        return
+
+    # Regresión memoizada por datos y fecha de inicio
+    regresion = indicator_engine.compute(
+        "regression", data, calcular_regresion, start_date=user_params.get("start_date")
+    )
+    if regresion is None:
+        st.warning("No hay datos a partir de la fecha de inicio seleccionada.")
+        return
+    times, y_reg, std_residual = regresion
     
     # Obtener el multiplicador para los canales
     multiplier = user_params.get("multiplier")
@@ -149,23 +161,9 @@ def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
     y_lower = y_reg - multiplier * std_residual
     
     # Construir las series para graficar
-    reg_series = []
-    upper_series = []
-    lower_series = []
-    for _, row in filtered_data.iterrows():
-        time_val = int(row["Fecha"].timestamp())
-        reg_series.append({
-            "time": time_val,
-            "value": float(slope * time_val + intercept)
-        })
-        upper_series.append({
-            "time": time_val,
-            "value": float(slope * time_val + intercept + multiplier * std_residual)
-        })
-        lower_series.append({
-            "time": time_val,
-            "value": float(slope * time_val + intercept - multiplier * std_residual)
-        })
+    reg_series = line_data(times, y_reg)
+    upper_series = line_data(times, y_upper)
+    lower_series = line_data(times, y_lower)
     
     # Añadir las series calculadas al charts_config
     charts_config[0]["series"].append({
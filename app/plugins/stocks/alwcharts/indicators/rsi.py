@@ -1,5 +1,7 @@
 import streamlit as st
 import pandas as pd
+from utils.lightweight_series import to_epoch, line_data
+from utils import indicator_engine
 
 """
 Plugin que agrega el RSI (Relative Strength Index) al gráfico.
@@ -46,17 +48,10 @@ def get_user_params(data: pd.DataFrame) -> dict:
         "opacity": opacity
     }
 
-def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
+def calcular_rsi(data: pd.DataFrame, period: int) -> pd.Series:
     """
-    Calcula el RSI y lo añade como una serie de tipo 'Line' en el charts_config.
+    Cálculo puro del RSI sobre 'Close' (sin parámetros de estilo, para poder memoizarlo).
     """
-    if "Close" not in data.columns:
-        st.warning("No se encontró la columna 'Close' en los datos. No se calculará el RSI.")
-        return
-
-    period = user_params["period"]
-    
-    # Cálculo del RSI
     delta = data["Close"].diff()
     gain = delta.where(delta > 0, 0)
     loss = -delta.where(delta < 0, 0)
@@ -65,17 +60,23 @@ def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
     avg_loss = loss.rolling(window=period, min_periods=1).mean()
 
     rs = avg_gain / avg_loss
-    data["RSI"] = 100 - (100 / (1 + rs))
+    return 100 - (100 / (1 + rs))
+
+def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
+    """
+    Calcula el RSI y lo añade como una serie de tipo 'Line' en el charts_config.
+    """
+    if "Close" not in data.columns:
+        st.warning("No se encontró la columna 'Close' en los datos. No se calculará el RSI.")
+        return
+
+    period = user_params["period"]
+    
+    # Cálculo del RSI (memoizado por datos y periodo)
+    data["RSI"] = indicator_engine.compute("rsi", data, calcular_rsi, period=period)
 
     # Formato de datos para el gráfico
-    rsi_data = []
-    for _, row in data.iterrows():
-        if pd.notna(row["RSI"]):
-            time_val = int(row["Fecha"].timestamp())
-            rsi_data.append({
-                "time": time_val,
-                "value": float(row["RSI"])
-            })
+    rsi_data = line_data(to_epoch(data["Fecha"]), data["RSI"])
 
     # Añadir el RSI como gráfico independiente
     rsi_chart = {
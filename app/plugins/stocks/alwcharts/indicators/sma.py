@@ -1,5 +1,7 @@
 import streamlit as st
 import pandas as pd
+from utils.lightweight_series import to_epoch, line_data
+from utils import indicator_engine
 
 
 """
@@ -102,6 +104,12 @@ def get_user_params(data: pd.DataFrame) -> dict:
         "period3": period3, "color3": color3, "line_width3": line_width3, "opacity3": opacity3, "name3": name3,
     }
 
+def calcular_sma(data: pd.DataFrame, period: int) -> pd.Series:
+    """
+    Cálculo puro de la SMA sobre 'Close' (sin parámetros de estilo, para poder memoizarlo).
+    """
+    return data["Close"].rolling(window=period).mean()
+
 def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
     """
     Calcula las 3 SMA en base a la columna 'Close' y 
@@ -125,26 +133,19 @@ def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
     line_width3, opacity3 = user_params.get("line_width3"), user_params.get("opacity3")
     name3 = user_params.get("name3")
 
-    # Calcular 3 SMA
-    data[f"SMA_{period1}"] = data["Close"].rolling(window=period1).mean()
-    data[f"SMA_{period2}"] = data["Close"].rolling(window=period2).mean()
-    data[f"SMA_{period3}"] = data["Close"].rolling(window=period3).mean()
+    # Calcular 3 SMA (memoizadas por datos y periodo)
+    for period in (period1, period2, period3):
+        data[f"SMA_{period}"] = indicator_engine.compute("sma", data, calcular_sma, period=period)
 
     # Para cada SMA, construir los puntos (time/value) y añadir la serie al charts_config
+    times = to_epoch(data["Fecha"])
     for period, color, line_width, opacity, series_name in [
         (period1, color1, line_width1, opacity1, name1),
         (period2, color2, line_width2, opacity2, name2),
         (period3, color3, line_width3, opacity3, name3)
     ]:
         sma_col = f"SMA_{period}"
-        sma_data = []
-        for _, row in data.iterrows():
-            if pd.notna(row[sma_col]):
-                time_val = int(row["Fecha"].timestamp())
-                sma_data.append({
-                    "time": time_val,
-                    "value": float(row[sma_col])
-                })
+        sma_data = line_data(times, data[sma_col])
 
         # Añadir la serie de SMA como una 'Line' con las opciones configuradas, incluyendo el nombre
         charts_config[0]["series"].append({
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from plugins.stocks.alwcharts.indicators.td.td_setup import calculate_td_setup
 from plugins.stocks.alwcharts.indicators.td.td_countdown import calculate_td_countdown
+from utils import indicator_engine
 
 name = "TD Sequential - Setup + Countdown"
 description = "Detecta el TD Setup y Countdown en módulos separados para mayor organización."
@@ -37,20 +38,19 @@ def get_user_params(data: pd.DataFrame) -> dict:
         "show_only_complete_countdown": show_only_complete_countdown
     }
 
-def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
-    if "Close" not in data.columns or "Fecha" not in data.columns:
-        st.warning("Los datos deben contener las columnas 'Close' y 'Fecha'.")
-        return
-
-    markers = []
+def calcular_td(data: pd.DataFrame, show_only_full_setups: bool, show_only_complete_countdown: bool) -> list:
+    """
+    Calcula los marcadores de Setup y Countdown ordenados por tiempo. En lugar de colores
+    usa claves ("buy_setup", "sell_countdown", ...) que apply reemplaza por los del usuario.
+    """
     data = data.reset_index(drop=True)
 
     # Obtener los setups y los índices de setups completos
     setup_markers, completed_buy_setups, completed_sell_setups = calculate_td_setup(
         data, 
-        user_params["show_only_full_setups"], 
-        user_params["buy_setup_color"], 
-        user_params["sell_setup_color"]
+        show_only_full_setups, 
+        "buy_setup", 
+        "sell_setup"
     )
 
     # Obtener los countdowns basados en los setups completados
@@ -58,24 +58,43 @@ def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
         data, 
         completed_buy_setups, 
         "buy", 
-        user_params["buy_countdown_color"],
-        only_complete_countdown=user_params["show_only_complete_countdown"],
+        "buy_countdown",
+        only_complete_countdown=show_only_complete_countdown,
         contrary_setups=completed_sell_setups 
     )
     sell_countdown_markers = calculate_td_countdown(
         data, 
         completed_sell_setups, 
         "sell", 
-        user_params["sell_countdown_color"],
-        only_complete_countdown=user_params["show_only_complete_countdown"],
+        "sell_countdown",
+        only_complete_countdown=show_only_complete_countdown,
         contrary_setups=completed_buy_setups 
     )
 
     # Agregar todos los marcadores y ordenarlos por tiempo
-    markers.extend(setup_markers)
-    markers.extend(buy_countdown_markers)
-    markers.extend(sell_countdown_markers)
-    markers = sorted(markers, key=lambda x: x["time"])
+    markers = setup_markers + buy_countdown_markers + sell_countdown_markers
+    return sorted(markers, key=lambda x: x["time"])
+
+def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
+    if "Close" not in data.columns or "Fecha" not in data.columns:
+        st.warning("Los datos deben contener las columnas 'Close' y 'Fecha'.")
+        return
+
+    # Cálculo memoizado; los colores se aplican después sobre una copia de los marcadores
+    markers_base = indicator_engine.compute(
+        "td_sequential",
+        data,
+        calcular_td,
+        show_only_full_setups=user_params["show_only_full_setups"],
+        show_only_complete_countdown=user_params["show_only_complete_countdown"],
+    )
+    colores = {
+        "buy_setup": user_params["buy_setup_color"],
+        "sell_setup": user_params["sell_setup_color"],
+        "buy_countdown": user_params["buy_countdown_color"],
+        "sell_countdown": user_params["sell_countdown_color"],
+    }
+    markers = [{**marker, "color": colores[marker["color"]]} for marker in markers_base]
 
     # Agregar los markers al gráfico principal
     if markers:
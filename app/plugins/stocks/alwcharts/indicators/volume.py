@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from utils.lightweight_series import to_epoch, line_data
 
 """
 Plugin que agrega un histograma de volumen al gráfico.
@@ -47,14 +48,7 @@ def apply(charts_config: list, data: pd.DataFrame, user_params: dict):
         st.warning("No se encontró la columna 'Volume' en los datos. No se graficará el volumen.")
         return
 
-    volume_data = []
-    for _, row in data.iterrows():
-        if pd.notna(row["Volume"]):
-            time_val = int(row["Fecha"].timestamp())
-            volume_data.append({
-                "time": time_val,
-                "value": float(row["Volume"])
-            })
+    volume_data = line_data(to_epoch(data["Fecha"]), data["Volume"], decimals=0)
 
     # Ajustar la configuración del gráfico de volumen para que coincida con el candlestick
     volume_chart = {
@@ -5,7 +5,6 @@ tipo = "stock"
 def render(ticker):
     import streamlit as st
     from streamlit_echarts import st_pyecharts
-    import yfinance as yf
     import datetime as dt
 
     from pyecharts.charts import Grid, Kline, Bar
@@ -14,7 +13,7 @@ def render(ticker):
 
     # Ajusta la ruta a tus archivos
     from plugins.stocks.echart.indicators.load_indicators import load_indicators
-    from utils.flatten_columns import flatten_columns
+    from models.datasource.market_data import get_ohlcv
     
     # ====== Parámetros de fecha
     st.sidebar.subheader("Rango de Fechas")
@@ -27,8 +26,7 @@ def render(ticker):
     # ====== Descarga de datos
     with st.spinner("Descargando datos..."):
         end_date += dt.timedelta(days=1)  # Ajuste para incluir el último día
-        df = yf.download(ticker, start=start_date, end=end_date)
-        df = flatten_columns(df)
+        df = get_ohlcv(ticker, start=start_date, end=end_date)
 
     if df.empty:
         st.warning("No se encontraron datos en ese rango.")
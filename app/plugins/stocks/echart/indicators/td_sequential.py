@@ -41,6 +41,7 @@ def apply_overlay(kline_obj, data, dates, user_params):
     from pyecharts.charts import Scatter
     from pyecharts import options as opts
     from pyecharts.commons.utils import JsCode
+    from utils.td_sequential import setup_cyclic
 
     show_mode  = user_params["show_mode"]
     symbol_buy = user_params["symbol_buy"]
@@ -58,47 +59,25 @@ def apply_overlay(kline_obj, data, dates, user_params):
         print("[TD Sequential] No hay datos suficientes (necesitamos al menos 5).")
         return
 
-    # Cálculo buySet / sellSet
-    buySet  = np.zeros(n, dtype=int)
-    sellSet = np.zeros(n, dtype=int)
-
-    for i in range(n):
-        if i < 4:
-            continue
-        # Lógica DeMark (básica)
-        if df["Close"][i] < df["Close"][i-4]:
-            buySet[i] = 1 if buySet[i-1] == 9 else buySet[i-1] + 1
-        else:
-            buySet[i] = 0
-
-        if df["Close"][i] > df["Close"][i-4]:
-            sellSet[i] = 1 if sellSet[i-1] == 9 else sellSet[i-1] + 1
-        else:
-            sellSet[i] = 0
-
-    # Generamos los puntos a dibujar
-    buy_x, buy_y, buy_label = [], [], []
-    sell_x, sell_y, sell_label = [], [], []
-
-    for i in range(n):
-        # Decide si dibujar 1..9 o solo 9 (o nada)
-        if show_mode == "1 to 9" and buySet[i] > 0:
-            buy_x.append(dates[i])
-            buy_y.append(df["Low"][i] * 0.99)
-            buy_label.append(str(buySet[i]))
-        elif show_mode == "solo 9" and buySet[i] == 9:
-            buy_x.append(dates[i])
-            buy_y.append(df["Low"][i] * 0.99)
-            buy_label.append("9")
-
-        if show_mode == "1 to 9" and sellSet[i] > 0:
-            sell_x.append(dates[i])
-            sell_y.append(df["High"][i] * 1.005)
-            sell_label.append(str(sellSet[i]))
-        elif show_mode == "solo 9" and sellSet[i] == 9:
-            sell_x.append(dates[i])
-            sell_y.append(df["High"][i] * 1.005)
-            sell_label.append("9")
+    # Cálculo buySet / sellSet (lógica DeMark básica: 1..9 y vuelve a 1)
+    buySet, sellSet = setup_cyclic(df["Close"].to_numpy())
+
+    # Generamos los puntos a dibujar: 1..9 o solo 9 (o nada)
+    if show_mode == "1 to 9":
+        buy_idx, sell_idx = np.flatnonzero(buySet > 0), np.flatnonzero(sellSet > 0)
+    elif show_mode == "solo 9":
+        buy_idx, sell_idx = np.flatnonzero(buySet == 9), np.flatnonzero(sellSet == 9)
+    else:
+        buy_idx = sell_idx = np.array([], dtype=int)
+
+    low = df["Low"].to_numpy()
+    high = df["High"].to_numpy()
+    buy_x = [dates[i] for i in buy_idx.tolist()]
+    buy_y = (low[buy_idx] * 0.99).tolist()
+    buy_label = buySet[buy_idx].astype(str).tolist()
+    sell_x = [dates[i] for i in sell_idx.tolist()]
+    sell_y = (high[sell_idx] * 1.005).tolist()
+    sell_label = sellSet[sell_idx].astype(str).tolist()
 
     # Scatter para BUY
     scatter_buy = (
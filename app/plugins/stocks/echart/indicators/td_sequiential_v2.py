@@ -50,6 +50,7 @@ def apply_overlay(kline_obj, data, dates, user_params):
     from pyecharts.charts import Scatter
     from pyecharts import options as opts
     from pyecharts.commons.utils import JsCode
+    from utils import td_sequential as td
 
     # ---------------------------------------------------------------------
     # 1. Validar columnas y extraer parámetros
@@ -81,207 +82,49 @@ def apply_overlay(kline_obj, data, dates, user_params):
     # ---------------------------------------------------------------------
     # 2. Cálculo de TD Setup + "Setup Perfection"
     # ---------------------------------------------------------------------
-    # Manejaremos el setup con un estado para BUY y otro para SELL.  
-    # Guardaremos en arrays: buySetup[i], sellSetup[i] con la cuenta de Setup (1..9),  
-    # o 0 si no hay setup. Cuando un setup está "extendido" mientras busca perfección,
-    # seguiremos marcando 9 en los siguientes bares, pero sin "confirmar" la perfección
-    # hasta que se cumpla la condición.
-    buySetup  = np.zeros(n, dtype=int)
-    sellSetup = np.zeros(n, dtype=int)
-
-    # Para saber si ya se "perfeccionó" un setup:
-    buyPerfectedAt  = -1  # índice donde el setup BUY quedó perfeccionado
-    sellPerfectedAt = -1  # índice donde el setup SELL quedó perfeccionado
-
-    # Estados de si estamos construyendo un setup (BUY o SELL).
-    buyCount  = 0
-    sellCount = 0
-
-    # Índice donde empezó el setup actual (BUY/SELL). Lo necesitamos
-    # para verificar perfecciones con alguna referencia, si se desea.
-    buySetupStartIndex  = -1
-    sellSetupStartIndex = -1
-
-    # Reglas de reset: si un setup de BUY está en curso y se cumple la condición
-    # contraria para SELL, a veces se resetea. Aquí haremos un approach simple:
-    # Si un setup opuesto se inicia (count=1) mientras uno no ha sido perfeccionado,
-    # reiniciamos el anterior. (Regla abreviada, no oficial)
-
-    for i in range(n):
-        if i < 4:
-            continue
-
-        close_now  = df["Close"][i]
-        close_prev = df["Close"][i-4]
-
-        # ----------------------------
-        # 2.1. Chequeo setup BUY
-        # ----------------------------
-        if buyCount == 0:
-            # si no hay BUY en curso, ¿se inicia uno?
-            if close_now < close_prev:
-                buyCount = 1
-                buySetup[i] = 1
-                buySetupStartIndex = i
-        else:
-            # ya estamos en un setup buy
-            if close_now < close_prev:
-                if buyCount < 9:
-                    buyCount += 1
-                    buySetup[i] = buyCount
-                else:
-                    # Ya llegamos a 9 en algún bar anterior,
-                    # seguimos "extendiéndolo" con 9 mientras no se perfeccione
-                    buySetup[i] = 9
-                # Nota: no reseteamos buyCount aquí
-            else:
-                # Se rompe la secuencia
-                buyCount = 0
-                # buySetup[i] = 0  # (por defecto ya es 0)
-
-        # ----------------------------
-        # 2.2. Chequeo setup SELL
-        # ----------------------------
-        if sellCount == 0:
-            if close_now > close_prev:
-                sellCount = 1
-                sellSetup[i] = 1
-                sellSetupStartIndex = i
-        else:
-            if close_now > close_prev:
-                if sellCount < 9:
-                    sellCount += 1
-                    sellSetup[i] = sellCount
-                else:
-                    # Extendido con 9
-                    sellSetup[i] = 9
-            else:
-                sellCount = 0
-
-        # ----------------------------
-        # 2.3. Regla simple de reset opuesto (opcional)
-        #     Si se inicia un setup SELL y hay un BUY sin perfeccionar, lo reseteamos.
-        #     Y viceversa.
-        # ----------------------------
-        # Ejemplo: si sellCount == 1 y buyPerfectedAt < 0 (no se perfeccionó)
-        # y buyCount > 0, podemos resetear buyCount = 0.  
-        # Esto es extremadamente simplificado; muchas variantes no resetean así.
-        if sellCount == 1 and buyCount > 0 and (buyPerfectedAt < 0):
-            buyCount = 0  # anular buy
-        if buyCount == 1 and sellCount > 0 and (sellPerfectedAt < 0):
-            sellCount = 0
-
-        # -----------------------------------------------------------------
-        # 2.4. "Setup Perfection"
-        #
-        #  - Una versión simplificada: si ya tenemos un "9" (o extendido)
-        #    miramos si el low (para BUY) o high (para SELL) del bar actual
-        #    cumple cierta condición (p.ej. "low[i] <= min( low[i-2], low[i-3] )").
-        #    Cuando se cumpla, marcamos que el Setup se perfecciona en i.
-        #
-        #  - La realidad: hay reglas más elaboradas: se compara la close de
-        #    bar 8 o 9 con la low de ciertos bares previos, etc.
-        # -----------------------------------------------------------------
-
-        # BUY perfection
-        if buyCount >= 9 and buyPerfectedAt < 0:
-            # Condición muy simplificada: low actual <= low de hace 2 barras
-            # (en la práctica, la referencia varía). Ajusta a tu gusto.
-            if i >= 2:
-                if df["Low"][i] <= df["Low"][i-2]:
-                    buyPerfectedAt = i  # se perfeccionó
-                    # (Podríamos dejar un "banderazo" en buySetup[i] = 99, p.ej.:
-                    #  para mostrar un 9 con un indicador "P". Lo veremos al graficar)
-                    # buySetup[i] = 9  # ya lo está
-                # Si no se perfecciona, seguimos con 9 en cada bar hasta que se cumpla.
-
-        # SELL perfection
-        if sellCount >= 9 and sellPerfectedAt < 0:
-            if i >= 2:
-                if df["High"][i] >= df["High"][i-2]:
-                    sellPerfectedAt = i
-                    # sellSetup[i] = 9  # ya está en 9
+    # buySetup[i], sellSetup[i] tienen la cuenta de Setup (1..9) o 0 si no hay setup.
+    # Un setup "extendido" sigue marcando 9 mientras se mantenga la condición.
+    # La perfección (simplificada) es la primera vela con setup en 9 cuyo Low (BUY)
+    # es <= al de 2 barras atrás, o cuyo High (SELL) es >= al de 2 barras atrás.
+    close = df["Close"].to_numpy()
+    low   = df["Low"].to_numpy()
+    high  = df["High"].to_numpy()
+
+    buySetup, sellSetup = td.setup_capped(close)
+    buyPerfectedAt  = td.setup_perfection(buySetup, low, "buy")
+    sellPerfectedAt = td.setup_perfection(sellSetup, high, "sell")
 
     # ---------------------------------------------------------------------
     # 3. TD Countdown (con reinicio si aparece un Setup 9 opuesto perfecto)
     # ---------------------------------------------------------------------
-    # - Empezamos el countdown de BUY sólo si buyPerfectedAt >= 0
-    #   (es decir, ya se encontró un 9 de BUY y se "perfeccionó").  
-    # - Se inicia a partir del **bar siguiente** a la perfección.
+    # - El countdown de BUY empieza en el bar siguiente a la perfección del setup BUY.
     # - Regla de conteo (simplificada): sumamos 1..13 cuando close[i] < close[i-2].
     # - Si durante el conteo BUY aparece un SELL 9 perfeccionado, se cancela el BUY countdown.
     #   (y viceversa)
-    #
-    buyCountdown  = np.zeros(n, dtype=int)
-    sellCountdown = np.zeros(n, dtype=int)
-
-    # Si no se perfeccionó, no hay countdown.
-    if buyPerfectedAt >= 0:
-        in_buy_countdown = True
-        count_b = 0
-        for i in range(buyPerfectedAt + 1, n):
-            # Si vemos un SELL 9 perfeccionado, cancelamos
-            if sellPerfectedAt >= 0 and i >= sellPerfectedAt:
-                in_buy_countdown = False
-                break
-
-            if i >= 2 and in_buy_countdown:
-                # Condición simplificada: close[i] < close[i-2]
-                if df["Close"][i] < df["Close"][i-2]:
-                    count_b += 1
-                    buyCountdown[i] = count_b
-                    if count_b == 13:
-                        # Una vez llegamos a 13, paramos
-                        in_buy_countdown = False
-                        break
-
-    if sellPerfectedAt >= 0:
-        in_sell_countdown = True
-        count_s = 0
-        for i in range(sellPerfectedAt + 1, n):
-            # Si aparece un BUY 9 perfeccionado en el camino, cancelamos
-            if buyPerfectedAt >= 0 and i >= buyPerfectedAt:
-                in_sell_countdown = False
-                break
-
-            if i >= 2 and in_sell_countdown:
-                if df["Close"][i] > df["Close"][i-2]:
-                    count_s += 1
-                    sellCountdown[i] = count_s
-                    if count_s == 13:
-                        in_sell_countdown = False
-                        break
+    buyCountdown  = td.countdown_after(close, buyPerfectedAt, sellPerfectedAt if sellPerfectedAt >= 0 else n, "buy")
+    sellCountdown = td.countdown_after(close, sellPerfectedAt, buyPerfectedAt if buyPerfectedAt >= 0 else n, "sell")
 
     # ---------------------------------------------------------------------
     # 4. Preparar datos para graficar Setup (Scatter)
     # ---------------------------------------------------------------------
-    buy_x, buy_y, buy_label = [], [], []
-    sell_x, sell_y, sell_label = [], [], []
-
-    for i in range(n):
-        bval = buySetup[i]
-        sval = sellSetup[i]
-        if bval > 0:
-            # Opción: si show_mode="solo 9" y bval<9 => no mostramos
-            if (show_mode == "1 to 9") or (show_mode == "solo 9" and bval == 9):
-                buy_x.append(dates[i])
-                # Bajarlo un poco del Low
-                buy_y.append(df["Low"][i] * 0.99)
-                # Marcamos "9P" si se perfeccionó justo en este bar
-                # (o bval=9 y i>=buyPerfectedAt)
-                if bval == 9 and i == buyPerfectedAt:
-                    buy_label.append("9P")  # 9 Perfected
-                else:
-                    buy_label.append(str(bval))
-
-        if sval > 0:
-            if (show_mode == "1 to 9") or (show_mode == "solo 9" and sval == 9):
-                sell_x.append(dates[i])
-                sell_y.append(df["High"][i] * 1.005)
-                if sval == 9 and i == sellPerfectedAt:
-                    sell_label.append("9P")
-                else:
-                    sell_label.append(str(sval))
+    # Opción: si show_mode="solo 9" solo se muestran los 9
+    minimo = 1 if show_mode == "1 to 9" else 9
+    buy_idx  = np.flatnonzero(buySetup >= minimo)
+    sell_idx = np.flatnonzero(sellSetup >= minimo)
+
+    buy_x = [dates[i] for i in buy_idx.tolist()]
+    # Bajarlo un poco del Low
+    buy_y = (low[buy_idx] * 0.99).tolist()
+    # Marcamos "9P" si se perfeccionó justo en este bar
+    buy_label = buySetup[buy_idx].astype(str).astype(object)
+    buy_label[buy_idx == buyPerfectedAt] = "9P"
+    buy_label = buy_label.tolist()
+
+    sell_x = [dates[i] for i in sell_idx.tolist()]
+    sell_y = (high[sell_idx] * 1.005).tolist()
+    sell_label = sellSetup[sell_idx].astype(str).astype(object)
+    sell_label[sell_idx == sellPerfectedAt] = "9P"
+    sell_label = sell_label.tolist()
 
     scatter_buy = (
         Scatter()
@@ -380,26 +223,19 @@ def apply_overlay(kline_obj, data, dates, user_params):
     # ---------------------------------------------------------------------
     # 5. Preparar datos para graficar Countdown (Scatter)
     # ---------------------------------------------------------------------
-    cdbuy_x,  cdbuy_y,  cdbuy_label   = [], [], []
-    cdsell_x, cdsell_y, cdsell_label = [], [], []
-
-    for i in range(n):
-        bcd = buyCountdown[i]
-        scd = sellCountdown[i]
-
-        if bcd > 0:
-            # "solo 13" o "1 to 13"
-            if show_countdown == "1 to 13" or (show_countdown == "solo 13" and bcd == 13):
-                cdbuy_x.append(dates[i])
-                # Un poco más abajo que el setup
-                cdbuy_y.append(df["Low"][i] * 0.97)
-                cdbuy_label.append(str(bcd))
-
-        if scd > 0:
-            if show_countdown == "1 to 13" or (show_countdown == "solo 13" and scd == 13):
-                cdsell_x.append(dates[i])
-                cdsell_y.append(df["High"][i] * 1.01)
-                cdsell_label.append(str(scd))
+    # "solo 13" o "1 to 13"
+    minimo = 1 if show_countdown == "1 to 13" else 13
+    cdbuy_idx  = np.flatnonzero(buyCountdown >= minimo)
+    cdsell_idx = np.flatnonzero(sellCountdown >= minimo)
+
+    cdbuy_x = [dates[i] for i in cdbuy_idx.tolist()]
+    # Un poco más abajo que el setup
+    cdbuy_y = (low[cdbuy_idx] * 0.97).tolist()
+    cdbuy_label = buyCountdown[cdbuy_idx].astype(str).tolist()
+
+    cdsell_x = [dates[i] for i in cdsell_idx.tolist()]
+    cdsell_y = (high[cdsell_idx] * 1.01).tolist()
+    cdsell_label = sellCountdown[cdsell_idx].astype(str).tolist()
 
     scatter_cdbuy = (
         Scatter()
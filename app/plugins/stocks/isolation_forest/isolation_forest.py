@@ -4,16 +4,21 @@ tipo = "stock"
 
 def render(ticker):
     import streamlit as st
-    import yfinance as yf
     import pandas as pd
     import datetime as dt
-    import numpy as np
-    from sklearn.ensemble import IsolationForest
     from streamlit_theme import st_theme
-    from utils.flatten_columns import flatten_columns
+    from models.datasource.market_data import get_ohlcv
+    from utils.anomaly_models import preparar_velas, score
     from streamlit_lightweight_charts import renderLightweightCharts
 
-    st.write(f"Detectando anomalías en los datos históricos del ticker: **{ticker}**")
+    modo = st.sidebar.radio(
+        "Modo",
+        options=["Ticker", "Lote (watchlist)"],
+        horizontal=True,
+        help="En modo lote se analizan todos los símbolos de un screener y se ordenan por anomalía."
+    )
+    if modo == "Ticker":
+        st.write(f"Detectando anomalías en los datos históricos del ticker: **{ticker}**")
     theme = st_theme()
 
     # Lista de intervalos disponibles
@@ -42,7 +47,7 @@ def render(ticker):
     )
 
     # Opción para visualizar gradiente de anomalía en todos los puntos
-    show_gradient = st.sidebar.checkbox("Mostrar gradiente en todos los puntos", value=False)
+    show_gradient = modo == "Ticker" and st.sidebar.checkbox("Mostrar gradiente en todos los puntos", value=False)
 
     # Manejo del slider de contaminación: si el gradiente está activo se bloquea en 0.05
     if not show_gradient:
@@ -79,104 +84,28 @@ def render(ticker):
     start_datetime = dt.datetime.combine(start_date, dt.time.min)
     end_datetime = dt.datetime.combine(end_date, dt.time(23, 59))
 
-    def download_data(ticker, start_dt, end_dt, interval):
-        data = yf.download(ticker, start=start_dt, end=end_dt, interval=interval)
-        data = flatten_columns(data)
-        if data.empty:
-            st.warning(f"No se encontraron datos para el ticker {ticker} en el rango de fechas seleccionado.")
-            return None
-        # Para intervalos intradía, la columna se llama "Datetime", de lo contrario "Date"
-        time_column = "Datetime" if interval in ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"] else "Date"
-        data = data.reset_index()
-        data.rename(columns={time_column: "Fecha"}, inplace=True)
-        return data
-
-    def detect_anomalies(df, metric, n_estimators, contamination):
-        df_processed = df.copy()
-        if metric == "Cierre":
-            df_processed['Close_Normalized'] = (df_processed['Close'] - df_processed['Close'].mean()) / df_processed['Close'].std()
-            features = df_processed[['Close_Normalized']]
-        elif metric == "Cierre y Volumen":
-            df_processed['Close_Normalized'] = (df_processed['Close'] - df_processed['Close'].mean()) / df_processed['Close'].std()
-            if "Volume" in df_processed.columns:
-                df_processed['Volume_Normalized'] = (df_processed['Volume'] - df_processed['Volume'].mean()) / df_processed['Volume'].std()
-                features = df_processed[['Close_Normalized', 'Volume_Normalized']]
-            else:
-                st.error("Datos de volumen no disponibles para el análisis combinado. Se procederá solo con el precio.")
-                features = df_processed[['Close_Normalized']]
-        elif metric == "OHLCV":
-            for col in ["Open", "High", "Low", "Close", "Volume"]:
-                if col in df_processed.columns:
-                    df_processed[f"{col}_Normalized"] = (df_processed[col] - df_processed[col].mean()) / df_processed[col].std()
-                else:
-                    st.error(f"Datos de {col} no disponibles y se omitirán en el análisis.")
-            feature_columns = [f"{col}_Normalized" for col in ["Open", "High", "Low", "Close", "Volume"] if f"{col}_Normalized" in df_processed.columns]
-            if len(feature_columns) == 0:
-                st.error("No se encontraron columnas suficientes para el análisis OHLCV. Se procederá con 'Cierre'.")
-                features = df_processed[['Close_Normalized']]
-            else:
-                features = df_processed[feature_columns]
-        elif metric == "Volatilidad y Volumen":
-            if all(col in df_processed.columns for col in ["High", "Low", "Volume"]):
-                df_processed["Volatilidad"] = df_processed["High"] - df_processed["Low"]
-                df_processed["Volume_Log"] = np.log(df_processed["Volume"] + 1)
-                # Normalización z-score para volatilidad y volumen
-                vol_mean = df_processed["Volatilidad"].mean()
-                vol_std = df_processed["Volatilidad"].std()
-                vol_norm = (df_processed["Volatilidad"] - vol_mean) / vol_std if vol_std != 0 else 0
-                vol_log_mean = df_processed["Volume_Log"].mean()
-                vol_log_std = df_processed["Volume_Log"].std()
-                vol_log_norm = (df_processed["Volume_Log"] - vol_log_mean) / vol_log_std if vol_log_std != 0 else 0
-                df_processed["Volatilidad_Normalized"] = vol_norm
-                df_processed["Volume_Normalized"] = vol_log_norm
-                features = df_processed[["Volatilidad_Normalized", "Volume_Normalized"]]
-            else:
-                st.error("Datos de High, Low o Volume no disponibles para el análisis de Volatilidad y Volumen. Se procederá con 'Cierre'.")
-                df_processed['Close_Normalized'] = (df_processed['Close'] - df_processed['Close'].mean()) / df_processed['Close'].std()
-                features = df_processed[['Close_Normalized']]
-        else:
-            features = df_processed[['Close']]
-
-        model = IsolationForest(
-            n_estimators=n_estimators,
-            contamination=contamination,
-            random_state=42
-        )
-        model.fit(features)
-        df_processed['Prediccion'] = model.predict(features)
-        df_processed['Anomaly'] = df_processed['Prediccion'].apply(lambda x: 'Normal' if x == 1 else 'Anomalía')
-        raw_scores = model.decision_function(features)
-        anomaly_scores = -raw_scores  # Mayor valor indica mayor anomalía
-        min_score = anomaly_scores.min()
-        max_score = anomaly_scores.max()
-        norm_scores = (anomaly_scores - min_score) / (max_score - min_score) if max_score != min_score else anomaly_scores * 0
-        df_processed['norm_score'] = norm_scores
-        return df_processed
+    if modo == "Lote (watchlist)":
+        render_lote(interval, start_datetime, end_datetime, analysis_metric, n_estimators, contamination)
+        return
 
     with st.spinner("Cargando datos históricos y detectando anomalías..."):
         try:
-            data = download_data(ticker, start_datetime, end_datetime, interval)
-            if data is None:
+            data = get_ohlcv(ticker, start=start_datetime, end=end_datetime, interval=interval)
+            # Columna 'Fecha' y solo las columnas del métrico (sin velas de volumen 0 si lo incluye)
+            df = preparar_velas(data, analysis_metric)
+            if df is None:
+                st.warning(f"No se encontraron datos para el ticker {ticker} en el rango de fechas seleccionado.")
                 return
 
-            # Seleccionar columnas según la métrica elegida
-            if analysis_metric == "OHLCV":
-                columns_to_select = ['Fecha', 'Open', 'High', 'Low', 'Close', 'Volume']
-            elif analysis_metric == "Cierre y Volumen":
-                columns_to_select = ['Fecha', 'Close', 'Volume']
-            elif analysis_metric == "Volatilidad y Volumen":
-                # Se requieren High, Low y Volume; se incluye Close para el gráfico
-                columns_to_select = ['Fecha', 'High', 'Low', 'Close', 'Volume']
-            else:  # "Cierre"
-                columns_to_select = ['Fecha', 'Close']
-
-            df = data[columns_to_select].copy()
-
-            # Filtrar filas con Volume igual a 0 si el análisis incluye volumen
-            if analysis_metric in ["Cierre y Volumen", "OHLCV", "Volatilidad y Volumen"]:
-                df = df[df["Volume"] != 0]
-
-            df = detect_anomalies(df, analysis_metric, n_estimators, contamination)
+            # El modelo se reutiliza entre ejecuciones: solo se puntúan las velas nuevas
+            df, avisos, _ = score(
+                df, ticker, interval, analysis_metric, start_datetime,
+                n_estimators=n_estimators, contamination=contamination,
+            )
+            for aviso in avisos:
+                st.error(aviso)
+            if analysis_metric == "Volatilidad y Volumen":
+                df["Volatilidad"] = df["High"] - df["Low"]
 
             # Configurar datos para el gráfico según la métrica:
             if analysis_metric == "OHLCV":
@@ -340,3 +269,62 @@ def render(ticker):
                 st.dataframe(df[['Fecha', 'Close', 'norm_score']])
         except Exception as e:
             st.error(f"Ocurrió un error al procesar los datos para el ticker '{ticker}': {e}")
+
+
+def render_lote(interval, start_datetime, end_datetime, analysis_metric, n_estimators, contamination):
+    """
+    Modo lote: analiza todos los símbolos de un screener (o de una lista manual) en un pool
+    de procesos y muestra los más anómalos de la última sesión.
+    """
+    import streamlit as st
+    from utils.anomaly_scan import scan
+    from utils.watchlist_symbols import seleccionar_simbolos
+
+    symbols = seleccionar_simbolos(key="anomaly_scan")
+
+    if not symbols:
+        st.warning("No hay símbolos para analizar.")
+        return
+
+    top = st.number_input("Mostrar los más anómalos", min_value=5, max_value=len(symbols) + 5, value=min(25, len(symbols)), step=5)
+    # El último resultado se conserva en session_state para que sobreviva a los reruns
+    clave = (tuple(symbols), interval, start_datetime, end_datetime, analysis_metric, n_estimators, contamination)
+    if st.button(f"Analizar {len(symbols)} símbolos", key="btn_anomaly_scan"):
+        progreso = st.progress(0.0, text="Descargando velas...")
+
+        def avanzar(hechos, total):
+            progreso.progress(hechos / total, text=f"Analizando {hechos}/{total} símbolos...")
+
+        tabla = scan(
+            symbols, interval=interval, start=start_datetime, end=end_datetime,
+            metric=analysis_metric, n_estimators=n_estimators, contamination=contamination,
+            on_progress=avanzar,
+        )
+        progreso.empty()
+        st.session_state["anomaly_scan"] = (clave, tabla)
+
+    guardado = st.session_state.get("anomaly_scan")
+    if guardado is None or guardado[0] != clave:
+        return
+    tabla = guardado[1]
+
+    if tabla.empty:
+        st.warning("No se obtuvieron datos para los símbolos seleccionados.")
+        return
+
+    st.subheader("Símbolos más anómalos de la sesión")
+    st.caption(
+        f"{len(tabla)} de {len(symbols)} símbolos con datos. Score = -decision_function del modelo "
+        "(mayor es más anómalo; > 0 es anomalía)."
+    )
+    st.dataframe(
+        tabla.head(int(top)),
+        column_config={
+            "Cambio %": st.column_config.NumberColumn(format="%.2f%%"),
+            "Score máx sesión": st.column_config.ProgressColumn(
+                min_value=float(min(0.0, tabla["Score máx sesión"].min())),
+                max_value=float(max(tabla["Score máx sesión"].max(), 1e-9)),
+                format="%.3f",
+            ),
+        },
+    )
@@ -4,17 +4,20 @@ tipo = "stock"
 
 def render(ticker):
     import streamlit as st
-    import yfinance as yf
-    from prophet import Prophet
     from prophet.plot import plot_components_plotly
-    import pandas as pd
     import datetime as dt
-    import plotly.graph_objects as go
-    from utils.flatten_columns import flatten_columns
+    from utils import forecast_models
 
     # Título del plugin
     st.title(":crystal_ball: Stock Price Forecast with Prophet")
-    st.write(f"Generando un pronóstico para el ticker: **{ticker}**")
+
+    modo = st.sidebar.radio(
+        "Modo",
+        options=["Ticker", "Lote"],
+        horizontal=True,
+        key="prophet_modo",
+        help="En modo lote se pronostican todos los símbolos de un screener o de una lista."
+    )
 
     # Selección del rango de fechas para datos históricos
     st.sidebar.subheader("Parámetros de Forecast")
@@ -26,64 +29,34 @@ def render(ticker):
         st.error("La fecha de inicio no puede ser mayor que la fecha de fin.")
         return
 
-    # Descargar datos históricos
-    with st.spinner("Cargando datos históricos y generando pronóstico..."):
+    if modo == "Lote":
+        render_lote(start_date, end_date, int(forecast_period))
+        return
+
+    st.write(f"Generando un pronóstico para el ticker: **{ticker}**")
+
+    # El ajuste corre en segundo plano: el modelo se reutiliza si solo cambia el horizonte
+    trabajo = forecast_models.solicitar(ticker, start_date, end_date)
+    clave = trabajo["clave"]
+    render_cola(ticker, start_date, end_date)
+
+    if trabajo["estado"] == "error":
+        st.error(f"Ocurrió un error al generar el pronóstico para el ticker '{ticker}': {trabajo.get('error')}")
+        if st.button("Reintentar", key="prophet_reintentar"):
+            forecast_models.solicitar(ticker, start_date, end_date, reintentar=True)
+            st.rerun()
+        return
+    if trabajo["estado"] != "listo":
+        esperar_ajuste(clave)
+        return
+
+    with st.spinner("Generando pronóstico..."):
         try:
-            data = yf.download(ticker, start=start_date, end=end_date)
-            data = flatten_columns(data)
-            if data.empty:
-                st.warning(f"No se encontraron datos para el ticker {ticker} en el rango de fechas seleccionado.")
-                return
-
-            # Preparar datos para Prophet
-            df = data[['Close']].reset_index()
-            df = df.rename(columns={'Date': 'ds', 'Close': 'y'})
-
-            # Configurar y entrenar el modelo de Prophet
-            model = Prophet(daily_seasonality=True)
-            model.fit(df)
-
-            # Generar el futuro horizonte
-            future = model.make_future_dataframe(periods=forecast_period)
-            forecast = model.predict(future)
-
-            # Crear gráfico interactivo con datos históricos y pronóstico
-            fig = go.Figure()
-
-            # Datos históricos
-            fig.add_trace(go.Scatter(
-                x=df['ds'], y=df['y'], mode='lines', name='Datos Históricos',
-                line=dict(color='blue', width=2)
-            ))
-
-            # Pronóstico
-            fig.add_trace(go.Scatter(
-                x=forecast['ds'], y=forecast['yhat'], mode='lines', name='Pronóstico',
-                line=dict(color='green', width=2)
-            ))
-
-            # Bandas de incertidumbre
-            fig.add_trace(go.Scatter(
-                x=forecast['ds'], y=forecast['yhat_upper'], mode='lines',
-                name='Banda Superior', line=dict(width=0), showlegend=False,
-                fillcolor='rgba(0, 255, 0, 0.2)', fill='tonexty'
-            ))
-            fig.add_trace(go.Scatter(
-                x=forecast['ds'], y=forecast['yhat_lower'], mode='lines',
-                name='Banda Inferior', line=dict(width=0), showlegend=False,
-                fillcolor='rgba(0, 255, 0, 0.2)', fill='tonexty'
-            ))
-
-            # Configurar el diseño del gráfico
-            fig.update_layout(
-                title=f"Pronóstico de Precios para {ticker}",
-                xaxis_title="Fecha",
-                yaxis_title="Precio (USD)",
-                template="plotly_white",
-                hovermode="x unified",
-                width=1000,
-                height=600
-            )
+            model = forecast_models.obtener_modelo(clave)
+            forecast = forecast_models.pronostico(clave, int(forecast_period))
+            df = model.history[['ds', 'y']]
+
+            fig = figura_pronostico(ticker, df, forecast)
 
             # Mostrar la gráfica en Streamlit
             st.plotly_chart(fig, use_container_width=True)
@@ -99,3 +72,160 @@ def render(ticker):
 
         except Exception as e:
             st.error(f"Ocurrió un error al generar el pronóstico para el ticker '{ticker}': {e}")
+
+
+def esperar_ajuste(clave):
+    """
+    Muestra el progreso del ajuste en un fragmento que se refresca solo, sin bloquear el
+    resto de la página; cuando el modelo está listo vuelve a ejecutar la app completa.
+    """
+    import streamlit as st
+    from utils import forecast_models
+
+    @st.fragment(run_every=1)
+    def progreso():
+        trabajo = forecast_models.estado(clave)
+        if trabajo is None or trabajo["estado"] in ("listo", "error"):
+            st.rerun()
+        segundos = trabajo.get("segundos")
+        texto = f"{trabajo['ticker']}: {trabajo['estado']}" + (f" ({segundos:.0f}s)" if segundos else "")
+        st.progress(trabajo["progreso"], text=texto)
+
+    progreso()
+
+
+def render_cola(ticker, start_date, end_date):
+    """Barra lateral: permite encolar otros tickers con el mismo rango y muestra la cola de ajustes."""
+    import streamlit as st
+    from utils import forecast_models
+
+    otros = st.sidebar.text_input("Encolar otros tickers (separados por coma)", key="prophet_otros")
+    if st.sidebar.button("Encolar", key="prophet_encolar") and otros:
+        for otro in {t.strip().upper() for t in otros.split(",") if t.strip()} - {ticker.upper()}:
+            forecast_models.solicitar(otro, start_date, end_date)
+
+    cola = forecast_models.trabajos()
+    if len(cola) > 1 or (cola and cola[0]["estado"] != "listo"):
+        st.sidebar.caption("Cola de pronósticos")
+        for trabajo in cola:
+            st.sidebar.write(f"- **{trabajo['ticker']}**: {trabajo['estado']}")
+
+
+def figura_pronostico(ticker, df, forecast):
+    """Gráfico con los datos históricos, el pronóstico y sus bandas de incertidumbre."""
+    import plotly.graph_objects as go
+
+    # Crear gráfico interactivo con datos históricos y pronóstico
+    fig = go.Figure()
+
+    # Datos históricos
+    fig.add_trace(go.Scatter(
+        x=df['ds'], y=df['y'], mode='lines', name='Datos Históricos',
+        line=dict(color='blue', width=2)
+    ))
+
+    # Pronóstico
+    fig.add_trace(go.Scatter(
+        x=forecast['ds'], y=forecast['yhat'], mode='lines', name='Pronóstico',
+        line=dict(color='green', width=2)
+    ))
+
+    # Bandas de incertidumbre
+    fig.add_trace(go.Scatter(
+        x=forecast['ds'], y=forecast['yhat_upper'], mode='lines',
+        name='Banda Superior', line=dict(width=0), showlegend=False,
+        fillcolor='rgba(0, 255, 0, 0.2)', fill='tonexty'
+    ))
+    fig.add_trace(go.Scatter(
+        x=forecast['ds'], y=forecast['yhat_lower'], mode='lines',
+        name='Banda Inferior', line=dict(width=0), showlegend=False,
+        fillcolor='rgba(0, 255, 0, 0.2)', fill='tonexty'
+    ))
+
+    # Configurar el diseño del gráfico
+    fig.update_layout(
+        title=f"Pronóstico de Precios para {ticker}",
+        xaxis_title="Fecha",
+        yaxis_title="Precio (USD)",
+        template="plotly_white",
+        hovermode="x unified",
+        width=1000,
+        height=600
+    )
+    return fig
+
+
+def render_lote(start_date, end_date, forecast_period):
+    """
+    Modo lote: pronostica todos los símbolos elegidos en segundo plano (pool de procesos)
+    y muestra un resumen ordenable del movimiento esperado y el ancho de la banda por ticker.
+    """
+    import streamlit as st
+    from utils import forecast_models
+    from utils.watchlist_symbols import seleccionar_simbolos
+
+    symbols = seleccionar_simbolos(key="prophet_lote")
+    if not symbols:
+        st.warning("No hay símbolos para pronosticar.")
+        return
+
+    if st.button(f"Pronosticar {len(symbols)} tickers", key="prophet_lote_iniciar"):
+        st.session_state["prophet_lote"] = forecast_models.solicitar_lote(
+            symbols, start_date, end_date, forecast_period
+        )
+
+    lote_id = st.session_state.get("prophet_lote")
+    lote = forecast_models.estado_lote(lote_id) if lote_id else None
+    if lote is None:
+        return
+
+    if lote["estado"] not in ("listo", "error"):
+        @st.fragment(run_every=1)
+        def progreso():
+            actual = forecast_models.estado_lote(lote_id)
+            if actual["estado"] in ("listo", "error"):
+                st.rerun()
+            st.progress(
+                actual["hechos"] / actual["total"] if actual["total"] else 0.0,
+                text=f"{actual['estado']}: {actual['hechos']}/{actual['total']} tickers ({actual['segundos']:.0f}s)",
+            )
+            if not actual["tabla"].empty:
+                st.dataframe(actual["tabla"], hide_index=True)
+
+        progreso()
+        return
+
+    if lote["estado"] == "error":
+        st.error(f"Ocurrió un error al generar los pronósticos: {lote.get('error')}")
+        return
+
+    tabla = lote["tabla"]
+    st.subheader(f"Resumen de pronósticos a {lote['periods']} días")
+    st.caption(f"{len(tabla)} de {lote['total']} tickers en {lote['segundos']:.0f}s. Haz clic en una columna para ordenar.")
+    if lote["errores"]:
+        with st.expander(f"{len(lote['errores'])} tickers con error"):
+            for ticker, error in lote["errores"].items():
+                st.write(f"- **{ticker}**: {error}")
+    if tabla.empty:
+        return
+
+    st.dataframe(
+        tabla,
+        hide_index=True,
+        column_config={
+            "Último cierre": st.column_config.NumberColumn(format="%.2f"),
+            "Pronóstico": st.column_config.NumberColumn(format="%.2f"),
+            "Movimiento esperado %": st.column_config.NumberColumn(format="%.2f%%"),
+            "Ancho banda %": st.column_config.NumberColumn(format="%.2f%%"),
+            "Movimiento / banda": st.column_config.NumberColumn(format="%.2f"),
+            "Fecha objetivo": st.column_config.DateColumn(),
+        },
+    )
+
+    # Detalle de un ticker del lote (el pronóstico ya está memorizado)
+    detalle = st.selectbox("Ver pronóstico de", options=tabla["Ticker"].tolist(), key="prophet_lote_detalle")
+    clave = forecast_models.clave_modelo(detalle, start_date, end_date)
+    model = forecast_models.obtener_modelo(clave)
+    forecast = forecast_models.pronostico(clave, lote["periods"])
+    if model is not None and forecast is not None:
+        st.plotly_chart(figura_pronostico(detalle, model.history[['ds', 'y']], forecast), use_container_width=True)
@@ -0,0 +1,249 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.cache_dir import get_cache_dir
+
+"""
+Modelos de Isolation Forest persistidos por (ticker, intervalo, métrico, ventana, estimadores,
+contaminación).
+
+El modelo se entrena una sola vez sobre la ventana pedida y se guarda en disco (joblib) junto
+con las estadísticas de normalización y los scores de las velas de entrenamiento. En las
+siguientes ejecuciones solo se puntúan con decision_function las velas nuevas, usando las
+mismas estadísticas; se vuelve a entrenar (con n_jobs en paralelo) cuando las velas nuevas
+superan una fracción de las de entrenamiento o cuando el modelo no cubre el inicio pedido.
+"""
+
+# Proporción de velas nuevas (respecto de las de entrenamiento) a partir de la cual se reentrena
+FRACCION_REENTRENAR = 0.25
+
+# Núcleos usados para entrenar (-1 = todos)
+N_JOBS = -1
+
+# Modelos máximos en memoria (el disco no tiene límite)
+MAX_MODELOS_MEMORIA = 32
+
+METRICOS = ["Cierre", "Cierre y Volumen", "OHLCV", "Volatilidad y Volumen"]
+
+# Columnas de precio/volumen que necesita cada métrico
+COLUMNAS_METRICO = {
+    "Cierre": ["Close"],
+    "Cierre y Volumen": ["Close", "Volume"],
+    "OHLCV": ["Open", "High", "Low", "Close", "Volume"],
+    "Volatilidad y Volumen": ["High", "Low", "Close", "Volume"],
+}
+
+_memoria = OrderedDict()
+_lock = threading.Lock()
+_locks = {}
+
+
+def _lock_para(clave):
+    with _lock:
+        return _locks.setdefault(clave, threading.Lock())
+
+
+def clave_modelo(ticker, interval, metric, start, n_estimators, contamination) -> str:
+    """Clave estable del modelo; 'start' es el inicio de la ventana de entrenamiento."""
+    partes = [ticker.upper(), interval, metric, pd.Timestamp(start).isoformat(),
+              int(n_estimators), round(float(contamination), 4)]
+    return hashlib.sha1(json.dumps(partes).encode("utf-8")).hexdigest()
+
+
+def _ruta(clave):
+    return os.path.join(get_cache_dir("anomaly_models"), f"{clave}.joblib")
+
+
+def _columnas_crudas(df, metric):
+    """
+    Retorna las series (sin normalizar) que forman las features del métrico, por nombre, y los
+    avisos por datos faltantes. Si faltan columnas se recurre al Cierre, como antes en el plugin.
+    """
+    avisos = []
+    if metric == "Cierre y Volumen":
+        if "Volume" in df.columns:
+            return {"Close": df["Close"], "Volume": df["Volume"]}, avisos
+        avisos.append("Datos de volumen no disponibles para el análisis combinado. Se procederá solo con el precio.")
+    elif metric == "OHLCV":
+        columnas = {col: df[col] for col in ["Open", "High", "Low", "Close", "Volume"] if col in df.columns}
+        for col in ["Open", "High", "Low", "Close", "Volume"]:
+            if col not in df.columns:
+                avisos.append(f"Datos de {col} no disponibles y se omitirán en el análisis.")
+        if columnas:
+            return columnas, avisos
+        avisos.append("No se encontraron columnas suficientes para el análisis OHLCV. Se procederá con 'Cierre'.")
+    elif metric == "Volatilidad y Volumen":
+        if all(col in df.columns for col in ["High", "Low", "Volume"]):
+            return {"Volatilidad": df["High"] - df["Low"], "Volume": np.log(df["Volume"] + 1)}, avisos
+        avisos.append("Datos de High, Low o Volume no disponibles para el análisis de Volatilidad y Volumen. Se procederá con 'Cierre'.")
+    return {"Close": df["Close"]}, avisos
+
+
+def preparar_velas(data, metric):
+    """
+    Convierte las velas de get_ohlcv en el DataFrame que usa el modelo: columna 'Fecha', solo las
+    columnas del métrico y, si el métrico incluye volumen, sin las velas de volumen 0.
+    Retorna None si no hay datos.
+    """
+    if data is None or data.empty:
+        return None
+    # Para intervalos intradía el índice se llama "Datetime", de lo contrario "Date"
+    df = data.reset_index()
+    df = df.rename(columns={df.columns[0]: "Fecha"})
+    df = df[["Fecha"] + COLUMNAS_METRICO[metric]].copy()
+    if "Volume" in COLUMNAS_METRICO[metric]:
+        df = df[df["Volume"] != 0]
+    return df if not df.empty else None
+
+
+def estadisticas(df, metric) -> dict:
+    """Media y desviación de cada feature del métrico, calculadas sobre las velas dadas."""
+    columnas, _ = _columnas_crudas(df, metric)
+    return {nombre: (float(serie.mean()), float(serie.std())) for nombre, serie in columnas.items()}
+
+
+def build_features(df, metric, stats=None):
+    """
+    Construye la matriz de features normalizadas (z-score) del métrico.
+
+    Args:
+        df (pd.DataFrame): Velas con las columnas de COLUMNAS_METRICO[metric].
+        metric (str): Uno de METRICOS.
+        stats (dict, opcional): Estadísticas de normalización (las del entrenamiento);
+            si no se indican se calculan sobre df.
+
+    Returns:
+        tuple: (pd.DataFrame de features "<columna>_Normalized" con el índice de df, lista de avisos).
+    """
+    columnas, avisos = _columnas_crudas(df, metric)
+    stats = stats or estadisticas(df, metric)
+    features = {}
+    for nombre, serie in columnas.items():
+        media, desvio = stats[nombre]
+        if desvio and not np.isnan(desvio):
+            features[f"{nombre}_Normalized"] = (serie - media) / desvio
+        else:
+            features[f"{nombre}_Normalized"] = serie * 0.0
+    return pd.DataFrame(features, index=df.index), avisos
+
+
+def _cargar(clave):
+    """Busca el modelo en memoria y luego en disco. Retorna el dict guardado o None."""
+    with _lock:
+        if clave in _memoria:
+            _memoria.move_to_end(clave)
+            return _memoria[clave]
+
+    ruta = _ruta(clave)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        import joblib
+        guardado = joblib.load(ruta)
+    except Exception as e:
+        print(f"No se pudo leer el modelo {ruta}: {e}")
+        return None
+    _recordar(clave, guardado)
+    return guardado
+
+
+def _recordar(clave, guardado):
+    with _lock:
+        _memoria[clave] = guardado
+        _memoria.move_to_end(clave)
+        while len(_memoria) > MAX_MODELOS_MEMORIA:
+            _memoria.popitem(last=False)
+
+
+def _guardar(clave, guardado):
+    """Guarda el modelo en memoria y en disco (escritura atómica)."""
+    import joblib
+    _recordar(clave, guardado)
+    ruta = _ruta(clave)
+    try:
+        joblib.dump(guardado, ruta + ".tmp")
+        os.replace(ruta + ".tmp", ruta)
+    except Exception as e:
+        print(f"No se pudo guardar el modelo {ruta}: {e}")
+
+
+def _entrenar(df, metric, n_estimators, contamination, n_jobs):
+    """Entrena el modelo sobre todas las velas de df y puntúa las mismas velas."""
+    from sklearn.ensemble import IsolationForest
+
+    stats = estadisticas(df, metric)
+    features, _ = build_features(df, metric, stats)
+    model = IsolationForest(
+        n_estimators=n_estimators,
+        contamination=contamination,
+        random_state=42,
+        n_jobs=n_jobs,
+    )
+    model.fit(features)
+    scores = pd.Series(model.decision_function(features), index=pd.DatetimeIndex(df["Fecha"]))
+    return {
+        "model": model,
+        "stats": stats,
+        "fitted_until": df["Fecha"].iloc[-1],
+        "n_train": len(df),
+        "scores": scores[~scores.index.duplicated(keep="last")],
+    }
+
+
+def score(df, ticker, interval, metric, start, n_estimators=100, contamination=0.05,
+          n_jobs=N_JOBS, persist=True):
+    """
+    Puntúa las velas con el modelo persistido, entrenándolo solo si hace falta.
+
+    Las velas hasta la última de entrenamiento (exclusive) reutilizan el score guardado; la
+    última de entrenamiento y las posteriores se puntúan con decision_function, ya que la vela
+    en curso pudo cambiar desde el entrenamiento.
+
+    Args:
+        df (pd.DataFrame): Velas ordenadas con 'Fecha' y las columnas del métrico.
+        ticker, interval, metric: Identifican el modelo junto con start, n_estimators y contamination.
+        start: Inicio de la ventana de entrenamiento.
+        n_jobs (int): Núcleos a usar si hay que entrenar.
+        persist (bool): Si es False se entrena siempre y no se guarda nada.
+
+    Returns:
+        tuple: (df con las columnas de features, 'raw_score' (decision_function; < 0 es anomalía),
+        'Anomaly' y 'norm_score', lista de avisos, bool indicando si se reentrenó).
+    """
+    df = df.reset_index(drop=True)
+    clave = clave_modelo(ticker, interval, metric, start, n_estimators, contamination)
+
+    with _lock_para(clave):
+        guardado = _cargar(clave) if persist else None
+        reentrenado = False
+        if guardado is not None:
+            nuevas = int((df["Fecha"] > guardado["fitted_until"]).sum())
+            if nuevas > FRACCION_REENTRENAR * guardado["n_train"] or df["Fecha"].iloc[0] < guardado["scores"].index[0]:
+                guardado = None
+
+        if guardado is None:
+            guardado = _entrenar(df, metric, n_estimators, contamination, n_jobs)
+            reentrenado = True
+            if persist:
+                _guardar(clave, guardado)
+
+    features, avisos = build_features(df, metric, guardado["stats"])
+    raw = guardado["scores"].reindex(pd.DatetimeIndex(df["Fecha"])).to_numpy(dtype="float64", copy=True)
+    pendientes = np.isnan(raw) | (df["Fecha"] >= guardado["fitted_until"]).to_numpy()
+    if pendientes.any():
+        raw[pendientes] = guardado["model"].decision_function(features.loc[pendientes])
+
+    resultado = pd.concat([df, features], axis=1)
+    resultado["raw_score"] = raw
+    resultado["Anomaly"] = np.where(raw < 0, "Anomalía", "Normal")
+    # Mayor valor indica mayor anomalía, normalizado entre 0 y 1
+    anomaly_scores = -raw
+    rango = anomaly_scores.max() - anomaly_scores.min() if len(raw) else 0
+    resultado["norm_score"] = (anomaly_scores - anomaly_scores.min()) / rango if rango else anomaly_scores * 0
+    return resultado, avisos, reentrenado
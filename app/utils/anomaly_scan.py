@@ -0,0 +1,91 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from models.datasource.market_data import get_ohlcv_lote
+from utils.anomaly_models import preparar_velas, score
+
+"""
+Escaneo de anomalías en lote sobre una lista de símbolos (watchlist o screener).
+
+Las velas se obtienen primero desde la capa de datos (caché local + descargas de los tramos
+faltantes) y luego cada símbolo se entrena/puntúa en un pool de procesos, reutilizando los
+modelos persistidos de utils.anomaly_models. El resultado es una tabla con los símbolos
+ordenados por la anomalía más fuerte de la última sesión.
+"""
+
+def _puntuar_simbolo(symbol, data, interval, metric, start, n_estimators, contamination):
+    """
+    Entrena/puntúa un símbolo y resume su última sesión. Se ejecuta en un proceso del pool,
+    por lo que el modelo se entrena con un solo núcleo (el paralelismo lo da el pool).
+    """
+    df = preparar_velas(data, metric)
+    if df is None or len(df) < 2:
+        return None
+    df, _, reentrenado = score(df, symbol, interval, metric, start, n_estimators=n_estimators,
+                               contamination=contamination, n_jobs=1)
+
+    sesiones = df["Fecha"].dt.date
+    hoy = df[sesiones == sesiones.iloc[-1]]
+    anteriores = df[sesiones < sesiones.iloc[-1]]
+    cierre = float(df["Close"].iloc[-1])
+    cierre_previo = float(anteriores["Close"].iloc[-1]) if not anteriores.empty else float(hoy["Close"].iloc[0])
+    return {
+        "Símbolo": symbol,
+        "Última vela": df["Fecha"].iloc[-1],
+        "Cierre": cierre,
+        "Cambio %": 100 * (cierre / cierre_previo - 1) if cierre_previo else 0.0,
+        "Anomalías sesión": int((hoy["Anomaly"] == "Anomalía").sum()),
+        "Score máx sesión": float(-hoy["raw_score"].min()),
+        "Score última vela": float(-df["raw_score"].iloc[-1]),
+        "Reentrenado": reentrenado,
+    }
+
+
+def scan(symbols, interval="1h", start=None, end=None, metric="Cierre y Volumen",
+         n_estimators=100, contamination=0.05, max_workers=None, on_progress=None) -> pd.DataFrame:
+    """
+    Escanea los símbolos y retorna la tabla de anomalías ordenada de mayor a menor.
+
+    El score es -decision_function del Isolation Forest (mayor valor = más anómalo; > 0 es
+    anomalía según la contaminación), comparable entre símbolos a diferencia del norm_score.
+
+    Args:
+        symbols (list[str]): Símbolos en formato de Yahoo (ver watchlist_symbols.a_ticker_yahoo).
+        interval, start, end: Velas a usar; start es también el inicio de la ventana de entrenamiento.
+        metric (str): Métrico de anomalías (ver anomaly_models.METRICOS).
+        n_estimators (int), contamination (float): Parámetros del modelo.
+        max_workers (int, opcional): Procesos del pool (por defecto, uno por núcleo).
+        on_progress (callable, opcional): Se llama con (hechos, total) a medida que terminan los símbolos.
+
+    Returns:
+        pd.DataFrame: Una fila por símbolo, ordenada por "Score máx sesión".
+    """
+    symbols = list(dict.fromkeys(s for s in symbols if s))
+    velas = get_ohlcv_lote(symbols, start=start, end=end, interval=interval)
+    filas = []
+    if velas:
+        max_workers = max_workers or min(len(velas), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_puntuar_simbolo, symbol, data, interval, metric, start,
+                                n_estimators, contamination): symbol
+                for symbol, data in velas.items()
+            }
+            for hechos, future in enumerate(as_completed(futures), start=1):
+                try:
+                    fila = future.result()
+                except Exception as e:
+                    print(f"No se pudo analizar {futures[future]}: {e}")
+                    fila = None
+                if fila is not None:
+                    filas.append(fila)
+                if on_progress is not None:
+                    on_progress(hechos, len(futures))
+
+    if not filas:
+        return pd.DataFrame()
+    tabla = pd.DataFrame(filas).sort_values("Score máx sesión", ascending=False, ignore_index=True)
+    tabla.index += 1
+    return tabla
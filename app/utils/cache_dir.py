@@ -0,0 +1,18 @@
+import os
+
+# Carpeta base (relativa a app/, que es el cwd de Streamlit) donde se guardan los datos locales
+CACHE_ROOT = "cache"
+
+def get_cache_dir(*subcarpetas):
+    """
+    Retorna la ruta de una subcarpeta dentro de la caché local, creándola si no existe.
+
+    Args:
+        *subcarpetas (str): Partes de la ruta bajo la carpeta de caché (ejemplo: "ohlcv", "1d").
+
+    Returns:
+        str: Ruta de la carpeta.
+    """
+    ruta = os.path.join(CACHE_ROOT, *subcarpetas)
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
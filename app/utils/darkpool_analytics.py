@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+from models.datasource import finra_archive
+
+"""
+Consultas de series de tiempo sobre el archivo de dark pools de FINRA.
+
+Las semanas archivadas se combinan en una tabla indexada por (símbolo, semana[, ATS]) y los
+cálculos (volumen por ATS, variación semana a semana, acumulación inusual) se hacen con
+operaciones agrupadas/vectorizadas sobre todo el tier, sin peticiones a FINRA.
+"""
+
+# Semanas que se usan por defecto en las tendencias y como referencia de la acumulación inusual
+SEMANAS_TENDENCIA = 26
+
+
+def _semanas_hasta(semana, n, tipo, tier):
+    """Las últimas 'n' semanas archivadas no posteriores a 'semana' (o a la más reciente), de la más antigua a la más reciente."""
+    archivadas = finra_archive.semanas_archivadas(tipo, tier)
+    if semana is not None:
+        archivadas = [s for s in archivadas if s <= semana]
+    return sorted(archivadas[:n])
+
+
+def _semanas_calendario(semana, n):
+    """Las 'n' semanas de calendario consecutivas que terminan en 'semana', de la más antigua a la más reciente."""
+    fin = pd.Timestamp(semana)
+    return [(fin - pd.Timedelta(weeks=i)).strftime("%Y-%m-%d") for i in range(n - 1, -1, -1)]
+
+
+def tabla_indexada(semanas, tipo="ATS_W_SMBL_FIRM", tier="T1", simbolos=None) -> pd.DataFrame:
+    """
+    Combina las semanas archivadas en una tabla indexada por (símbolo, semana) o, para el
+    resumen por ATS, por (símbolo, semana, MPID), ordenada para consultas por rango.
+    """
+    df = finra_archive.cargar(semanas, tipo, tier, simbolos=simbolos)
+    claves = ["issueSymbolIdentifier", "weekStartDate"] + (["MPID"] if tipo == "ATS_W_SMBL_FIRM" else [])
+    return df.set_index(claves).sort_index()
+
+
+def volumen_por_ats(simbolo, semanas=SEMANAS_TENDENCIA, hasta=None, tier="T1", medida="totalWeeklyShareQuantity") -> pd.DataFrame:
+    """
+    Volumen semanal de un símbolo repartido por ATS.
+
+    Args:
+        simbolo (str): Símbolo (issueSymbolIdentifier).
+        semanas (int): Cantidad de semanas archivadas hacia atrás.
+        hasta (str, opcional): Última semana a incluir (por defecto la más reciente archivada).
+        medida (str): "totalWeeklyShareQuantity" o "totalWeeklyTradeCount".
+
+    Returns:
+        pd.DataFrame: Una fila por semana y una columna por ATS (nombre del participante),
+        ordenadas las columnas de mayor a menor volumen total.
+    """
+    periodo = _semanas_hasta(hasta, semanas, "ATS_W_SMBL_FIRM", tier)
+    df = tabla_indexada(periodo, "ATS_W_SMBL_FIRM", tier, simbolos=[simbolo]).reset_index()
+    if df.empty:
+        return pd.DataFrame()
+    tabla = df.pivot_table(index="weekStartDate", columns="marketParticipantName", values=medida,
+                           aggfunc="sum", fill_value=0)
+    tabla = tabla.reindex(periodo, fill_value=0)
+    return tabla[tabla.sum().sort_values(ascending=False).index]
+
+
+def ranking_variacion(semana=None, semanas_referencia=SEMANAS_TENDENCIA, tier="T1", min_acciones=100_000) -> pd.DataFrame:
+    """
+    Ranking de todos los símbolos del tier por acumulación inusual en dark pools.
+
+    Para cada símbolo compara las acciones negociadas en 'semana' con la semana de calendario
+    anterior (variación semana a semana) y con la media y el desvío de las 'semanas_referencia'
+    semanas de calendario previas (z-score). Todo se calcula sobre una matriz semanas x símbolos.
+
+    Las semanas del periodo que no están en el archivo se listan en attrs["faltantes"]. Si falta
+    la semana evaluada o la anterior no se calcula el ranking (retorna un DataFrame vacío con
+    esas semanas en attrs["faltantes"]); si faltan semanas de referencia, la media y el desvío
+    usan solo las archivadas.
+
+    Args:
+        semana (str, opcional): Semana a evaluar (por defecto la más reciente archivada).
+        semanas_referencia (int): Semanas previas usadas como referencia.
+        tier (str): Tier de FINRA.
+        min_acciones (int): Volumen mínimo en la semana evaluada para entrar al ranking.
+
+    Returns:
+        pd.DataFrame: Una fila por símbolo, ordenada por z-score descendente.
+    """
+    archivadas = finra_archive.semanas_archivadas("ATS_W_SMBL", tier)
+    if semana is None:
+        if not archivadas:
+            return pd.DataFrame()
+        semana = archivadas[0]
+    periodo = _semanas_calendario(semana, semanas_referencia + 1)
+    faltantes = [s for s in periodo if s not in set(archivadas)]
+    if periodo[-1] in faltantes or periodo[-2] in faltantes:
+        vacio = pd.DataFrame()
+        vacio.attrs["faltantes"] = [s for s in periodo[-2:] if s in faltantes]
+        return vacio
+    periodo = [s for s in periodo if s not in faltantes]
+    df = finra_archive.cargar(periodo, "ATS_W_SMBL", tier)
+    nombres = df.drop_duplicates("issueSymbolIdentifier", keep="last").set_index("issueSymbolIdentifier")["issueName"]
+    # Matriz semanas x símbolos (un símbolo sin operaciones en una semana cuenta como 0)
+    matriz = df.pivot_table(index="weekStartDate", columns="issueSymbolIdentifier",
+                            values="totalWeeklyShareQuantity", aggfunc="sum", fill_value=0)
+    matriz = matriz.reindex(periodo, fill_value=0).astype("float64")
+
+    actual = matriz.iloc[-1]
+    anterior = matriz.iloc[-2]
+    referencia = matriz.iloc[:-1]
+    media = referencia.mean()
+    desvio = referencia.std(ddof=0).replace(0, np.nan)
+
+    tabla = pd.DataFrame({
+        "Símbolo": matriz.columns,
+        "Nombre": nombres.reindex(matriz.columns).to_numpy(),
+        "Acciones": actual.to_numpy(),
+        "Semana anterior": anterior.to_numpy(),
+        "Variación %": (100 * (actual / anterior.replace(0, np.nan) - 1)).to_numpy(),
+        f"Media {len(referencia)} sem.": media.to_numpy(),
+        "Veces la media": (actual / media.replace(0, np.nan)).to_numpy(),
+        "Z-score": ((actual - media) / desvio).to_numpy(),
+    })
+    tabla = tabla[tabla["Acciones"] >= min_acciones]
+    tabla = tabla.sort_values(["Z-score", "Veces la media"], ascending=False, na_position="last", ignore_index=True)
+    tabla.attrs["faltantes"] = faltantes
+    return tabla
@@ -0,0 +1,341 @@
+import os
+import json
+import uuid
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from utils.cache_dir import get_cache_dir
+
+"""
+Modelos de Prophet ajustados en segundo plano y persistidos en disco.
+
+Cada modelo se identifica por (ticker, rango de entrenamiento, parámetros) y se guarda como
+JSON (prophet.serialize) en cache/prophet/. Los ajustes se encolan en un pool pequeño de
+hilos, de modo que el script de Streamlit nunca ajusta de forma sincrónica: consulta el
+estado del trabajo y, cuando el modelo está listo, solo calcula el pronóstico para el
+horizonte pedido (que se memoriza por horizonte).
+
+Los pronósticos en lote (varios tickers) ajustan los modelos en un pool de procesos con
+concurrencia acotada, coordinado desde un hilo para que la página siga respondiendo.
+"""
+
+# Ajustes simultáneos; el resto queda en cola
+MAX_AJUSTES_SIMULTANEOS = 2
+
+# Parámetros por defecto del modelo
+PARAMETROS_DEFECTO = {"daily_seasonality": True}
+
+# Procesos máximos para los pronósticos en lote (Prophet usa bastante memoria por ajuste)
+MAX_PROCESOS_LOTE = 4
+
+# Modelos y pronósticos máximos en memoria
+MAX_MODELOS_MEMORIA = 16
+MAX_PRONOSTICOS_MEMORIA = 64
+
+# Estados de un trabajo y el progreso aproximado que representan
+ESTADOS = {
+    "en cola": 0.0,
+    "descargando datos": 0.1,
+    "ajustando modelo": 0.3,
+    "guardando": 0.9,
+    "listo": 1.0,
+    "error": 1.0,
+}
+
+_executor = ThreadPoolExecutor(max_workers=MAX_AJUSTES_SIMULTANEOS, thread_name_prefix="prophet")
+_trabajos = {}
+_lotes = {}
+_modelos = OrderedDict()
+_pronosticos = OrderedDict()
+_lock = threading.RLock()
+
+
+def clave_modelo(ticker, start, end, parametros=None) -> str:
+    """Clave estable del modelo: ticker, rango de entrenamiento y parámetros de Prophet."""
+    partes = [ticker.upper(), str(start), str(end), parametros or PARAMETROS_DEFECTO]
+    return hashlib.sha1(json.dumps(partes, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _ruta(clave):
+    return os.path.join(get_cache_dir("prophet"), f"{clave}.json")
+
+
+def _recordar(cache, clave, valor, maximo):
+    with _lock:
+        cache[clave] = valor
+        cache.move_to_end(clave)
+        while len(cache) > maximo:
+            cache.popitem(last=False)
+
+
+def obtener_modelo(clave):
+    """Retorna el modelo ajustado (memoria o disco) o None si todavía no existe."""
+    with _lock:
+        if clave in _modelos:
+            _modelos.move_to_end(clave)
+            return _modelos[clave]
+
+    ruta = _ruta(clave)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        from prophet.serialize import model_from_json
+        with open(ruta, "r", encoding="utf-8") as file:
+            model = model_from_json(json.load(file)["model"])
+    except Exception as e:
+        print(f"No se pudo leer el modelo de Prophet {ruta}: {e}")
+        return None
+    _recordar(_modelos, clave, model, MAX_MODELOS_MEMORIA)
+    return model
+
+
+def _guardar(clave, model, meta):
+    """Guarda el modelo serializado en disco (escritura atómica) y en memoria."""
+    from prophet.serialize import model_to_json
+    _recordar(_modelos, clave, model, MAX_MODELOS_MEMORIA)
+    ruta = _ruta(clave)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as file:
+        json.dump({"meta": meta, "model": model_to_json(model)}, file)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def _actualizar(clave, **cambios):
+    with _lock:
+        _trabajos[clave].update(cambios)
+
+
+def _entrenar(data, parametros):
+    """Ajusta un modelo de Prophet sobre los cierres de las velas diarias de get_ohlcv."""
+    from prophet import Prophet
+
+    df = data[["Close"]].reset_index()
+    df = df.rename(columns={df.columns[0]: "ds", "Close": "y"})
+    model = Prophet(**parametros)
+    model.fit(df)
+    return model
+
+
+def _meta(ticker, start, end, parametros):
+    return {"ticker": ticker, "start": str(start), "end": str(end),
+            "parametros": parametros, "fitted_at": time.time()}
+
+
+def _ajustar(clave, ticker, start, end, parametros):
+    """Tarea del pool: descarga las velas diarias, ajusta el modelo y lo guarda."""
+    from models.datasource.market_data import get_ohlcv
+
+    try:
+        _actualizar(clave, estado="descargando datos", inicio=time.time())
+        data = get_ohlcv(ticker, start=start, end=end)
+        if data.empty:
+            raise ValueError(f"No se encontraron datos para el ticker {ticker} en el rango de fechas seleccionado.")
+
+        _actualizar(clave, estado="ajustando modelo")
+        model = _entrenar(data, parametros)
+
+        _actualizar(clave, estado="guardando")
+        _guardar(clave, model, _meta(ticker, start, end, parametros))
+        _actualizar(clave, estado="listo", fin=time.time())
+    except Exception as e:
+        _actualizar(clave, estado="error", error=str(e), fin=time.time())
+
+
+def solicitar(ticker, start, end, parametros=None, reintentar=False) -> dict:
+    """
+    Pide el modelo de (ticker, rango): si ya está en disco se marca como listo, y si no se
+    encola su ajuste (sin duplicar uno en curso). Un trabajo con error solo se vuelve a
+    encolar si reintentar es True.
+
+    Returns:
+        dict: Copia del trabajo (ver estado()).
+    """
+    parametros = parametros or PARAMETROS_DEFECTO
+    clave = clave_modelo(ticker, start, end, parametros)
+    with _lock:
+        trabajo = _trabajos.get(clave)
+        if trabajo is not None and (trabajo["estado"] != "error" or not reintentar):
+            return estado(clave)
+
+    if obtener_modelo(clave) is not None:
+        trabajo = {"clave": clave, "ticker": ticker, "estado": "listo", "encolado": time.time()}
+        with _lock:
+            _trabajos[clave] = trabajo
+        return estado(clave)
+
+    with _lock:
+        trabajo = _trabajos.get(clave)
+        if trabajo is not None and (trabajo["estado"] != "error" or not reintentar):
+            return estado(clave)
+        _trabajos[clave] = {"clave": clave, "ticker": ticker, "estado": "en cola", "encolado": time.time()}
+    _executor.submit(_ajustar, clave, ticker, start, end, parametros)
+    return estado(clave)
+
+
+def estado(clave) -> dict:
+    """
+    Retorna una copia del trabajo: clave, ticker, estado (ver ESTADOS), progreso (0-1),
+    segundos transcurridos y error si lo hubo. None si el trabajo no existe.
+    """
+    with _lock:
+        trabajo = _trabajos.get(clave)
+        if trabajo is None:
+            return None
+        trabajo = dict(trabajo)
+    trabajo["progreso"] = ESTADOS[trabajo["estado"]]
+    if "inicio" in trabajo:
+        trabajo["segundos"] = trabajo.get("fin", time.time()) - trabajo["inicio"]
+    return trabajo
+
+
+def trabajos() -> list:
+    """Retorna todos los trabajos conocidos, del más reciente al más antiguo."""
+    with _lock:
+        claves = sorted(_trabajos, key=lambda c: _trabajos[c]["encolado"], reverse=True)
+    return [estado(clave) for clave in claves]
+
+
+def pronostico(clave, periods) -> pd.DataFrame:
+    """
+    Retorna el pronóstico del modelo para 'periods' días (memorizado por horizonte), o None
+    si el modelo no está listo. Cambiar el horizonte no vuelve a ajustar el modelo.
+    """
+    with _lock:
+        if (clave, periods) in _pronosticos:
+            _pronosticos.move_to_end((clave, periods))
+            return _pronosticos[(clave, periods)]
+
+    model = obtener_modelo(clave)
+    if model is None:
+        return None
+    future = model.make_future_dataframe(periods=periods)
+    forecast = model.predict(future)
+    _recordar(_pronosticos, (clave, periods), forecast, MAX_PRONOSTICOS_MEMORIA)
+    return forecast
+
+
+def resumen_pronostico(ticker, history, forecast) -> dict:
+    """
+    Resume un pronóstico: último cierre, valor esperado al final del horizonte, movimiento
+    esperado y ancho de la banda de confianza (ambos en % del último cierre).
+    """
+    ultimo = float(history["y"].iloc[-1])
+    final = forecast.iloc[-1]
+    movimiento = 100 * (float(final["yhat"]) / ultimo - 1) if ultimo else 0.0
+    ancho = 100 * float(final["yhat_upper"] - final["yhat_lower"]) / ultimo if ultimo else 0.0
+    return {
+        "Ticker": ticker,
+        "Último cierre": ultimo,
+        "Fecha objetivo": final["ds"],
+        "Pronóstico": float(final["yhat"]),
+        "Movimiento esperado %": movimiento,
+        "Ancho banda %": ancho,
+        # Movimiento esperado por unidad de incertidumbre
+        "Movimiento / banda": movimiento / ancho if ancho else 0.0,
+    }
+
+
+def _pronosticar_en_proceso(ticker, clave, data, start, end, parametros, periods):
+    """
+    Tarea del pool de procesos: reutiliza el modelo guardado en disco o lo ajusta (y lo guarda),
+    y calcula el pronóstico. Retorna (fila de resumen, pronóstico, si se ajustó).
+    """
+    model = obtener_modelo(clave)
+    ajustado = model is None
+    if ajustado:
+        if data is None or data.empty:
+            raise ValueError(f"No se encontraron datos para el ticker {ticker}.")
+        model = _entrenar(data, parametros)
+        _guardar(clave, model, _meta(ticker, start, end, parametros))
+    forecast = model.predict(model.make_future_dataframe(periods=periods))
+    return resumen_pronostico(ticker, model.history, forecast), forecast, ajustado
+
+
+def _ejecutar_lote(lote_id, tickers, start, end, periods, parametros, max_workers):
+    """Hilo coordinador de un lote: descarga las velas que falten y reparte los ajustes en procesos."""
+    from models.datasource.market_data import get_ohlcv_lote
+
+    lote = _lotes[lote_id]
+    try:
+        claves = {ticker: clave_modelo(ticker, start, end, parametros) for ticker in tickers}
+        # Solo hace falta descargar las velas de los tickers sin modelo guardado
+        faltantes = [t for t in tickers if not os.path.exists(_ruta(claves[t]))]
+        with _lock:
+            lote["estado"] = "descargando datos"
+        velas = get_ohlcv_lote(faltantes, start=start, end=end) if faltantes else {}
+
+        with _lock:
+            lote["estado"] = "ajustando modelos"
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_pronosticar_en_proceso, ticker, claves[ticker], velas.get(ticker),
+                                start, end, parametros, periods): ticker
+                for ticker in tickers
+            }
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    fila, forecast, ajustado = future.result()
+                    _recordar(_pronosticos, (claves[ticker], periods), forecast, MAX_PRONOSTICOS_MEMORIA)
+                    with _lock:
+                        lote["filas"].append({**fila, "Reajustado": ajustado})
+                except Exception as e:
+                    with _lock:
+                        lote["errores"][ticker] = str(e)
+                with _lock:
+                    lote["hechos"] += 1
+        with _lock:
+            lote["estado"] = "listo"
+    except Exception as e:
+        with _lock:
+            lote["estado"] = "error"
+            lote["error"] = str(e)
+    finally:
+        with _lock:
+            lote["fin"] = time.time()
+
+
+def solicitar_lote(tickers, start, end, periods, parametros=None, max_workers=None) -> str:
+    """
+    Lanza en segundo plano el pronóstico de varios tickers con el mismo rango y horizonte.
+    Los modelos ya guardados se reutilizan; el resto se ajusta en un pool de procesos.
+
+    Returns:
+        str: Identificador del lote (ver estado_lote()).
+    """
+    parametros = parametros or PARAMETROS_DEFECTO
+    tickers = list(dict.fromkeys(t.upper() for t in tickers if t))
+    max_workers = max_workers or max(1, min(len(tickers), os.cpu_count() or 1, MAX_PROCESOS_LOTE))
+    lote_id = uuid.uuid4().hex
+    with _lock:
+        _lotes[lote_id] = {"id": lote_id, "estado": "en cola", "total": len(tickers), "hechos": 0,
+                           "filas": [], "errores": {}, "inicio": time.time(), "periods": periods}
+    threading.Thread(
+        target=_ejecutar_lote,
+        args=(lote_id, tickers, start, end, periods, parametros, max_workers),
+        name=f"prophet-lote-{lote_id[:8]}",
+        daemon=True,
+    ).start()
+    return lote_id
+
+
+def estado_lote(lote_id) -> dict:
+    """
+    Retorna una copia del lote: estado, total, hechos, errores por ticker, segundos y la tabla
+    de resumen ('tabla', ordenada por movimiento esperado). None si el lote no existe.
+    """
+    with _lock:
+        lote = _lotes.get(lote_id)
+        if lote is None:
+            return None
+        lote = {**lote, "filas": list(lote["filas"]), "errores": dict(lote["errores"])}
+    lote["segundos"] = lote.get("fin", time.time()) - lote["inicio"]
+    tabla = pd.DataFrame(lote.pop("filas"))
+    if not tabla.empty:
+        tabla = tabla.sort_values("Movimiento esperado %", ascending=False, ignore_index=True)
+    lote["tabla"] = tabla
+    return lote
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from utils.cache_dir import get_cache_dir
+
+"""
+Cliente HTTP con caché compartida para las fuentes externas (FINRA, CNN, Nasdaq,
+TradingView, Yahoo).
+
+Cada respuesta correcta se guarda en memoria y en disco (cache/http/<fuente>/), con un
+TTL por fuente. Mientras la respuesta es fresca se sirve directamente; cuando vence pero
+sigue dentro de la ventana "stale", se sirve la copia vieja al instante y se refresca en
+segundo plano (stale-while-revalidate), fuera del render de Streamlit.
+"""
+
+# (ttl, stale) en segundos por fuente: 'ttl' es la vida fresca y 'stale' el tiempo extra
+# durante el cual se sirve la copia vieja mientras se refresca en segundo plano
+TTL_FUENTES = {
+    "finra": (6 * 3600, 7 * 24 * 3600),
+    "cnn": (10 * 60, 24 * 3600),
+    "nasdaq": (15 * 60, 24 * 3600),
+    "tradingview": (60, 3600),
+    "tradingview_watchlist": (30 * 60, 7 * 24 * 3600),
+    "yahoo_search": (24 * 3600, 30 * 24 * 3600),
+}
+TTL_DEFECTO = (5 * 60, 3600)
+
+# Entradas máximas en memoria (el disco no tiene límite)
+MAX_ENTRADAS_MEMORIA = 512
+
+_memoria = OrderedDict()
+_memoria_lock = threading.Lock()
+_en_curso = set()
+_en_curso_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="http-cache")
+
+
+def _clave(method, url, params, body):
+    """Clave estable de una petición (método, URL, parámetros y cuerpo JSON; sin headers)."""
+    texto = json.dumps([method.upper(), url, params or {}, body], sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+def _ruta(fuente, clave):
+    return os.path.join(get_cache_dir("http", fuente), f"{clave}.json")
+
+
+def _leer(fuente, clave):
+    """Busca la entrada en memoria y, si no está, en disco. Retorna (payload, timestamp) o None."""
+    with _memoria_lock:
+        if (fuente, clave) in _memoria:
+            _memoria.move_to_end((fuente, clave))
+            return _memoria[(fuente, clave)]
+
+    ruta = _ruta(fuente, clave)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with open(ruta, "r", encoding="utf-8") as file:
+            guardado = json.load(file)
+        entrada = (guardado["payload"], guardado["fetched_at"])
+    except Exception as e:
+        print(f"No se pudo leer la caché HTTP {ruta}: {e}")
+        return None
+    _recordar(fuente, clave, entrada)
+    return entrada
+
+
+def _recordar(fuente, clave, entrada):
+    """Guarda la entrada en la caché de memoria, expulsando las menos usadas."""
+    with _memoria_lock:
+        _memoria[(fuente, clave)] = entrada
+        _memoria.move_to_end((fuente, clave))
+        while len(_memoria) > MAX_ENTRADAS_MEMORIA:
+            _memoria.popitem(last=False)
+
+
+def _guardar(fuente, clave, payload):
+    """Guarda la respuesta en memoria y en disco (escritura atómica)."""
+    entrada = (payload, time.time())
+    _recordar(fuente, clave, entrada)
+    ruta = _ruta(fuente, clave)
+    try:
+        with open(ruta + ".tmp", "w", encoding="utf-8") as file:
+            json.dump({"fetched_at": entrada[1], "payload": payload}, file)
+        os.replace(ruta + ".tmp", ruta)
+    except Exception as e:
+        print(f"No se pudo guardar la caché HTTP {ruta}: {e}")
+    return entrada
+
+
+def _descargar(fuente, clave, method, url, params, body, headers, parse, session, timeout):
+    """Hace la petición y, si es correcta, guarda el resultado. Lanza requests.HTTPError si falla."""
+    cliente = session or requests
+    response = cliente.request(method, url, params=params, json=body, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    payload = response.json() if parse == "json" else response.text
+    return _guardar(fuente, clave, payload)[0]
+
+
+def _refrescar_en_segundo_plano(clave, *args):
+    """Lanza un refresco en el pool, evitando duplicar uno que ya esté en curso para la misma clave."""
+    with _en_curso_lock:
+        if clave in _en_curso:
+            return
+        _en_curso.add(clave)
+
+    def tarea():
+        try:
+            _descargar(args[0], clave, *args[1:])
+        except Exception as e:
+            print(f"No se pudo refrescar la caché HTTP ({args[0]} {args[2]}): {e}")
+        finally:
+            with _en_curso_lock:
+                _en_curso.discard(clave)
+
+    _executor.submit(tarea)
+
+
+def fetch(fuente, url, method="GET", params=None, json_body=None, headers=None,
+          parse="json", ttl=None, session=None, timeout=15):
+    """
+    Realiza una petición HTTP sirviéndola desde la caché cuando es posible.
+
+    Args:
+        fuente (str): Nombre de la fuente (clave de TTL_FUENTES y subcarpeta en disco).
+        url (str): URL a consultar.
+        method (str): "GET" o "POST".
+        params (dict, opcional): Parámetros de la query string.
+        json_body (dict | list, opcional): Cuerpo JSON de la petición.
+        headers (dict, opcional): Headers (no forman parte de la clave de caché).
+        parse (str): "json" para decodificar la respuesta como JSON o "text" para el texto.
+        ttl (tuple[int, int], opcional): (ttl, stale) en segundos; por defecto el de la fuente.
+        session (requests.Session, opcional): Sesión a usar en lugar de requests.
+        timeout (int): Segundos de espera de la petición.
+
+    Returns:
+        El JSON decodificado o el texto de la respuesta. Se comparte entre llamadas, no debe modificarse.
+
+    Raises:
+        requests.RequestException: Si la petición falla y no hay ninguna copia en caché para servir.
+    """
+    vida, stale = ttl or TTL_FUENTES.get(fuente, TTL_DEFECTO)
+    clave = _clave(method, url, params, json_body)
+    args = (fuente, method, url, params, json_body, headers, parse, session, timeout)
+
+    entrada = _leer(fuente, clave)
+    if entrada is not None:
+        payload, fetched_at = entrada
+        edad = time.time() - fetched_at
+        if edad < vida:
+            return payload
+        if edad < vida + stale:
+            # Servir la copia vieja al instante y refrescar fuera del render
+            _refrescar_en_segundo_plano(clave, *args)
+            return payload
+
+    try:
+        return _descargar(fuente, clave, method, url, params, json_body, headers, parse, session, timeout)
+    except requests.RequestException:
+        # Si la fuente falla, es preferible una copia vencida a no mostrar nada
+        if entrada is not None:
+            return entrada[0]
+        raise
+
+
+def invalidate(fuente=None):
+    """Elimina de memoria y disco las entradas de una fuente (o de todas si fuente es None)."""
+    with _memoria_lock:
+        for clave in [c for c in _memoria if fuente is None or c[0] == fuente]:
+            del _memoria[clave]
+    fuentes = [fuente] if fuente else os.listdir(get_cache_dir("http"))
+    for nombre in fuentes:
+        carpeta = get_cache_dir("http", nombre)
+        for archivo in os.listdir(carpeta):
+            if archivo.endswith(".json"):
+                os.remove(os.path.join(carpeta, archivo))
@@ -0,0 +1,91 @@
+import os
+import re
+import sys
+import subprocess
+
+"""
+Perfil del tiempo de importación de módulos, a partir de la salida de `python -X importtime`
+(o de la variable de entorno PYTHONPROFILEIMPORTTIME=1).
+
+Se usa de dos formas:
+  - Desde win.py con --profile-imports: el servidor de Streamlit se lanza con
+    PYTHONPROFILEIMPORTTIME=1 y, al estar listo, se escribe el reporte en cache/import_profile.txt.
+  - Desde la carpeta app: `python -m utils.import_profiler plugins.dashboard.dashboard ...`
+    importa los módulos indicados en un proceso aparte y muestra el reporte.
+"""
+
+# Formato de cada línea: "import time:   self [us] | cumulative | imported package"
+_LINEA = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$")
+
+
+def parse_importtime(lineas) -> list:
+    """
+    Convierte las líneas de -X importtime en registros
+    {"modulo", "self_ms", "acumulado_ms", "nivel"} (nivel 0 = importado directamente).
+    Las líneas que no son de importtime se ignoran.
+    """
+    registros = []
+    for linea in lineas:
+        match = _LINEA.match(linea.rstrip("\n"))
+        if not match:
+            continue
+        propio, acumulado, sangria, modulo = match.groups()
+        registros.append({
+            "modulo": modulo.strip(),
+            "self_ms": int(propio) / 1000,
+            "acumulado_ms": int(acumulado) / 1000,
+            "nivel": max(0, (len(sangria) - 1) // 2),
+        })
+    return registros
+
+
+def reporte(registros, top=30) -> str:
+    """
+    Arma un reporte de texto con el costo total y los módulos más caros: primero los
+    importados directamente (costo acumulado) y luego los de mayor costo propio.
+    """
+    if not registros:
+        return "No se registraron importaciones."
+
+    raiz = [r for r in registros if r["nivel"] == 0]
+    total = sum(r["acumulado_ms"] for r in raiz)
+    lineas = [f"Tiempo total de importación: {total:,.0f} ms en {len(registros)} módulos", ""]
+
+    lineas.append(f"{'Acumulado (ms)':>15}  {'%':>6}  Módulo importado directamente")
+    for r in sorted(raiz, key=lambda r: r["acumulado_ms"], reverse=True)[:top]:
+        porcentaje = 100 * r["acumulado_ms"] / total if total else 0
+        lineas.append(f"{r['acumulado_ms']:>15,.1f}  {porcentaje:>5.1f}%  {r['modulo']}")
+
+    lineas += ["", f"{'Propio (ms)':>15}  Módulo"]
+    for r in sorted(registros, key=lambda r: r["self_ms"], reverse=True)[:top]:
+        lineas.append(f"{r['self_ms']:>15,.1f}  {r['modulo']}")
+    return "\n".join(lineas)
+
+
+def guardar_reporte(registros, ruta, top=30) -> str:
+    """Escribe el reporte en 'ruta' y lo retorna."""
+    texto = reporte(registros, top)
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as file:
+        file.write(texto + "\n")
+    return texto
+
+
+def perfilar_modulos(modulos, cwd=None) -> list:
+    """Importa los módulos en un proceso nuevo con -X importtime y retorna sus registros."""
+    codigo = "; ".join(f"import {modulo}" for modulo in modulos)
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+    )
+    if proceso.returncode != 0:
+        errores = [l for l in proceso.stderr.splitlines() if not l.startswith("import time:")]
+        print("\n".join(errores[-10:]))
+    return parse_importtime(proceso.stderr.splitlines())
+
+
+if __name__ == "__main__":
+    modulos = sys.argv[1:] or ["plugins.dashboard.dashboard"]
+    print(reporte(perfilar_modulos(modulos)))
@@ -0,0 +1,127 @@
+import sys
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+"""
+Motor de indicadores con memoización.
+
+Separa el cálculo de un indicador de su estilo: el resultado numérico se guarda en una
+caché LRU de proceso, indexada por la huella de los datos OHLCV y los parámetros numéricos.
+Así, cambiar colores, opacidad o ancho de línea vuelve a dibujar sin recalcular nada.
+"""
+
+# Columnas que definen la huella de los datos
+COLUMNAS_HUELLA = ["Fecha", "Open", "High", "Low", "Close", "Volume"]
+
+
+class IndicatorCache:
+    """Caché LRU acotada por número de entradas y por tamaño aproximado en bytes."""
+
+    def __init__(self, max_entries=512, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+
+    def put(self, key, value):
+        size = _tamano(value)
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            # Expulsar las entradas menos usadas recientemente
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, old_size) = self._data.popitem(last=False)
+                self._bytes -= old_size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"IndicatorCache({len(self._data)} entradas, {self._bytes / 1e6:.1f} MB)"
+
+
+def _tamano(value):
+    """Estima el tamaño en bytes de un resultado (pandas, NumPy o contenedores de ellos)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=False))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_tamano(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_tamano(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+_CACHE = IndicatorCache()
+
+
+def fingerprint(data: pd.DataFrame) -> str:
+    """
+    Calcula la huella (hash) de las columnas OHLCV y del índice de un DataFrame.
+    Se memoriza en data.attrs para no recalcularla con cada indicador del mismo rerun. Como
+    pandas propaga attrs a los DataFrames derivados, se guarda junto a una referencia débil al
+    propio DataFrame: en un derivado apunta a otro objeto (o a ninguno si ya se liberó), a
+    diferencia de id(data), que un DataFrame nuevo puede reutilizar.
+    """
+    guardada = data.attrs.get("fingerprint")
+    if guardada and isinstance(guardada[0], weakref.ref) and guardada[0]() is data:
+        return guardada[1]
+
+    columnas = [col for col in COLUMNAS_HUELLA if col in data.columns]
+    hashes = pd.util.hash_pandas_object(data[columnas], index=True).to_numpy()
+    huella = hashlib.sha1(hashes.tobytes()).hexdigest()
+    data.attrs["fingerprint"] = (weakref.ref(data), huella)
+    return huella
+
+
+def compute(nombre: str, data: pd.DataFrame, func, **params):
+    """
+    Retorna func(data, **params), calculándolo solo si no está en caché.
+
+    Args:
+        nombre (str): Identificador del cálculo (ejemplo: "rsi").
+        data (pd.DataFrame): Datos OHLCV sobre los que se calcula.
+        func (callable): Función de cálculo pura; no debe depender de parámetros de estilo.
+        **params: Parámetros numéricos del cálculo (forman parte de la clave).
+
+    Returns:
+        El resultado de func. Se comparte entre reruns, por lo que no debe modificarse.
+    """
+    key = (nombre, fingerprint(data), tuple(sorted((k, repr(v)) for k, v in params.items())))
+    result = _CACHE.get(key)
+    if result is None:
+        result = func(data, **params)
+        _CACHE.put(key, result)
+    return result
+
+
+def get_cache() -> IndicatorCache:
+    """Retorna la caché de indicadores del proceso."""
+    return _CACHE
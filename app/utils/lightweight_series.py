@@ -0,0 +1,283 @@
+import numpy as np
+import pandas as pd
+
+"""
+Serialización vectorizada de columnas de un DataFrame a los payloads que espera
+streamlit-lightweight-charts ({"time", "value"} / {"time", "open", ...}).
+
+La conversión a epoch, el filtrado de NaN y el redondeo se hacen con NumPy sobre
+columnas completas; solo la construcción final de los diccionarios recorre los datos.
+"""
+
+# Decimales por defecto para los valores enviados al gráfico: "auto" los elige según la
+# magnitud de la serie (ver _decimales), así los activos de fracciones de centavo no quedan en 0
+DECIMALES = "auto"
+
+
+def to_epoch(fechas) -> np.ndarray:
+    """
+    Convierte una columna de fechas a segundos desde epoch, igual que Timestamp.timestamp():
+    las fechas sin zona horaria se interpretan como UTC. Las fechas anteriores a 1970 quedan
+    negativas y las nulas (NaT) como NaN, por eso el resultado es float64 (los segundos son
+    exactos) y las series lo convierten a entero al armar cada punto.
+    """
+    fechas = pd.Series(pd.to_datetime(fechas))
+    epoch = pd.Timestamp("1970-01-01", tz="UTC") if fechas.dt.tz is not None else pd.Timestamp("1970-01-01")
+    segundos = (fechas - epoch) // pd.Timedelta(seconds=1)
+    return segundos.where(fechas.notna()).to_numpy(dtype="float64")
+
+
+def _decimales(valores) -> int:
+    """
+    Decimales suficientes según la magnitud (unas 5 cifras significativas): 2 para precios
+    normales, 4 para tipos de cambio y más para activos de fracciones de centavo.
+    """
+    valores = np.abs(valores[np.isfinite(valores)])
+    valores = valores[valores > 0]
+    if len(valores) == 0:
+        return 2
+    return int(np.clip(4 - np.floor(np.log10(np.median(valores))), 2, 12))
+
+
+def _redondear(valores):
+    valores = np.asarray(valores, dtype="float64")
+    return np.round(valores, _decimales(valores))
+
+
+def _valores(valores, decimals):
+    """Convierte a float64 y redondea si corresponde ("auto": según la magnitud, None: sin redondear)."""
+    valores = np.asarray(valores, dtype="float64")
+    if decimals == "auto":
+        return _redondear(valores)
+    if decimals is not None:
+        valores = np.round(valores, decimals)
+    return valores
+
+
+def _tiempos(times, mask):
+    """Tiempos válidos de la máscara como enteros de Python."""
+    return times[mask].astype("int64").tolist()
+
+
+def line_data(times, valores, decimals=DECIMALES) -> list:
+    """
+    Construye una serie [{"time", "value"}] descartando los puntos con valor NaN o sin fecha.
+
+    Args:
+        times (np.ndarray): Epoch en segundos (ver to_epoch).
+        valores (array-like): Valores de la serie, alineados con times.
+        decimals (int | "auto" | None): Decimales a conservar ("auto" según la magnitud,
+            None para no redondear).
+    """
+    valores = _valores(valores, decimals)
+    mask = ~np.isnan(valores) & ~np.isnan(times)
+    return [
+        {"time": t, "value": v}
+        for t, v in zip(_tiempos(times, mask), valores[mask].tolist())
+    ]
+
+
+def histogram_data(times, valores, colors=None, decimals=DECIMALES) -> list:
+    """
+    Igual que line_data, pero permite asignar un color por barra.
+
+    Args:
+        colors (array-like | None): Color de cada punto, alineado con times.
+    """
+    if colors is None:
+        return line_data(times, valores, decimals)
+    valores = _valores(valores, decimals)
+    mask = ~np.isnan(valores) & ~np.isnan(times)
+    colors = np.asarray(colors, dtype=object)
+    return [
+        {"time": t, "value": v, "color": c}
+        for t, v, c in zip(_tiempos(times, mask), valores[mask].tolist(), colors[mask].tolist())
+    ]
+
+
+def constant_data(times, valor) -> list:
+    """Construye una línea horizontal con el mismo valor en todos los tiempos válidos."""
+    valor = float(valor)
+    return [{"time": t, "value": valor} for t in _tiempos(times, ~np.isnan(times))]
+
+
+def candle_data(data: pd.DataFrame, time_col="Fecha", decimals=DECIMALES) -> list:
+    """
+    Construye la serie de velas [{"time", "open", "high", "low", "close"}] a partir
+    de las columnas Open/High/Low/Close, descartando velas incompletas.
+    """
+    times = to_epoch(data[time_col])
+    ohlc = _valores(data[["Open", "High", "Low", "Close"]].to_numpy(), decimals)
+    mask = ~np.isnan(ohlc).any(axis=1) & ~np.isnan(times)
+    return [
+        {"time": t, "open": o, "high": h, "low": l, "close": c}
+        for t, (o, h, l, c) in zip(_tiempos(times, mask), ohlc[mask].tolist())
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Reducción de puntos (downsampling) de los payloads ya armados
+# ---------------------------------------------------------------------------
+
+# Puntos máximos por serie: lightweight-charts no dibuja más de ~1-2 barras por píxel,
+# así que enviar más que el ancho visible del gráfico solo agranda el payload
+PUNTOS_MAXIMOS = 2000
+
+SERIES_OHLC = ("Candlestick", "Bar")
+SERIES_LINEA = ("Line", "Area", "Baseline")
+
+
+def lttb(times, valores, n_salida) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: elige n_salida puntos de la serie que conservan su forma
+    visual (picos y valles). Siempre incluye el primero y el último.
+
+    Returns:
+        np.ndarray: Índices (ordenados) de los puntos elegidos.
+    """
+    x = np.asarray(times, dtype="float64")
+    y = np.asarray(valores, dtype="float64")
+    n = len(y)
+    if n_salida >= n or n_salida < 3:
+        return np.arange(n)
+
+    cada = (n - 2) / (n_salida - 2)
+    elegidos = np.empty(n_salida, dtype="int64")
+    elegidos[0], elegidos[-1] = 0, n - 1
+    a = 0
+    for i in range(n_salida - 2):
+        desde = int(i * cada) + 1
+        hasta = int((i + 1) * cada) + 1
+        # Promedio del siguiente bucket (o el último punto si es el final)
+        sig_desde, sig_hasta = hasta, min(int((i + 2) * cada) + 1, n)
+        if sig_desde >= sig_hasta:
+            prom_x, prom_y = x[-1], y[-1]
+        else:
+            prom_x, prom_y = x[sig_desde:sig_hasta].mean(), y[sig_desde:sig_hasta].mean()
+        area = np.abs((x[a] - prom_x) * (y[desde:hasta] - y[a]) - (x[a] - x[desde:hasta]) * (prom_y - y[a]))
+        a = desde + int(np.argmax(area))
+        elegidos[i + 1] = a
+    return elegidos
+
+
+def _grupos(times, bordes):
+    """Retorna (bucket de cada punto, inicio de cada grupo, fin de cada grupo) para times ordenados."""
+    bucket = np.maximum(np.searchsorted(bordes, times, side="right") - 1, 0)
+    cortes = np.flatnonzero(np.diff(bucket)) + 1
+    inicios = np.concatenate(([0], cortes))
+    finales = np.concatenate((cortes - 1, [len(times) - 1]))
+    return bucket, inicios, finales
+
+
+def _ohlc_por_bucket(datos, bordes):
+    """Agrega velas por bucket: open del primero, high máximo, low mínimo y close del último."""
+    times = np.array([d["time"] for d in datos], dtype="int64")
+    ohlc = _redondear([[d["open"], d["high"], d["low"], d["close"]] for d in datos])
+    bucket, inicios, finales = _grupos(times, bordes)
+    abiertos = ohlc[inicios, 0]
+    altos = np.maximum.reduceat(ohlc[:, 1], inicios)
+    bajos = np.minimum.reduceat(ohlc[:, 2], inicios)
+    cierres = ohlc[finales, 3]
+    return [
+        {**datos[f], "time": int(t), "open": o, "high": h, "low": l, "close": c}
+        for t, f, o, h, l, c in zip(bordes[bucket[inicios]].tolist(), finales.tolist(), abiertos.tolist(),
+                                    altos.tolist(), bajos.tolist(), cierres.tolist())
+    ]
+
+
+def _histograma_por_bucket(datos, bordes):
+    """
+    Agrega un histograma por bucket. Si todos los valores son >= 0 (volumen) se suman; si no
+    (osciladores como el histograma del MACD) se conserva la barra de mayor valor absoluto.
+    """
+    times = np.array([d["time"] for d in datos], dtype="int64")
+    valores = np.array([d["value"] for d in datos], dtype="float64")
+    bucket, inicios, finales = _grupos(times, bordes)
+    if (valores >= 0).all():
+        agregados = np.add.reduceat(valores, inicios)
+        origen = finales
+    else:
+        # Dentro de cada bucket, la barra de mayor |valor| queda primera
+        orden = np.lexsort((-np.abs(valores), bucket))
+        origen = orden[inicios]
+        agregados = valores[origen]
+    agregados = _redondear(agregados)
+    return [
+        {**datos[o], "time": int(t), "value": v}
+        for t, o, v in zip(bordes[bucket[inicios]].tolist(), origen.tolist(), agregados.tolist())
+    ]
+
+
+def _linea_lttb(datos, max_points):
+    """Reduce una serie de línea con LTTB, conservando los puntos originales (y sus colores)."""
+    if len(datos) > max_points:
+        times = [d["time"] for d in datos]
+        datos = [datos[i] for i in lttb(times, [d["value"] for d in datos], max_points).tolist()]
+    valores = _redondear([d["value"] for d in datos])
+    return [{**d, "value": v} for d, v in zip(datos, valores.tolist())]
+
+
+def _ajustar_markers(markers, datos):
+    """Mueve cada marker al último punto conservado de la serie que no sea posterior a su tiempo."""
+    if not markers or not datos:
+        return markers
+    times = np.array([d["time"] for d in datos], dtype="int64")
+    posiciones = np.maximum(np.searchsorted(times, [m["time"] for m in markers], side="right") - 1, 0)
+    return [{**m, "time": int(times[p])} for m, p in zip(markers, posiciones.tolist())]
+
+
+def compactar_charts(charts_config: list, max_points=PUNTOS_MAXIMOS) -> dict:
+    """
+    Reduce en el lugar los payloads de todos los gráficos para que ninguna serie supere
+    max_points puntos (normalmente, el ancho visible del gráfico en píxeles), y redondea los
+    valores a los decimales que su magnitud necesita.
+
+    Las velas y los histogramas se agregan en buckets de tiempo comunes a todos los paneles
+    (calculados sobre la serie más densa, para que sigan alineados); las líneas se reducen con
+    LTTB. Los markers se mueven al punto conservado correspondiente.
+
+    Returns:
+        dict: {"antes": puntos totales, "despues": puntos totales tras la reducción}.
+    """
+    series = [s for chart in charts_config for s in chart.get("series", []) if s.get("data")]
+    antes = sum(len(s["data"]) for s in series)
+    if not series:
+        return {"antes": 0, "despues": 0}
+
+    # Bordes de los buckets: cada k tiempos de la serie OHLC (o de cualquier serie) más densa
+    referencia = max(
+        series,
+        key=lambda s: (s.get("type") in SERIES_OHLC, len(s["data"])),
+    )
+    times_ref = np.unique([d["time"] for d in referencia["data"]])
+    k = int(np.ceil(len(times_ref) / max_points))
+    bordes = times_ref[::k] if k > 1 else None
+
+    for serie in series:
+        tipo = serie.get("type")
+        datos = serie["data"]
+        try:
+            if tipo in SERIES_OHLC and all("open" in d for d in datos):
+                serie["data"] = _ohlc_por_bucket(datos, bordes) if bordes is not None else [
+                    {**d, "open": o, "high": h, "low": l, "close": c}
+                    for d, (o, h, l, c) in zip(datos, _redondear(
+                        [[d["open"], d["high"], d["low"], d["close"]] for d in datos]).tolist())
+                ]
+            elif tipo == "Histogram" and all("value" in d for d in datos):
+                if bordes is not None:
+                    serie["data"] = _histograma_por_bucket(datos, bordes)
+                else:
+                    valores = _redondear([d["value"] for d in datos])
+                    serie["data"] = [{**d, "value": v} for d, v in zip(datos, valores.tolist())]
+            elif tipo in SERIES_LINEA and all("value" in d for d in datos):
+                serie["data"] = _linea_lttb(datos, max_points)
+            else:
+                continue
+            if serie.get("markers") and len(serie["data"]) < len(datos):
+                serie["markers"] = _ajustar_markers(serie["markers"], serie["data"])
+        except (KeyError, TypeError, ValueError) as e:
+            # Series con formato no estándar se envían tal cual
+            print(f"No se pudo compactar la serie {tipo}: {e}")
+            serie["data"] = datos
+
+    return {"antes": antes, "despues": sum(len(s["data"]) for s in series)}
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+"""
+Analítica vectorizada de cadenas de opciones (Open Interest y Max Pain).
+
+La cadena se convierte una sola vez en arrays tipados (strike, call OI, put OI) y el
+Max Pain se calcula ordenando los strikes y usando sumas acumuladas, en O(n log n) en
+lugar de comparar cada strike contra todos los demás.
+"""
+
+
+def _numeros(valores) -> pd.Series:
+    """Convierte una columna de strings de Nasdaq ("--", "12.5", ...) a float (NaN si no es número)."""
+    texto = pd.Series(valores, dtype="object").fillna("0").astype(str).str.replace("--", "0", regex=False)
+    return pd.to_numeric(texto, errors="coerce")
+
+
+def parse_option_chain(rows: list) -> pd.DataFrame:
+    """
+    Convierte las filas de la API de option-chain de Nasdaq en columnas numéricas.
+
+    Args:
+        rows (list): Filas de data.table.rows; se ignoran las que no tienen strike válido.
+
+    Returns:
+        pd.DataFrame: Columnas strike, call_oi y put_oi (float64), en el orden original.
+    """
+    tabla = pd.DataFrame.from_records(
+        [r for r in rows if r.get("strike")],
+        columns=["strike", "c_Openinterest", "p_Openinterest"],
+    )
+    strike = _numeros(tabla["strike"])
+    validas = strike.notna().to_numpy()
+    return pd.DataFrame({
+        "strike": strike.to_numpy(dtype="float64")[validas],
+        "call_oi": _numeros(tabla["c_Openinterest"]).fillna(0.0).to_numpy(dtype="float64")[validas],
+        "put_oi": _numeros(tabla["p_Openinterest"]).fillna(0.0).to_numpy(dtype="float64")[validas],
+    })
+
+
+def pain_by_strike(strikes, call_oi, put_oi) -> np.ndarray:
+    """
+    Calcula, para cada strike candidato X, la pérdida teórica total de los compradores:
+        pérdida_call = sum( max(0, X - strike_i) * call_oi_i )
+        pérdida_put  = sum( max(0, strike_i - X) * put_oi_i )
+
+    Los strikes se ordenan una vez y ambas sumas salen de sumas acumuladas:
+    para los calls con strike < X, X * sum(oi) - sum(oi * strike), y análogo para los puts.
+
+    Returns:
+        np.ndarray: Pérdida total para cada strike, en el orden recibido.
+    """
+    strikes = np.asarray(strikes, dtype="float64")
+    call_oi = np.asarray(call_oi, dtype="float64")
+    put_oi = np.asarray(put_oi, dtype="float64")
+
+    # Agrupar strikes repetidos (distintas expiraciones) y ordenarlos
+    unicos, inverso = np.unique(strikes, return_inverse=True)
+    call = np.bincount(inverso, weights=call_oi, minlength=len(unicos))
+    put = np.bincount(inverso, weights=put_oi, minlength=len(unicos))
+
+    # Sumas acumuladas de los strikes estrictamente menores (calls) y mayores (puts)
+    call_oi_menor = np.concatenate(([0.0], np.cumsum(call)[:-1]))
+    call_valor_menor = np.concatenate(([0.0], np.cumsum(call * unicos)[:-1]))
+    put_oi_mayor = np.concatenate((np.cumsum(put[::-1])[::-1][1:], [0.0]))
+    put_valor_mayor = np.concatenate((np.cumsum((put * unicos)[::-1])[::-1][1:], [0.0]))
+
+    pain = (unicos * call_oi_menor - call_valor_menor) + (put_valor_mayor - unicos * put_oi_mayor)
+    return pain[inverso]
+
+
+def max_pain(strikes, call_oi, put_oi):
+    """
+    Retorna el strike de Max Pain (el de menor pérdida total) o None si no hay strikes.
+    Ante empates se queda con el primero en el orden recibido.
+    """
+    if len(strikes) == 0:
+        return None
+    pain = pain_by_strike(strikes, call_oi, put_oi)
+    return float(np.asarray(strikes, dtype="float64")[int(np.argmin(pain))])
+
+
+def top_strikes(strikes, open_interest, k=2) -> list:
+    """
+    Retorna los k strikes con mayor Open Interest (de mayor a menor). Ante empates se
+    respeta el orden recibido. Retorna [] si todo el Open Interest es cero.
+    """
+    open_interest = np.asarray(open_interest, dtype="float64")
+    if not open_interest.any():
+        return []
+    orden = np.argsort(-open_interest, kind="stable")[:k]
+    return np.asarray(strikes, dtype="float64")[orden].tolist()
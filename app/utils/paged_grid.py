@@ -0,0 +1,150 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+"""
+Grillas paginadas del lado del servidor para tablas grandes (screeners, dark pools).
+
+En lugar de enviar el DataFrame completo a AgGrid en cada rerun, la página, el orden y el
+filtro se eligen con controles de Streamlit y se resuelven en el servidor sobre una versión
+indexada del DataFrame (órdenes por columna y texto de búsqueda precalculados), de modo que
+al navegador solo viaja la ventana visible.
+"""
+
+# Tablas indexadas que se mantienen en memoria
+MAX_TABLAS = 16
+
+TAMANOS_PAGINA = [50, 100, 250, 500]
+
+_tablas = OrderedDict()
+_lock = threading.Lock()
+
+
+def _huella(df: pd.DataFrame):
+    """Identifica el contenido del DataFrame para reutilizar su índice entre reruns."""
+    try:
+        contenido = int(pd.util.hash_pandas_object(df, index=False).sum())
+    except TypeError:
+        # Celdas no hasheables (listas, dicts): se usa la identidad del objeto
+        contenido = id(df)
+    return (len(df), tuple(df.columns), contenido)
+
+
+def _tabla_indexada(df: pd.DataFrame, clave: str) -> dict:
+    """Retorna (creándola si hace falta) la versión indexada de 'df' guardada bajo 'clave'."""
+    huella = _huella(df)
+    with _lock:
+        tabla = _tablas.get(clave)
+        if tabla is not None and tabla["huella"] == huella:
+            _tablas.move_to_end(clave)
+            return tabla
+    df = df.reset_index(drop=True)
+    texto = df.select_dtypes(include=["object", "string", "category"]).astype("string").fillna("")
+    tabla = {
+        "huella": huella,
+        "df": df,
+        # Texto de cada fila en minúsculas, para filtrar con una sola búsqueda vectorizada
+        "texto": (
+            texto.iloc[:, 0].str.cat([texto[c] for c in texto.columns[1:]], sep=" ").str.lower()
+            if len(texto.columns) else pd.Series("", index=df.index, dtype="string")
+        ),
+        "ordenes": {},
+    }
+    with _lock:
+        _tablas[clave] = tabla
+        _tablas.move_to_end(clave)
+        while len(_tablas) > MAX_TABLAS:
+            _tablas.popitem(last=False)
+    return tabla
+
+
+def _orden(tabla, columna, ascendente):
+    """Posiciones de las filas ordenadas por 'columna' (nulos al final), memorizadas por tabla."""
+    clave = (columna, ascendente)
+    if clave not in tabla["ordenes"]:
+        tabla["ordenes"][clave] = tabla["df"][columna].sort_values(ascending=ascendente, na_position="last", kind="stable").index.to_numpy()
+    return tabla["ordenes"][clave]
+
+
+def ventana(df: pd.DataFrame, clave: str, pagina=1, por_pagina=100, orden=None, ascendente=True, filtro=""):
+    """
+    Retorna solo las filas visibles de una página.
+
+    Args:
+        df (pd.DataFrame): Tabla completa.
+        clave (str): Identificador de la tabla (una grilla por clave).
+        pagina (int): Página a mostrar (desde 1).
+        por_pagina (int): Filas por página.
+        orden (str, opcional): Columna por la que ordenar.
+        ascendente (bool): Sentido del orden.
+        filtro (str): Texto a buscar en las columnas de texto (sin distinguir mayúsculas).
+
+    Returns:
+        tuple[pd.DataFrame, int]: (filas de la página, total de filas que cumplen el filtro).
+    """
+    return _ventana(_tabla_indexada(df, clave), pagina, por_pagina, orden, ascendente, filtro)
+
+
+def _ventana(tabla, pagina, por_pagina, orden, ascendente, filtro):
+    posiciones = _orden(tabla, orden, ascendente) if orden in tabla["df"].columns else np.arange(len(tabla["df"]))
+    if filtro:
+        coincide = tabla["texto"].str.contains(filtro.lower(), regex=False).to_numpy()
+        posiciones = posiciones[coincide[posiciones]]
+    total = len(posiciones)
+    inicio = (max(int(pagina), 1) - 1) * por_pagina
+    return tabla["df"].iloc[posiciones[inicio:inicio + por_pagina]], total
+
+
+def render_grid(df: pd.DataFrame, key: str, configurar=None, por_pagina=100, **aggrid_kwargs):
+    """
+    Muestra 'df' en AgGrid enviando solo la página visible. Los controles de búsqueda, orden y
+    página se resuelven en el servidor con 'ventana'.
+
+    Args:
+        df (pd.DataFrame): Tabla completa.
+        key (str): Clave única de la grilla (prefijo de los widgets).
+        configurar (callable, opcional): Recibe el GridOptionsBuilder de la página para
+            agregar estilos, selección, etc.
+        por_pagina (int): Filas por página por defecto.
+        **aggrid_kwargs: Argumentos adicionales para AgGrid.
+
+    Returns:
+        La respuesta de AgGrid (por ejemplo, para leer las filas seleccionadas).
+    """
+    import streamlit as st
+    from st_aggrid import AgGrid, GridOptionsBuilder
+
+    col_filtro, col_orden, col_sentido, col_tamano = st.columns([3, 2, 1, 1])
+    filtro = col_filtro.text_input("Buscar", key=f"{key}_filtro", placeholder="Texto en cualquier columna")
+    orden = col_orden.selectbox("Ordenar por", options=[None] + list(df.columns), key=f"{key}_orden",
+                                format_func=lambda c: "Sin ordenar" if c is None else c)
+    ascendente = col_sentido.radio("Sentido", options=["Desc", "Asc"], key=f"{key}_sentido") == "Asc"
+    tamano = col_tamano.selectbox("Filas", options=TAMANOS_PAGINA, key=f"{key}_tamano",
+                                  index=TAMANOS_PAGINA.index(por_pagina) if por_pagina in TAMANOS_PAGINA else 1)
+
+    # Primero se cuenta el total filtrado para acotar el número de página
+    tabla = _tabla_indexada(df, key)
+    _, total = _ventana(tabla, 1, tamano, orden, ascendente, filtro)
+    paginas = max(1, -(-total // tamano))
+    if st.session_state.get(f"{key}_pagina", 1) > paginas:
+        st.session_state[f"{key}_pagina"] = 1
+    pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, step=1, key=f"{key}_pagina")
+    visibles, total = _ventana(tabla, pagina, tamano, orden, ascendente, filtro)
+    desde = (pagina - 1) * tamano
+    st.caption(f"Filas {desde + 1 if total else 0}–{desde + len(visibles)} de {total:,}")
+
+    gb = GridOptionsBuilder.from_dataframe(visibles)
+    gb.configure_default_column(filter=False, sortable=False, resizable=True)
+    if configurar is not None:
+        configurar(gb)
+    opciones = gb.build()
+    # El orden y el filtro de AgGrid solo verían la página visible: se desactivan después de
+    # 'configurar' (configure_default_column los reactiva por defecto y los tipos de columna
+    # de from_dataframe agregan filtros), junto con la barra lateral de filtros
+    opciones.setdefault("defaultColDef", {}).update(filter=False, sortable=False)
+    for columna in opciones.get("columnDefs", []):
+        columna.update(filter=False, sortable=False)
+    opciones.pop("sideBar", None)
+    aggrid_kwargs.setdefault("height", min(750, 60 + 30 * max(len(visibles), 1)))
+    return AgGrid(visibles, gridOptions=opciones, width="100%", **aggrid_kwargs)
@@ -1,52 +1,158 @@
 import os
+import ast
+import threading
 import importlib.util
 import streamlit as st
 
+"""
+Registro de plugins del proceso.
+
+Los plugins se descubren una sola vez por carpeta y sus metadatos (nombre, descripcion,
+tipo) se leen del código fuente sin ejecutarlo, de modo que listar plugins no importa
+dependencias pesadas (prophet, sklearn, pyecharts...). El módulo de cada plugin se
+importa recién la primera vez que se usa su render o algún atributo del módulo, y se
+vuelve a leer cuando cambia la fecha de modificación del archivo.
+"""
+
+ATRIBUTOS_REQUERIDOS = ("nombre", "descripcion", "tipo", "render")
+
+# tipo -> {ruta del plugin: entrada del registro}
+_registro = {}
+_lock = threading.RLock()
+
+
+class _ModuloPerezoso:
+    """
+    Representa el módulo de un plugin y lo importa en el primer acceso a un atributo.
+    Se comporta como el módulo para getattr/hasattr (plugin["module"].config, etc.).
+    """
+
+    def __init__(self, nombre, ruta):
+        self._nombre = nombre
+        self._ruta = ruta
+        self._modulo = None
+
+    def _cargar(self):
+        if self._modulo is None:
+            with _lock:
+                if self._modulo is None:
+                    spec = importlib.util.spec_from_file_location(self._nombre, self._ruta)
+                    modulo = importlib.util.module_from_spec(spec)
+                    spec.loader.exec_module(modulo)
+                    self._modulo = modulo
+        return self._modulo
+
+    @property
+    def cargado(self) -> bool:
+        return self._modulo is not None
+
+    def __getattr__(self, atributo):
+        return getattr(self._cargar(), atributo)
+
+    def __repr__(self):
+        estado = "cargado" if self._modulo is not None else "sin cargar"
+        return f"<plugin {self._nombre} ({estado})>"
+
+
+def _leer_metadatos(ruta):
+    """
+    Lee del código fuente los valores literales de nombre/descripcion/tipo y si define render,
+    sin ejecutar el módulo. Retorna None (hay que importarlo) si algún metadato no es un literal
+    o si alguno de los atributos requeridos no aparece como asignación o def de primer nivel
+    (por ejemplo 'from .impl import render' o 'render = _render').
+    """
+    with open(ruta, "r", encoding="utf-8") as file:
+        arbol = ast.parse(file.read(), filename=ruta)
+
+    metadatos = {}
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Assign):
+            for destino in nodo.targets:
+                if isinstance(destino, ast.Name) and destino.id in ("nombre", "descripcion", "tipo"):
+                    try:
+                        metadatos[destino.id] = ast.literal_eval(nodo.value)
+                    except (ValueError, TypeError, SyntaxError):
+                        return None
+        elif isinstance(nodo, (ast.FunctionDef, ast.AsyncFunctionDef)) and nodo.name == "render":
+            metadatos["render"] = True
+    if not all(attr in metadatos for attr in ATRIBUTOS_REQUERIDOS):
+        return None
+    return metadatos
+
+
+def _crear_entrada(plugin_name, plugin_file):
+    """Construye la entrada del registro de un plugin (None si no tiene los atributos requeridos)."""
+    modulo = _ModuloPerezoso(plugin_name, plugin_file)
+    try:
+        metadatos = _leer_metadatos(plugin_file)
+    except (SyntaxError, OSError):
+        metadatos = None
+
+    if metadatos is None:
+        # Metadatos dinámicos: no queda otra que importar el módulo para leerlos
+        metadatos = {attr: getattr(modulo, attr) for attr in ATRIBUTOS_REQUERIDOS if hasattr(modulo, attr)}
+
+    if not all(attr in metadatos for attr in ATRIBUTOS_REQUERIDOS):
+        return None
+
+    def render(*args, **kwargs):
+        return modulo.render(*args, **kwargs)
+
+    return {
+        "nombre": metadatos["nombre"],
+        "descripcion": metadatos["descripcion"],
+        "tipo": metadatos["tipo"],
+        "render": render,
+        "module": modulo,  # Módulo completo (se importa en el primer uso)
+    }
+
+
 def obtener_plugins(tipo):
     """
-    Carga todos los plugins desde una subcarpeta bajo 'plugins' correspondiente al tipo dado.
-    
+    Retorna los plugins de una subcarpeta bajo 'plugins' correspondiente al tipo dado.
+    Usa el registro del proceso: solo vuelve a leer los plugins nuevos o modificados.
+
     Args:
         tipo (str): El nombre de la subcarpeta en 'plugins' donde están los plugins (ejemplo: "stocks").
-    
+
     Returns:
         list[dict]: Una lista de diccionarios con la información de cada plugin (nombre, descripcion, tipo, render).
     """
     plugins_dir = os.path.join("plugins", tipo)
-    plugins = []
 
     if not os.path.exists(plugins_dir):
         raise FileNotFoundError(f"No se encontró el directorio '{plugins_dir}'.")
 
-    for archivo in os.listdir(plugins_dir):
-        # Ignorar directorios __pycache__
-        if archivo == "__pycache__":
-            continue
+    with _lock:
+        anterior = _registro.get(tipo, {})
+        actual = {}
+        plugins = []
+
+        for archivo in os.listdir(plugins_dir):
+            # Ignorar directorios __pycache__
+            if archivo == "__pycache__":
+                continue
 
-        ruta_plugin = os.path.join(plugins_dir, archivo)
-        # Solo procesar si es un directorio y contiene un archivo Python con el mismo nombre
-        if os.path.isdir(ruta_plugin):
+            ruta_plugin = os.path.join(plugins_dir, archivo)
+            # Solo procesar si es un directorio y contiene un archivo Python con el mismo nombre
+            if not os.path.isdir(ruta_plugin):
+                continue
             plugin_file = os.path.join(ruta_plugin, f"{archivo}.py")
             if not os.path.exists(plugin_file):
                 continue  # Omitir si el archivo Python no existe
 
-            plugin_name = os.path.splitext(archivo)[0]
-            
-            # Cargar el módulo dinámicamente
-            spec = importlib.util.spec_from_file_location(plugin_name, plugin_file)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            
-            # Verificar que el plugin tenga los atributos requeridos
-            if hasattr(module, "nombre") and hasattr(module, "descripcion") and hasattr(module, "tipo") and hasattr(module, "render"):
-                plugins.append({
-                    "nombre": module.nombre,
-                    "descripcion": module.descripcion,
-                    "tipo": module.tipo,
-                    "render": module.render,
-                    "module": module,  # Incluye el módulo completo
-                })
-            else:
-                st.toast(f"El plugin '{plugin_name}' no tiene los atributos necesarios y será omitido.")
-    
+            mtime = os.path.getmtime(plugin_file)
+            entrada = anterior.get(plugin_file)
+            if entrada is None or entrada["mtime"] != mtime:
+                plugin_name = os.path.splitext(archivo)[0]
+                entrada = {"mtime": mtime, "plugin": _crear_entrada(plugin_name, plugin_file)}
+                if entrada["plugin"] is None:
+                    st.toast(f"El plugin '{plugin_name}' no tiene los atributos necesarios y será omitido.")
+            actual[plugin_file] = entrada
+
+            if entrada["plugin"] is not None:
+                plugins.append(entrada["plugin"])
+
+        _registro[tipo] = actual
+
     return plugins
@@ -0,0 +1,66 @@
+import time
+import compileall
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from utils.config_manager import ConfigManager
+from utils.plugins import obtener_plugins
+
+"""
+Pre-calentamiento de cachés mientras el launcher (win.py) muestra la pantalla de carga.
+
+Se ejecuta en un proceso aparte desde la carpeta app (`python -m utils.prewarm`), en paralelo
+con el arranque del servidor de Streamlit:
+  - Compila a .pyc el código de todos los plugins sin importarlos (el registro de plugins
+    solo lee sus metadatos con ast, y los importa recién en el primer uso desde el servidor).
+  - Ejecuta el 'prefetch' de cada widget del dashboard, llenando las cachés en disco
+    (velas OHLCV y respuestas HTTP) que luego lee el servidor en el primer render.
+"""
+
+# Segundos máximos que se espera por los prefetch de los widgets
+TIMEOUT_PREWARM = 60
+
+
+def prewarm(config_path="config.yaml", timeout=TIMEOUT_PREWARM) -> dict:
+    """
+    Compila los plugins y ejecuta en paralelo los prefetch de los widgets del dashboard.
+
+    Returns:
+        dict: widget_name -> segundos que tardó su prefetch (o el mensaje de error).
+    """
+    compileall.compile_dir("plugins", quiet=1)
+
+    config = ConfigManager(config_path)
+    widgets = config.get("dashboard.widget", {}) or {}
+    plugins = {p["tipo"]: p for p in obtener_plugins("dashboard")}
+
+    def ejecutar(widget_conf, prefetch):
+        inicio = time.monotonic()
+        prefetch(dict(widget_conf))
+        return time.monotonic() - inicio
+
+    executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="prewarm")
+    futures = {}
+    for widget_name, widget_conf in widgets.items():
+        plugin = plugins.get(widget_conf.get("type"))
+        prefetch = getattr(plugin["module"], "prefetch", None) if plugin else None
+        if prefetch is not None:
+            futures[widget_name] = executor.submit(ejecutar, widget_conf, prefetch)
+    wait(futures.values(), timeout=timeout)
+
+    resultados = {}
+    for widget_name, future in futures.items():
+        if not future.done():
+            resultados[widget_name] = "tiempo de espera agotado"
+        elif future.exception() is not None:
+            resultados[widget_name] = str(future.exception())
+        else:
+            resultados[widget_name] = round(future.result(), 2)
+    executor.shutdown(wait=False, cancel_futures=True)
+    return resultados
+
+
+if __name__ == "__main__":
+    inicio = time.monotonic()
+    for widget_name, resultado in prewarm().items():
+        print(f"[prewarm] {widget_name}: {resultado}")
+    print(f"[prewarm] Listo en {time.monotonic() - inicio:.1f}s")
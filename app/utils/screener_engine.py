@@ -0,0 +1,328 @@
+import re
+import numpy as np
+import pandas as pd
+
+"""
+Motor de screening local sobre el universo de acciones en caché.
+
+Interpreta la misma sintaxis de consultas que el widget de yfinance.screen, por ejemplo
+"and(region=us, intradaymarketcap>2000000000)" o "and(gt(percentchange, 3), is-in(sector, Technology, Energy))",
+y la compila a máscaras booleanas vectorizadas sobre el último snapshot del universo de
+NASDAQ (models.datasource.nasdaq_universe). Además de los campos de Yahoo se pueden usar las
+columnas del snapshot y las de utils.watchlist_analytics (RSI, Perf.W, Dist.SMA200...), que
+se calculan desde las velas diarias solo para los símbolos que pasan el resto de los filtros.
+"""
+
+# Campos de yfinance.screen -> columnas del universo local
+ALIAS = {
+    "ticker": "symbol",
+    "symbol": "symbol",
+    "shortname": "name",
+    "intradaymarketcap": "marketCap",
+    "lastclosemarketcap.lasttwelvemonths": "marketCap",
+    "intradayprice": "lastsale",
+    "eodprice": "lastsale",
+    "percentchange": "pctchange",
+    "intradaypricechange": "netchange",
+    "dayvolume": "volume",
+    "eodvolume": "volume",
+    "sector": "sector",
+    "industry": "industry",
+    "region": "region",
+    "country": "country",
+    "ipoyear": "ipoyear",
+}
+
+# Nombres de las columnas en el resultado (compatibles con lo que retorna yfinance.screen)
+COLUMNAS_RESULTADO = {
+    "symbol": "symbol",
+    "name": "shortName",
+    "lastsale": "regularMarketPrice",
+    "netchange": "regularMarketChange",
+    "pctchange": "regularMarketChangePercent",
+    "marketCap": "marketCap",
+    "volume": "regularMarketVolume",
+    "sector": "sector",
+    "industry": "industry",
+}
+
+# Máximo de símbolos para los que se calculan columnas desde velas en una consulta
+MAX_SIMBOLOS_ANALITICA = 500
+
+OPERADORES_LOGICOS = {"and", "or", "not"}
+OPERADORES_COMPARACION = {"eq", "gt", "gte", "lt", "lte", "btwn", "is-in"}
+INFIJOS = {"=": "eq", "!=": "ne", ">": "gt", ">=": "gte", "<": "lt", "<=": "lte"}
+
+_TOKEN = re.compile(r"""\s*(?:(?P<texto>"[^"]*"|'[^']*')|(?P<op>>=|<=|!=|[=<>(),])|(?P<palabra>[^\s(),=<>!"']+))""")
+
+
+class ErrorConsulta(ValueError):
+    """La consulta no respeta la sintaxis o usa un campo desconocido."""
+
+
+def _tokens(consulta):
+    tokens, posicion = [], 0
+    consulta = consulta.strip()
+    while posicion < len(consulta):
+        match = _TOKEN.match(consulta, posicion)
+        if not match or match.end() == posicion:
+            raise ErrorConsulta(f"Carácter inesperado en la posición {posicion}: {consulta[posicion:posicion + 10]!r}")
+        if match.group("texto") is not None:
+            tokens.append(("valor", match.group("texto")[1:-1]))
+        elif match.group("op") is not None:
+            tokens.append(("op", match.group("op")))
+        else:
+            tokens.append(("palabra", match.group("palabra")))
+        posicion = match.end()
+    return tokens
+
+
+class _Parser:
+    """Parser descendente recursivo que arma el árbol de la consulta."""
+
+    def __init__(self, consulta):
+        self.tokens = _tokens(consulta)
+        self.i = 0
+
+    def _ver(self, desplazamiento=0):
+        indice = self.i + desplazamiento
+        return self.tokens[indice] if indice < len(self.tokens) else (None, None)
+
+    def _esperar(self, op):
+        tipo, valor = self._ver()
+        if tipo != "op" or valor != op:
+            raise ErrorConsulta(f"Se esperaba '{op}' y se encontró {valor!r}.")
+        self.i += 1
+
+    def _atomo(self):
+        """Un valor o nombre de campo; varias palabras seguidas forman un solo valor ("Consumer Cyclical")."""
+        partes = []
+        while self._ver()[0] in ("palabra", "valor"):
+            partes.append(self._ver()[1])
+            self.i += 1
+        if not partes:
+            raise ErrorConsulta(f"Se esperaba un campo o valor y se encontró {self._ver()[1]!r}.")
+        return " ".join(partes)
+
+    def expresion(self):
+        tipo, valor = self._ver()
+        siguiente = self._ver(1)
+        if tipo == "palabra" and siguiente == ("op", "(") and valor.lower() in OPERADORES_LOGICOS | OPERADORES_COMPARACION:
+            operador = valor.lower()
+            self.i += 2
+            if operador in OPERADORES_LOGICOS:
+                hijos = [self.expresion()]
+                while self._ver() == ("op", ","):
+                    self.i += 1
+                    hijos.append(self.expresion())
+                self._esperar(")")
+                if operador == "not":
+                    if len(hijos) != 1:
+                        raise ErrorConsulta("not() recibe una sola condición.")
+                    return ("not", hijos[0])
+                return (operador, hijos)
+            argumentos = [self._atomo()]
+            while self._ver() == ("op", ","):
+                self.i += 1
+                argumentos.append(self._atomo())
+            self._esperar(")")
+            minimo = {"btwn": 3, "is-in": 2}.get(operador, 2)
+            if len(argumentos) < minimo or (operador not in ("is-in",) and len(argumentos) != minimo):
+                raise ErrorConsulta(f"{operador}() recibe {minimo} argumentos.")
+            return ("cmp", operador, argumentos[0], argumentos[1:])
+
+        # Comparación infija: campo OP valor
+        campo = self._atomo()
+        tipo, valor = self._ver()
+        if tipo != "op" or valor not in INFIJOS:
+            raise ErrorConsulta(f"Se esperaba un operador de comparación después de '{campo}'.")
+        self.i += 1
+        return ("cmp", INFIJOS[valor], campo, [self._atomo()])
+
+    def parsear(self):
+        arbol = self.expresion()
+        if self.i != len(self.tokens):
+            raise ErrorConsulta(f"Texto sobrante en la consulta: {self._ver()[1]!r}.")
+        return arbol
+
+
+def parsear(consulta: str):
+    """
+    Convierte la consulta en un árbol: ("and"|"or", [hijos]), ("not", hijo) o
+    ("cmp", operador, campo, [valores]).
+
+    Raises:
+        ErrorConsulta: Si la consulta no es válida.
+    """
+    if not consulta or not consulta.strip():
+        raise ErrorConsulta("La consulta está vacía.")
+    return _Parser(consulta).parsear()
+
+
+def _columnas_analitica() -> dict:
+    """Columnas calculables desde velas (nombre en minúsculas -> nombre real)."""
+    from utils.watchlist_analytics import COLUMNAS_LOCALES
+    return {c.lower(): c for c in COLUMNAS_LOCALES if c not in ("close", "open", "high", "low", "volume")}
+
+
+def resolver_campo(campo: str, columnas) -> str:
+    """
+    Retorna la columna de la tabla que corresponde a un campo de la consulta (alias de Yahoo,
+    columna del universo o columna de watchlist_analytics), sin distinguir mayúsculas.
+
+    Raises:
+        ErrorConsulta: Si el campo no existe.
+    """
+    nombre = campo.strip().lower()
+    if nombre in ALIAS:
+        return ALIAS[nombre]
+    por_minusculas = {c.lower(): c for c in columnas}
+    if nombre in por_minusculas:
+        return por_minusculas[nombre]
+    analitica = _columnas_analitica()
+    if nombre in analitica:
+        return analitica[nombre]
+    raise ErrorConsulta(f"Campo desconocido: '{campo}'.")
+
+
+def campos(arbol, columnas) -> set:
+    """Columnas que usa la consulta."""
+    if arbol[0] in ("and", "or"):
+        return set().union(*(campos(hijo, columnas) for hijo in arbol[1]))
+    if arbol[0] == "not":
+        return campos(arbol[1], columnas)
+    return {resolver_campo(arbol[2], columnas)}
+
+
+def _mascara_comparacion(serie: pd.Series, operador, valores) -> np.ndarray:
+    """Compara una columna completa contra los valores de la consulta."""
+    numerica = pd.api.types.is_numeric_dtype(serie.dtype)
+    if numerica:
+        try:
+            valores = [float(v) for v in valores]
+        except ValueError:
+            raise ErrorConsulta(f"Se esperaba un número en {valores}.")
+        datos = serie.astype("float64")
+    else:
+        # Los textos se comparan sin distinguir mayúsculas
+        valores = [str(v).lower() for v in valores]
+        datos = serie.astype("string").str.lower()
+
+    if operador == "eq":
+        resultado = datos == valores[0]
+    elif operador == "ne":
+        resultado = datos != valores[0]
+    elif operador == "is-in":
+        resultado = datos.isin(valores)
+    elif not numerica:
+        raise ErrorConsulta(f"El operador '{operador}' solo se puede usar con campos numéricos ({serie.name}).")
+    elif operador == "gt":
+        resultado = datos > valores[0]
+    elif operador == "gte":
+        resultado = datos >= valores[0]
+    elif operador == "lt":
+        resultado = datos < valores[0]
+    elif operador == "lte":
+        resultado = datos <= valores[0]
+    else:  # btwn
+        resultado = datos.between(min(valores), max(valores))
+    return pd.Series(resultado).fillna(False).to_numpy(dtype=bool)
+
+
+def compilar(arbol, columnas):
+    """
+    Compila el árbol en una función tabla -> máscara booleana (numpy), resolviendo los campos
+    una sola vez para poder reutilizarla sobre distintas tablas con las mismas columnas.
+    """
+    if arbol[0] == "and":
+        hijos = [compilar(h, columnas) for h in arbol[1]]
+        return lambda df: np.logical_and.reduce([h(df) for h in hijos])
+    if arbol[0] == "or":
+        hijos = [compilar(h, columnas) for h in arbol[1]]
+        return lambda df: np.logical_or.reduce([h(df) for h in hijos])
+    if arbol[0] == "not":
+        hijo = compilar(arbol[1], columnas)
+        return lambda df: ~hijo(df)
+    _, operador, campo, valores = arbol
+    columna = resolver_campo(campo, columnas)
+    return lambda df: _mascara_comparacion(df[columna], operador, valores)
+
+
+def tabla_universo() -> pd.DataFrame:
+    """Universo local (último snapshot de NASDAQ) con la columna 'region' que usa Yahoo."""
+    from models.datasource import nasdaq_universe
+
+    df = nasdaq_universe.universo()
+    # El screener de NASDAQ solo lista acciones de bolsas de EE.UU.
+    return df.assign(region="us")
+
+
+def _agregar_analitica(df: pd.DataFrame, columnas) -> pd.DataFrame:
+    """Agrega a 'df' las columnas de watchlist_analytics calculadas desde las velas diarias."""
+    from utils.watchlist_analytics import analizar_watchlist
+
+    if len(df) > MAX_SIMBOLOS_ANALITICA:
+        raise ErrorConsulta(
+            f"Los campos {sorted(columnas)} se calculan desde las velas y la consulta deja {len(df)} símbolos "
+            f"(máximo {MAX_SIMBOLOS_ANALITICA}); agrega filtros de market cap, sector, etc."
+        )
+    if df.empty:
+        return df.assign(**{c: np.nan for c in columnas})
+    # Sin velas para ningún candidato, analizar_watchlist retorna solo "Símbolo": las columnas
+    # que falten quedan en NaN y esas filas simplemente no cumplen las condiciones
+    valores = analizar_watchlist(df["symbol"].tolist(), list(columnas)).reindex(columns=["Símbolo"] + list(columnas))
+    return pd.concat([df.reset_index(drop=True), valores.drop(columns="Símbolo").reset_index(drop=True)], axis=1)
+
+
+def _prefiltro(arbol, columnas_base):
+    """
+    Condiciones de nivel superior que solo usan columnas del universo: se aplican antes de
+    calcular las columnas desde velas, para hacerlo solo sobre los candidatos.
+    """
+    hijos = arbol[1] if arbol[0] == "and" else [arbol]
+    base = [h for h in hijos if campos(h, columnas_base) <= set(columnas_base)]
+    return ("and", base) if base else None
+
+
+def screen(query: str, sort_field=None, sort_asc=False, offset=0, size=25, universo: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Ejecuta una consulta sobre el universo local.
+
+    Args:
+        query (str): Consulta con la sintaxis de yfinance.screen.
+        sort_field (str, opcional): Campo por el que ordenar (cualquier campo válido en la consulta).
+        sort_asc (bool): Orden ascendente.
+        offset (int), size (int): Página de resultados.
+        universo (pd.DataFrame, opcional): Tabla sobre la que filtrar (por defecto tabla_universo()).
+
+    Returns:
+        pd.DataFrame: La página de resultados con columnas al estilo de yfinance.screen
+        (symbol, shortName, regularMarketChangePercent...) más los campos usados. El total de
+        coincidencias queda en df.attrs["total"].
+
+    Raises:
+        ErrorConsulta: Si la consulta no es válida.
+    """
+    df = tabla_universo() if universo is None else universo
+    arbol = parsear(query)
+    base = list(df.columns)
+    usados = campos(arbol, base)
+    orden = resolver_campo(sort_field, base) if sort_field else None
+    analitica = (usados | ({orden} if orden else set())) - set(base)
+
+    if analitica:
+        previo = _prefiltro(arbol, base)
+        if previo is not None:
+            df = df[compilar(previo, base)(df)]
+        df = _agregar_analitica(df, analitica)
+    resultado = df[compilar(arbol, list(df.columns))(df)]
+
+    if orden:
+        resultado = resultado.sort_values(orden, ascending=sort_asc, na_position="last", kind="stable")
+    total = len(resultado)
+    pagina = resultado.iloc[int(offset):int(offset) + int(size)]
+
+    visibles = list(COLUMNAS_RESULTADO) + sorted(c for c in usados | ({orden} if orden else set()) if c not in COLUMNAS_RESULTADO and c != "region")
+    pagina = pagina[[c for c in visibles if c in pagina.columns]].rename(columns=COLUMNAS_RESULTADO).reset_index(drop=True)
+    pagina.attrs["total"] = total
+    return pagina
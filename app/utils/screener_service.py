@@ -0,0 +1,163 @@
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Servicio de refresco en segundo plano de los screeners configurados.
+
+Un hilo de sondeo recorre todos los screeners de config.yaml cuyo plugin define
+'prefetch(config)' y, cuando vence el intervalo de cada uno, lo refresca en un pool de hilos.
+Los plugins los resuelve la página (con Streamlit) y se registran aquí solo sus funciones
+prefetch, de modo que los hilos del servicio nunca pasan por el descubrimiento de plugins.
+El último resultado de cada screener queda en memoria con su fecha, de modo que la página
+de screeners lo muestra al instante al cambiar de screener en lugar de consultar las fuentes
+en cada selección.
+"""
+
+# Segundos entre refrescos de cada tipo de screener (configurable por screener con "intervalo")
+INTERVALOS = {
+    "tv_watchlist": 5 * 60,
+    "nasdaq_screener": 15 * 60,
+}
+INTERVALO_DEFECTO = 10 * 60
+
+# Cada cuántos segundos el hilo de sondeo revisa qué screeners están vencidos
+SEGUNDOS_SONDEO = 5
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="screener-refresh")
+_lock = threading.Lock()
+_estado = {}
+_screeners = []
+_prefetchs = {}
+_sondeo = None
+
+
+def clave(screener_config) -> str:
+    """Clave de un screener: cambia si cambia su configuración (URL, columnas, límite...)."""
+    texto = json.dumps(screener_config, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+def intervalo(screener_config) -> float:
+    """Segundos entre refrescos de un screener."""
+    return float(screener_config.get("intervalo", INTERVALOS.get(screener_config.get("tipo"), INTERVALO_DEFECTO)))
+
+
+def _prefetch(screener_config):
+    """Retorna la función prefetch registrada para el tipo del screener, o None si no tiene."""
+    with _lock:
+        return _prefetchs.get(screener_config.get("tipo"))
+
+
+def _refrescar(clave_screener, screener_config, prefetch):
+    """Ejecuta el prefetch y guarda el resultado (o el error, conservando el último resultado bueno)."""
+    inicio = time.monotonic()
+    try:
+        data = prefetch(dict(screener_config))
+        error = None
+    except Exception as e:
+        data, error = None, str(e)
+    with _lock:
+        entrada = _estado.get(clave_screener)
+        if entrada is None:
+            # El screener se quitó de la configuración mientras se refrescaba
+            return
+        entrada["en_curso"] = False
+        entrada["intentado"] = time.time()
+        entrada["error"] = error
+        entrada["segundos"] = time.monotonic() - inicio
+        if error is None:
+            entrada["data"] = data
+            entrada["actualizado"] = entrada["intentado"]
+
+
+def solicitar(screener_config, forzar=False):
+    """
+    Encola el refresco de un screener si está vencido (o si 'forzar'), sin duplicar uno en curso.
+
+    Returns:
+        concurrent.futures.Future | None: El refresco encolado, o None si no hizo falta.
+    """
+    prefetch = _prefetch(screener_config)
+    if prefetch is None:
+        return None
+    clave_screener = clave(screener_config)
+    with _lock:
+        entrada = _estado.setdefault(clave_screener, {
+            "nombre": screener_config.get("nombre"), "data": None, "actualizado": None,
+            "intentado": None, "error": None, "en_curso": False, "future": None,
+        })
+        if entrada["en_curso"]:
+            return entrada["future"]
+        ultimo = entrada["intentado"]
+        if not forzar and ultimo is not None and time.time() - ultimo < intervalo(screener_config):
+            return None
+        entrada["en_curso"] = True
+        entrada["future"] = _executor.submit(_refrescar, clave_screener, screener_config, prefetch)
+        return entrada["future"]
+
+
+def _bucle_sondeo():
+    while True:
+        with _lock:
+            screeners = list(_screeners)
+        for screener_config in screeners:
+            try:
+                solicitar(screener_config)
+            except Exception as e:
+                print(f"No se pudo programar el refresco del screener {screener_config.get('nombre')}: {e}")
+        time.sleep(SEGUNDOS_SONDEO)
+
+
+def registrar(screeners, prefetchs):
+    """
+    Registra los screeners a mantener actualizados (se llama en cada render de la página, así
+    los cambios de config.yaml se toman sin reiniciar) y arranca el hilo de sondeo si hace falta.
+
+    Args:
+        screeners (list[dict]): Configuración de los screeners.
+        prefetchs (dict): tipo de screener -> función prefetch(config) de su plugin.
+    """
+    global _sondeo
+    with _lock:
+        _prefetchs.clear()
+        _prefetchs.update({tipo: f for tipo, f in prefetchs.items() if f is not None})
+        _screeners[:] = [dict(s) for s in screeners]
+        # Se descartan los resultados de configuraciones que ya no existen
+        vigentes = {clave(s) for s in _screeners}
+        for clave_screener in [c for c in _estado if c not in vigentes and not _estado[c]["en_curso"]]:
+            del _estado[clave_screener]
+        if _sondeo is None or not _sondeo.is_alive():
+            _sondeo = threading.Thread(target=_bucle_sondeo, name="screener-sondeo", daemon=True)
+            _sondeo.start()
+
+
+def obtener(screener_config, esperar=None):
+    """
+    Retorna el último resultado en memoria de un screener, encolando su refresco si está vencido.
+
+    Args:
+        screener_config (dict): Configuración del screener.
+        esperar (float, opcional): Segundos a esperar si todavía no hay ningún resultado.
+
+    Returns:
+        dict | None: {"data", "actualizado", "error", "en_curso"} o None si el plugin no
+        define 'prefetch' (la página debe renderizarlo de la forma tradicional).
+    """
+    future = solicitar(screener_config)
+    clave_screener = clave(screener_config)
+    with _lock:
+        entrada = _estado.get(clave_screener)
+        if entrada is None:
+            return None
+        future = future or entrada["future"]
+        sin_datos = entrada["actualizado"] is None
+    if sin_datos and future is not None and esperar:
+        try:
+            future.result(timeout=esperar)
+        except Exception:
+            pass
+    with _lock:
+        return {k: entrada[k] for k in ("data", "actualizado", "error", "en_curso")}
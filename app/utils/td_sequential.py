@@ -0,0 +1,195 @@
+import numpy as np
+
+"""
+Núcleo NumPy del TD Sequential (Setup, Countdown y Perfection) compartido por los
+motores de gráficos (alwcharts y echart).
+
+Todas las funciones trabajan sobre arrays float contiguos y retornan arrays de índices
+o de conteos; cada renderer se encarga de convertirlos en marcadores. Las condiciones
+se evalúan sobre columnas completas y las rachas se obtienen con sumas acumuladas, de
+modo que el costo no depende de recorrer las velas una a una en Python.
+"""
+
+# Largo del Setup y objetivo del Countdown
+SETUP_LARGO = 9
+COUNTDOWN_OBJETIVO = 13
+
+
+def _array(valores) -> np.ndarray:
+    """Convierte una columna a array float64 contiguo."""
+    return np.ascontiguousarray(valores, dtype="float64")
+
+
+def _desplazar(valores: np.ndarray, n: int) -> np.ndarray:
+    """Retorna valores[i - n] en cada posición i (NaN en las primeras n)."""
+    desplazado = np.full(len(valores), np.nan)
+    if n < len(valores):
+        desplazado[n:] = valores[:len(valores) - n]
+    return desplazado
+
+
+def run_lengths(cond) -> np.ndarray:
+    """
+    Largo de la racha de valores True consecutivos que termina en cada posición
+    (0 donde cond es False).
+    """
+    cond = np.asarray(cond, dtype=bool)
+    idx = np.arange(1, len(cond) + 1)
+    # Posición (1-based) del último False visto hasta cada índice
+    ultimo_false = np.maximum.accumulate(np.where(cond, 0, idx))
+    return np.where(cond, idx - ultimo_false, 0)
+
+
+def setup_conditions(close, lookback=4):
+    """
+    Condiciones de Setup de DeMark: compra cuando el cierre es menor que el de
+    'lookback' barras atrás y venta cuando es mayor.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (buy_cond, sell_cond) booleanos.
+    """
+    close = _array(close)
+    previo = _desplazar(close, lookback)
+    return close < previo, close > previo
+
+
+def setup_cyclic(close, lookback=4, largo=SETUP_LARGO):
+    """
+    Conteo de Setup que vuelve a 1 tras cada 9 (1..9, 1..9, ...) mientras se mantenga la condición.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (buy, sell) con el conteo en cada vela (0 = sin setup).
+    """
+    buy_cond, sell_cond = setup_conditions(close, lookback)
+    buy, sell = run_lengths(buy_cond), run_lengths(sell_cond)
+    return np.where(buy > 0, (buy - 1) % largo + 1, 0), np.where(sell > 0, (sell - 1) % largo + 1, 0)
+
+
+def setup_capped(close, lookback=4, largo=SETUP_LARGO):
+    """
+    Conteo de Setup que se queda en 9 ("extendido") mientras se mantenga la condición.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (buy, sell) con el conteo en cada vela (0 = sin setup).
+    """
+    buy_cond, sell_cond = setup_conditions(close, lookback)
+    return np.minimum(run_lengths(buy_cond), largo), np.minimum(run_lengths(sell_cond), largo)
+
+
+def setup_perfection(setup, extremo, tipo, largo=SETUP_LARGO) -> int:
+    """
+    Primera vela en la que un Setup de 9 (o extendido) queda perfeccionado: para compra,
+    el mínimo es <= al de 2 barras atrás; para venta, el máximo es >= al de 2 barras atrás.
+
+    Args:
+        setup (np.ndarray): Conteo de Setup (ver setup_capped).
+        extremo (array-like): Columna Low (compra) o High (venta).
+        tipo (str): "buy" o "sell".
+
+    Returns:
+        int: Índice de la vela perfeccionada o -1 si no la hay.
+    """
+    extremo = _array(extremo)
+    previo = _desplazar(extremo, 2)
+    cumple = extremo <= previo if tipo == "buy" else extremo >= previo
+    idx = np.flatnonzero((np.asarray(setup) >= largo) & cumple)
+    return int(idx[0]) if len(idx) else -1
+
+
+def flip_setups(close, lookback=4, largo=SETUP_LARGO) -> dict:
+    """
+    Setups que empiezan con un "price flip" (para compra: cierre < cierre[i-4] después de
+    una vela con cierre > cierre[i-5]) y terminan al romperse la condición o al llegar a 9.
+    Tras completar un 9 hace falta un nuevo flip para empezar otro Setup.
+
+    Returns:
+        dict: Para cada tipo ("buy", "sell") un dict con:
+            - "idx": índices de las velas con conteo.
+            - "count": conteo (1..9) de cada una de esas velas.
+            - "full": si la vela pertenece a un Setup que llegó a 9.
+            - "completed": índices donde el Setup llegó a 9.
+            - "active": índice de la última vela de un Setup sin completar que sigue
+              abierto en la última barra, o -1.
+    """
+    buy_cond, sell_cond = setup_conditions(close, lookback)
+    n = len(buy_cond)
+    resultado = {}
+    for tipo, cond, contraria in (("buy", buy_cond, sell_cond), ("sell", sell_cond, buy_cond)):
+        rachas = run_lengths(cond)
+        # Inicios de racha precedidos por la condición contraria (el flip)
+        inicios = np.flatnonzero(rachas == 1)
+        inicios = inicios[inicios >= lookback + 1]
+        inicios = inicios[contraria[inicios - 1]]
+
+        # Largo total de cada racha: se mide desde su inicio hasta la última vela True
+        fines = np.flatnonzero(cond & ~np.append(cond[1:], False))
+        largos = fines[np.searchsorted(fines, inicios)] - inicios + 1
+        contados = np.minimum(largos, largo)
+
+        # Expandir cada Setup a sus velas: inicio, inicio+1, ..., inicio+contados-1
+        repeticiones = np.repeat(inicios, contados)
+        offsets = np.arange(len(repeticiones)) - np.repeat(np.cumsum(contados) - contados, contados)
+        abiertos = (largos < largo) & (inicios + largos == n)
+        resultado[tipo] = {
+            "idx": repeticiones + offsets,
+            "count": offsets + 1,
+            "full": np.repeat(largos >= largo, contados),
+            "completed": inicios[largos >= largo] + largo - 1,
+            "active": int(n - 1) if abiertos.any() else -1,
+        }
+    return resultado
+
+
+def countdown_sequences(close, extremo, setups, contrarios, tipo, objetivo=COUNTDOWN_OBJETIVO):
+    """
+    Countdown desde cada Setup completado (incluida la vela del 9): para compra cuenta las
+    velas con cierre <= mínimo de 2 barras atrás; para venta, cierre >= máximo de 2 barras atrás.
+    La secuencia se cancela si antes de llegar a 13 aparece un Setup contrario completado.
+
+    Args:
+        close (array-like): Columna Close.
+        extremo (array-like): Columna Low (compra) o High (venta).
+        setups (array-like): Índices de los Setups completados.
+        contrarios (array-like): Índices de los Setups contrarios completados.
+        tipo (str): "buy" o "sell".
+
+    Returns:
+        list[tuple[np.ndarray, bool]]: Por cada Setup, (índices de las velas contadas, cancelada).
+    """
+    close = _array(close)
+    previo = _desplazar(_array(extremo), 2)
+    cumple = close <= previo if tipo == "buy" else close >= previo
+    contadas = np.flatnonzero(cumple)
+    contrarios = np.sort(np.asarray(contrarios, dtype="int64"))
+    n = len(close)
+
+    secuencias = []
+    for inicio in np.asarray(setups, dtype="int64"):
+        # Primer Setup contrario desde el inicio (o el final de los datos)
+        pos = np.searchsorted(contrarios, inicio)
+        fin = int(contrarios[pos]) if pos < len(contrarios) else n
+        desde = np.searchsorted(contadas, inicio)
+        hasta = np.searchsorted(contadas, fin)
+        indices = contadas[desde:min(hasta, desde + objetivo)]
+        cancelada = fin < n and len(indices) < objetivo
+        secuencias.append((indices, cancelada))
+    return secuencias
+
+
+def countdown_after(close, inicio, fin, tipo, objetivo=COUNTDOWN_OBJETIVO) -> np.ndarray:
+    """
+    Countdown simplificado desde la vela siguiente a 'inicio' hasta 'fin' (exclusivo):
+    para compra cuenta cierre < cierre de 2 barras atrás y para venta cierre > cierre de 2 barras atrás.
+
+    Returns:
+        np.ndarray: Conteo (1..13) en cada vela contada y 0 en el resto.
+    """
+    close = _array(close)
+    conteo = np.zeros(len(close), dtype=int)
+    if inicio < 0:
+        return conteo
+    previo = _desplazar(close, 2)
+    cumple = close < previo if tipo == "buy" else close > previo
+    indices = np.flatnonzero(cumple[inicio + 1:fin])[:objetivo] + inicio + 1
+    conteo[indices] = np.arange(1, len(indices) + 1)
+    return conteo
@@ -0,0 +1,280 @@
+import numpy as np
+import pandas as pd
+
+"""
+Analítica local de watchlists a partir de las velas diarias en caché.
+
+Calcula las columnas del scanner de TradingView (Perf.W, Perf.1M, RSI, Volatility.D, ...)
+para todos los símbolos a la vez, con operaciones vectorizadas sobre paneles de fechas x
+símbolos. Las columnas que no se pueden calcular localmente (p. ej. Recommend.*) y los
+símbolos sin velas se piden al scanner como respaldo.
+
+Para agregar una columna propia basta con registrar en COLUMNAS_LOCALES una función que
+reciba los paneles (dict con open/high/low/close/volume y 'benchmark') y retorne una Series
+indexada por símbolo.
+"""
+
+# Símbolo de referencia para las betas
+BENCHMARK = "SPY"
+
+
+def _ultimo(panel: pd.DataFrame) -> pd.Series:
+    """Último valor disponible de cada símbolo."""
+    return panel.ffill().iloc[-1]
+
+
+def _valor_hace(panel: pd.DataFrame, offset) -> pd.Series:
+    """Valor de cada símbolo en la última sesión no posterior a (última fecha - offset)."""
+    cierres = panel.ffill()
+    limite = cierres.index[-1] - offset
+    posicion = cierres.index.searchsorted(limite, side="right") - 1
+    if posicion < 0:
+        return pd.Series(np.nan, index=panel.columns)
+    return cierres.iloc[posicion]
+
+
+def _perf(offset):
+    """Rendimiento % desde hace 'offset' (DateOffset o Timedelta)."""
+    def calcular(p):
+        return 100 * (_ultimo(p["close"]) / _valor_hace(p["close"], offset) - 1)
+    return calcular
+
+
+def _perf_ytd(p):
+    cierres = p["close"].ffill()
+    inicio_anio = pd.Timestamp(year=cierres.index[-1].year, month=1, day=1)
+    previos = cierres[cierres.index < inicio_anio]
+    base = previos.iloc[-1] if not previos.empty else cierres.bfill().iloc[0]
+    return 100 * (cierres.iloc[-1] / base - 1)
+
+
+def _perf_all(p):
+    primeros = p["close"].bfill().iloc[0]
+    return 100 * (_ultimo(p["close"]) / primeros - 1)
+
+
+def _rsi(periodo=14):
+    """RSI con el suavizado de Wilder (el que usa TradingView), para todos los símbolos a la vez."""
+    def calcular(p):
+        delta = p["close"].ffill().diff()
+        ganancia = delta.clip(lower=0).ewm(alpha=1 / periodo, adjust=False).mean()
+        perdida = (-delta.clip(upper=0)).ewm(alpha=1 / periodo, adjust=False).mean()
+        rsi = 100 - 100 / (1 + ganancia / perdida)
+        return rsi.iloc[-1]
+    return calcular
+
+
+def _volatilidad(sesiones):
+    """Rango diario promedio ((High - Low) / Low, en %) de las últimas 'sesiones' sesiones."""
+    def calcular(p):
+        rango = 100 * (p["high"] - p["low"]) / p["low"]
+        return rango.tail(sesiones).mean()
+    return calcular
+
+
+def _momentum(periodo=10):
+    def calcular(p):
+        cierres = p["close"].ffill()
+        return cierres.iloc[-1] - cierres.iloc[-1 - periodo] if len(cierres) > periodo else cierres.iloc[-1] * np.nan
+    return calcular
+
+
+def _awesome_oscillator(p):
+    mediana = (p["high"] + p["low"]) / 2
+    return (mediana.rolling(5).mean() - mediana.rolling(34).mean()).iloc[-1]
+
+
+def _cci(periodo=20):
+    """CCI de la última vela: solo hace falta la ventana final, no la serie completa."""
+    def calcular(p):
+        tipico = ((p["high"] + p["low"] + p["close"]) / 3).tail(periodo)
+        media = tipico.mean()
+        desvio = (tipico - media).abs().mean()
+        return (tipico.iloc[-1] - media) / (0.015 * desvio)
+    return calcular
+
+
+def _beta(anios):
+    """Beta de los retornos diarios contra el benchmark en los últimos 'anios' años."""
+    def calcular(p):
+        if p.get("benchmark") is None:
+            return pd.Series(np.nan, index=p["close"].columns)
+        desde = p["close"].index[-1] - pd.DateOffset(years=anios)
+        retornos = p["close"][p["close"].index > desde].pct_change(fill_method=None)
+        mercado = p["benchmark"][p["benchmark"].index > desde].pct_change(fill_method=None).reindex(retornos.index)
+        validos = retornos.notna() & mercado.notna().to_numpy()[:, None]
+        r = retornos.where(validos)
+        m = pd.DataFrame(np.where(validos, mercado.to_numpy()[:, None], np.nan), index=r.index, columns=r.columns)
+        covarianza = ((r - r.mean()) * (m - m.mean())).mean()
+        return covarianza / m.var(ddof=0)
+    return calcular
+
+
+def _distancia_sma(periodo):
+    """Distancia % del cierre a su media móvil simple."""
+    def calcular(p):
+        cierres = p["close"].ffill()
+        return 100 * (cierres.iloc[-1] / cierres.rolling(periodo).mean().iloc[-1] - 1)
+    return calcular
+
+
+def _distancia_maximo_52s(p):
+    cierres = p["close"].ffill()
+    desde = cierres.index[-1] - pd.DateOffset(weeks=52)
+    return 100 * (cierres.iloc[-1] / p["high"][p["high"].index > desde].max() - 1)
+
+
+# columna -> (función, días de historia necesarios)
+COLUMNAS_LOCALES = {
+    "close": (lambda p: _ultimo(p["close"]), 10),
+    "open": (lambda p: _ultimo(p["open"]), 10),
+    "high": (lambda p: _ultimo(p["high"]), 10),
+    "low": (lambda p: _ultimo(p["low"]), 10),
+    "volume": (lambda p: _ultimo(p["volume"]), 10),
+    "Perf.W": (_perf(pd.DateOffset(weeks=1)), 15),
+    "Perf.1M": (_perf(pd.DateOffset(months=1)), 40),
+    "Perf.3M": (_perf(pd.DateOffset(months=3)), 100),
+    "Perf.YTD": (_perf_ytd, 375),
+    "Perf.Y": (_perf(pd.DateOffset(years=1)), 375),
+    "Perf.5Y": (_perf(pd.DateOffset(years=5)), 5 * 366 + 10),
+    "Perf.All": (_perf_all, None),
+    "RSI": (_rsi(14), 400),
+    "Mom": (_momentum(10), 30),
+    "AO": (_awesome_oscillator, 60),
+    "CCI20": (_cci(20), 40),
+    "Volatility.D": (_volatilidad(1), 10),
+    "Volatility.W": (_volatilidad(5), 15),
+    "Volatility.M": (_volatilidad(21), 40),
+    "beta_1_year": (_beta(1), 375),
+    "beta_3_year": (_beta(3), 3 * 366 + 10),
+    "beta_5_year": (_beta(5), 5 * 366 + 10),
+    # Columnas propias (no existen en el scanner de TradingView)
+    "Perf.6M": (_perf(pd.DateOffset(months=6)), 190),
+    "Dist.SMA50": (_distancia_sma(50), 90),
+    "Dist.SMA200": (_distancia_sma(200), 300),
+    "Dist.52W.High": (_distancia_maximo_52s, 375),
+}
+
+# Columnas propias: no existen en el scanner, así que no se le piden como respaldo
+COLUMNAS_PROPIAS = {"Perf.6M", "Dist.SMA50", "Dist.SMA200", "Dist.52W.High"}
+
+# Columnas que requieren las velas del benchmark
+COLUMNAS_BENCHMARK = {"beta_1_year", "beta_3_year", "beta_5_year"}
+
+
+def _sin_tz(serie_o_df):
+    """Quita la zona horaria del índice para poder alinear símbolos de distintas bolsas por fecha."""
+    indice = pd.DatetimeIndex(serie_o_df.index)
+    if indice.tz is not None:
+        serie_o_df = serie_o_df.copy()
+        serie_o_df.index = indice.tz_localize(None).normalize()
+    return serie_o_df
+
+
+def paneles(velas: dict, benchmark: pd.DataFrame = None) -> dict:
+    """
+    Arma los paneles fechas x símbolos (open, high, low, close, volume) a partir de las
+    velas diarias de cada símbolo (dict símbolo -> DataFrame de get_ohlcv).
+    """
+    resultado = {}
+    for columna in ["Open", "High", "Low", "Close", "Volume"]:
+        series = {symbol: _sin_tz(data[columna]) for symbol, data in velas.items() if columna in data.columns}
+        panel = pd.concat(series, axis=1) if series else pd.DataFrame()
+        resultado[columna.lower()] = panel.sort_index()
+    if benchmark is not None and not benchmark.empty:
+        resultado["benchmark"] = _sin_tz(benchmark["Close"]).reindex(resultado["close"].index).ffill()
+    return resultado
+
+
+def calcular_columnas(p: dict, columnas) -> pd.DataFrame:
+    """
+    Calcula las columnas locales pedidas sobre los paneles.
+
+    Returns:
+        pd.DataFrame: Una fila por símbolo (índice) y una columna por métrica.
+    """
+    return pd.DataFrame({columna: COLUMNAS_LOCALES[columna][0](p) for columna in columnas})
+
+
+def dias_historia(columnas):
+    """Días de historia necesarios para las columnas (None si alguna necesita toda la historia)."""
+    dias = [COLUMNAS_LOCALES[c][1] for c in columnas if c in COLUMNAS_LOCALES]
+    if any(d is None for d in dias):
+        return None
+    return max(dias, default=10)
+
+
+def analizar_watchlist(symbols, columns, respaldo=None) -> pd.DataFrame:
+    """
+    Calcula las columnas de la watchlist localmente y completa con el scanner lo que falte.
+
+    Args:
+        symbols (list[str]): Símbolos de TradingView ("NASDAQ:AAPL", ...).
+        columns (list[str]): Columnas a mostrar (nombres del scanner de TradingView o propias).
+        respaldo (callable, opcional): respaldo(symbols, columns) -> DataFrame con la columna
+            "Símbolo"; se usa para las columnas no locales y para los símbolos sin velas.
+
+    Returns:
+        pd.DataFrame: Columna "Símbolo" más las columnas pedidas, en el orden de 'symbols'.
+    """
+    from models.datasource.market_data import get_ohlcv_lote
+    from utils.watchlist_symbols import a_ticker_yahoo
+
+    locales = [c for c in columns if c in COLUMNAS_LOCALES]
+    remotas = [c for c in columns if c not in COLUMNAS_LOCALES]
+    # Símbolos de bolsas sin equivalente en Yahoo quedan en None y se piden al scanner
+    tickers = {symbol: a_ticker_yahoo(symbol) for symbol in symbols}
+
+    tabla = pd.DataFrame({"Símbolo": list(symbols)})
+    sin_datos = list(symbols)
+    if locales:
+        dias = dias_historia(locales)
+        hoy = pd.Timestamp.now().normalize()
+        inicio = pd.Timestamp("1950-01-01") if dias is None else hoy - pd.Timedelta(days=dias)
+        pedidos = [t for t in tickers.values() if t]
+        if COLUMNAS_BENCHMARK & set(locales):
+            pedidos.append(BENCHMARK)
+        velas = get_ohlcv_lote(pedidos, start=inicio, end=hoy + pd.Timedelta(days=1), interval="1d")
+        benchmark = velas.get(BENCHMARK) if COLUMNAS_BENCHMARK & set(locales) else None
+        propias = {t: velas[t] for t in tickers.values() if t in velas}
+
+        if propias:
+            metricas = calcular_columnas(paneles(propias, benchmark), locales)
+            valores = metricas.reindex([tickers[s] for s in symbols]).reset_index(drop=True)
+            tabla = pd.concat([tabla, valores], axis=1)
+        sin_datos = [s for s in symbols if tickers[s] not in propias]
+
+    # Las betas locales son contra SPY: para acciones fuera de EE. UU. (ticker de Yahoo con
+    # sufijo de bolsa, "RY.TO") se usan las del scanner
+    betas = [c for c in locales if c in COLUMNAS_BENCHMARK]
+    extranjeros = [s for s in symbols if s not in sin_datos and "." in tickers[s]] if betas else []
+    if extranjeros:
+        tabla.loc[tabla["Símbolo"].isin(extranjeros), betas] = np.nan
+
+    # Respaldo: las columnas no locales para todos los símbolos, las columnas locales (salvo
+    # las propias) solo para los símbolos sin velas y las betas de los extranjeros. Así el
+    # scanner nunca pisa valores locales de otros símbolos (un NaN local, como Perf.5Y con
+    # poca historia, se queda).
+    pedidos = []
+    if remotas:
+        pedidos.append((list(symbols), remotas))
+    locales_scanner = [c for c in locales if c not in COLUMNAS_PROPIAS]
+    if locales_scanner and sin_datos:
+        pedidos.append((sin_datos, locales_scanner))
+    if extranjeros:
+        pedidos.append((extranjeros, betas))
+    if respaldo is not None and pedidos:
+        tabla = tabla.set_index("Símbolo")
+        for simbolos_pedidos, columnas_pedidas in pedidos:
+            remoto = respaldo(simbolos_pedidos, columnas_pedidas)
+            if remoto.empty:
+                continue
+            remoto = remoto.set_index("Símbolo")
+            for columna in remoto.columns:
+                if columna not in tabla.columns:
+                    tabla[columna] = np.nan
+                faltantes = tabla.index.isin(simbolos_pedidos) & tabla[columna].isna().to_numpy()
+                tabla.loc[faltantes, columna] = remoto[columna].reindex(tabla.index[faltantes]).to_numpy()
+        tabla = tabla.reset_index()
+
+    return tabla[["Símbolo"] + [c for c in columns if c in tabla.columns]]
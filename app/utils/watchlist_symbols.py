@@ -0,0 +1,74 @@
+"""
+Listas de símbolos para los análisis en lote (anomalías, pronósticos...), tomadas de los
+screeners configurados en config.yaml o de una lista manual.
+"""
+
+
+# Sufijo de Yahoo para cada bolsa de TradingView ("" para las de EE. UU.). Las bolsas que no
+# están aquí (cripto, forex, índices...) no tienen un equivalente confiable en Yahoo.
+SUFIJOS_YAHOO = {
+    "NASDAQ": "", "NYSE": "", "AMEX": "", "NYSEARCA": "", "NYSEAMERICAN": "", "BATS": "", "CBOE": "", "OTC": "",
+    "TSX": ".TO", "TSXV": ".V", "NEO": ".NE", "LSE": ".L", "XETR": ".DE", "FWB": ".F", "SIX": ".SW",
+    "MIL": ".MI", "BME": ".MC", "EURONEXT": ".PA", "ASX": ".AX", "NZX": ".NZ", "HKEX": ".HK", "TSE": ".T",
+    "NSE": ".NS", "BSE": ".BO", "BMFBOVESPA": ".SA", "BMV": ".MX", "BCBA": ".BA", "KRX": ".KS",
+    "TWSE": ".TW", "SGX": ".SI", "JSE": ".JO", "OMXSTO": ".ST", "OSL": ".OL", "OMXCOP": ".CO",
+    "OMXHEX": ".HE", "GPW": ".WA", "TASE": ".TA",
+}
+
+
+def a_ticker_yahoo(simbolo: str):
+    """
+    Convierte un símbolo de TradingView o Nasdaq ("NASDAQ:AAPL", "TSX:RY", "BRK.B", "BRK/B")
+    al formato de Yahoo ("AAPL", "RY.TO", "BRK-B"). Los símbolos sin bolsa se toman como de
+    EE. UU.; si la bolsa no tiene equivalente en Yahoo retorna None (no se debe usar otro
+    instrumento con el mismo código, como la cotización en EE. UU. de una acción extranjera).
+    """
+    bolsa, _, codigo = simbolo.strip().upper().rpartition(":")
+    sufijo = SUFIJOS_YAHOO.get(bolsa, None) if bolsa else ""
+    if sufijo is None:
+        return None
+    codigo = codigo.strip().replace(".", "-").replace("/", "-")
+    if bolsa == "HKEX" and codigo.isdigit():
+        # Yahoo usa 4 dígitos en Hong Kong (700 -> 0700.HK)
+        codigo = codigo.zfill(4)
+    return codigo + sufijo
+
+
+def obtener_simbolos_screener(screener_config) -> list:
+    """
+    Retorna los símbolos (formato Yahoo) de un screener configurado en config.yaml,
+    usando el plugin de screeners correspondiente.
+    """
+    from utils.plugins import obtener_plugins
+
+    plugin = next((p for p in obtener_plugins("screeners") if p["tipo"] == screener_config.get("tipo")), None)
+    if plugin is None:
+        return []
+    if plugin["tipo"] == "tv_watchlist":
+        symbols = plugin["module"].obtener_watchlist_symbols(screener_config.get("url", ""))
+    elif plugin["tipo"] == "nasdaq_screener":
+        df = plugin["module"].obtener_datos_nasdaq(screener_config.get("limit", 25))
+        symbols = df["symbol"].tolist() if "symbol" in df.columns else []
+    else:
+        return []
+    return [t for t in dict.fromkeys(a_ticker_yahoo(s) for s in symbols) if t]
+
+
+def seleccionar_simbolos(key, default="AAPL, MSFT, NVDA") -> list:
+    """
+    Renderiza el selector de origen de los símbolos (un screener configurado o una lista
+    manual) y retorna los símbolos elegidos en formato Yahoo.
+    """
+    import streamlit as st
+    from utils.config_manager import ConfigManager
+
+    screeners = ConfigManager("config.yaml").get("screener", []) or []
+    fuentes = [s.get("nombre", "Desconocido") for s in screeners] + ["Lista manual"]
+    fuente = st.selectbox("Símbolos a analizar", options=fuentes, key=f"{key}_fuente")
+
+    if fuente == "Lista manual":
+        texto = st.text_area("Símbolos (separados por coma o espacio)", value=default, key=f"{key}_manual")
+        return [t for t in dict.fromkeys(a_ticker_yahoo(s) for s in texto.replace(",", " ").split()) if t]
+
+    screener_config = next(s for s in screeners if s.get("nombre", "Desconocido") == fuente)
+    return obtener_simbolos_screener(screener_config)
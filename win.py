@@ -2,13 +2,18 @@ import webview
 import subprocess
 import threading
 import time
-import requests
+import socket
 import os
 import sys
 import ctypes
 
 # Crear un evento para detener el hilo
 stop_event = threading.Event()
+# Evento que se activa cuando el servidor de Streamlit anuncia que está escuchando
+ready_event = threading.Event()
+
+# Segundos máximos de espera para que Streamlit quede listo
+STARTUP_TIMEOUT = 60
 
 ctypes.windll.user32.SetProcessDpiAwarenessContext(-4)
 
@@ -21,27 +26,64 @@ if "--from-bat" in sys.argv:
     user_version = True
     # Puedes hacer alguna acción específica aquí
 
+# --no-prewarm: no pre-calienta las cachés mientras se muestra la pantalla de carga
+prewarm = "--no-prewarm" not in sys.argv
+
+def find_free_port():
+    """Pide al sistema operativo un puerto TCP libre en localhost."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+port = find_free_port()
+app_url = f"http://localhost:{port}"
+
+# --profile-imports: lanza Streamlit con PYTHONPROFILEIMPORTTIME=1 y guarda el costo de
+# importación por módulo en app/cache/import_profile.txt (al estar listo y al cerrar)
+profile_imports = "--profile-imports" in sys.argv
+import_time_lines = []
+IMPORT_PROFILE_PATH = os.path.join("app", "cache", "import_profile.txt")
+
+def write_import_profile():
+    """Escribe el reporte de tiempos de importación recolectados hasta ahora."""
+    sys.path.insert(0, "app")
+    from utils.import_profiler import parse_importtime, guardar_reporte
+    texto = guardar_reporte(parse_importtime(list(import_time_lines)), IMPORT_PROFILE_PATH)
+    print(f"Perfil de importaciones guardado en {IMPORT_PROFILE_PATH}")
+    print(texto)
+
 def start_streamlit():
     """Inicia el servidor Streamlit en un hilo separado y muestra las salidas."""
     print("Iniciando Streamlit...")
     ruta_main = "app/Dashboard.py"
-    streamlit_cmd = ["python","-m","streamlit", "run", "Dashboard.py", "--server.port=8501", "--server.headless=true", "--client.toolbarMode=auto"]
-    if user_version:
-        streamlit_cmd = [os.path.join("python","pythonw.exe"),"-m","streamlit", "run", "Dashboard.py", "--server.port=8501", "--server.headless=true", "--client.toolbarMode=minimal"]
-        
+    python_exe = os.path.join("python","pythonw.exe") if user_version else "python"
+    toolbar_mode = "minimal" if user_version else "auto"
+    streamlit_cmd = [python_exe,"-m","streamlit", "run", "Dashboard.py", f"--server.port={port}", "--server.headless=true", f"--client.toolbarMode={toolbar_mode}"]
+
+    env = os.environ.copy()
+    if profile_imports:
+        env["PYTHONPROFILEIMPORTTIME"] = "1"
+
     process = subprocess.Popen(
         streamlit_cmd,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         text=True,
-        cwd=os.path.dirname(ruta_main)
+        cwd=os.path.dirname(ruta_main),
+        env=env
     )
 
     def stream_output(pipe):
         """Lee y muestra la salida del proceso en tiempo real."""
         for line in iter(pipe.readline, ''):
-            if line:  # Imprime solo si hay contenido
+            if line.startswith("import time:"):
+                # Las líneas de importtime se recolectan para el reporte en lugar de imprimirse
+                import_time_lines.append(line)
+            elif line:  # Imprime solo si hay contenido
                 print(line.strip())
+                # Streamlit anuncia la URL local en cuanto el servidor está escuchando
+                if "Local URL:" in line or "You can now view" in line:
+                    ready_event.set()
 
     # Crear hilos para leer stdout y stderr
     stdout_thread = threading.Thread(target=stream_output, args=(process.stdout,))
@@ -49,22 +91,38 @@ def start_streamlit():
     stdout_thread.start()
     stderr_thread.start()
 
+    # Pre-calentar cachés (plugins, velas y HTTP de los widgets) en paralelo al arranque
+    prewarm_process = None
+    if prewarm:
+        prewarm_process = subprocess.Popen(
+            [python_exe, "-m", "utils.prewarm"],
+            cwd=os.path.dirname(ruta_main)
+        )
+
     stop_event.wait()  # Espera hasta que se establezca el evento para detenerse
     print("Deteniendo Streamlit...")
     process.terminate()
     process.wait()  # Asegura que el proceso termine antes de salir
+    if prewarm_process is not None and prewarm_process.poll() is None:
+        prewarm_process.terminate()
+
+def port_is_open():
+    """Retorna True si ya hay un servidor aceptando conexiones en el puerto elegido."""
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+            return True
+    except OSError:
+        return False
 
 def wait_for_streamlit():
-    """Verifica continuamente si Streamlit está listo."""
-    url = "http://localhost:8501"
-    for _ in range(30):  # Máximo de 30 intentos (30 segundos)
-        try:
-            response = requests.get(url, timeout=5)
-            if response.status_code == 200:
-                return True
-        except:
-            pass
-        time.sleep(1)
+    """
+    Espera a que Streamlit esté listo: se despierta en cuanto el servidor anuncia su URL
+    por stdout (ready_event). Como respaldo, por si cambia ese mensaje, revisa el puerto.
+    """
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if ready_event.wait(timeout=0.25) or port_is_open():
+            return True
     return False
 
 # Iniciar Streamlit en un hilo separado
@@ -81,7 +139,9 @@ window = webview.create_window("Xungungo Stocks Analtycs", html=loading_html)
 def load_streamlit():
     """Cambia a la URL de Streamlit cuando esté listo."""
     if wait_for_streamlit():
-        window.load_url("http://localhost:8501")
+        window.load_url(app_url)
+        if profile_imports:
+            write_import_profile()
     else:
         print("Streamlit no se inicializó a tiempo.")
 
@@ -94,6 +154,9 @@ def on_webview_close():
     """Acción a realizar cuando se cierra el WebView."""
     print("Cerrando la aplicación...")
     stop_event.set()
+    if profile_imports:
+        # Incluye las importaciones hechas al renderizar páginas y plugins durante la sesión
+        write_import_profile()
 
 
 window.events.closed += on_webview_close